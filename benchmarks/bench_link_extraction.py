@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Compare per-element link extraction with the batched in-page extraction.
+
+The per-element loop is what the scrapers used to do: find_elements('a')
+followed by one get_attribute('href') round trip per link. The batched path
+is scraper_common.extraction.extract_links, which returns the filtered links
+from a single execute_script call.
+
+    python benchmarks/bench_link_extraction.py --repeat 20 --tld .ir
+
+Needs Chrome and ChromeDriver; pages are loaded from fixtures/serp as file:// URLs.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+
+from scraper_common.extraction import LinkFilter, extract_links
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "serp")
+
+
+def per_element(driver, link_filter):
+    hrefs = []
+    for link in driver.find_elements(By.CSS_SELECTOR, "a"):
+        href = link.get_attribute("href")
+        if href and link_filter.matches(href):
+            hrefs.append(href)
+    return hrefs
+
+
+def batched(driver, link_filter):
+    return [link.href for link in extract_links(driver, link_filter)]
+
+
+def time_it(func, driver, link_filter, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(driver, link_filter)
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=os.path.join(FIXTURE_DIR, "page*.html"), help="glob of saved result pages")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--tld", default=".ir")
+    parser.add_argument("--exclude", action="append", default=None, help="substring to exclude (repeatable)")
+    parser.add_argument("--chromedriver", default=os.getenv("CHROMEDRIVER_PATH"))
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(args.pages))
+    if not pages:
+        parser.error(f"No pages match {args.pages}")
+    link_filter = LinkFilter(args.tld, exclude=args.exclude or (".gov.ir", "translate.google.com"))
+
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    service = webdriver.chrome.service.Service(executable_path=args.chromedriver) if args.chromedriver else None
+    driver = webdriver.Chrome(service=service, options=options) if service else webdriver.Chrome(options=options)
+
+    print(f"{'page':<20} {'anchors':>7} {'kept':>5} {'per-element ms':>15} {'batched ms':>11} {'speedup':>8}")
+    totals = {"per_element": 0.0, "batched": 0.0}
+    try:
+        for path in pages:
+            driver.get("file://" + os.path.abspath(path))
+            anchors = len(driver.find_elements(By.CSS_SELECTOR, "a"))
+
+            slow, slow_timings = time_it(per_element, driver, link_filter, args.repeat)
+            fast, fast_timings = time_it(batched, driver, link_filter, args.repeat)
+            if slow != fast:
+                print(f"WARNING: results differ on {path}: {len(slow)} vs {len(fast)} links")
+
+            slow_ms = statistics.median(slow_timings) * 1000
+            fast_ms = statistics.median(fast_timings) * 1000
+            totals["per_element"] += slow_ms
+            totals["batched"] += fast_ms
+            print(f"{os.path.basename(path):<20} {anchors:>7} {len(fast):>5} {slow_ms:>15.1f} {fast_ms:>11.1f} "
+                  f"{slow_ms / fast_ms:>7.1f}x")
+    finally:
+        driver.quit()
+
+    print(f"{'total (median/page)':<20} {'':>7} {'':>5} {totals['per_element']:>15.1f} {totals['batched']:>11.1f} "
+          f"{totals['per_element'] / totals['batched']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Compare the old urlparse-based base domain with the public-suffix normalizer.
+
+The old path is what the scrapers used to store: "scheme://netloc" from
+urllib.parse.urlparse. The new paths are scraper_common.domains:
+registrable_domain() one URL at a time and normalize_batch(), which splits
+each distinct host only once.
+
+    python benchmarks/bench_normalize.py --urls 1000000 --hosts 50000
+
+URLs are synthetic: a mix of www/subdomain/bare hosts under ccTLD zones,
+with ports, paths, query strings and a few IDN hosts.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper_common.domains import default_normalizer
+
+ZONES = ["ir", "co.ir", "ac.ir", "sd", "edu.sd", "com.eg", "eg", "et", "co.uk", "com"]
+SUBDOMAINS = ["", "www.", "m.", "shop.", "news.www."]
+
+
+def make_urls(count, hosts, seed=1):
+    rng = random.Random(seed)
+    names = [f"site{i}" for i in range(hosts - hosts // 100)] + [f"پارس{i}" for i in range(hosts // 100)]
+    urls = []
+    for _ in range(count):
+        host = f"{rng.choice(SUBDOMAINS)}{rng.choice(names)}.{rng.choice(ZONES)}"
+        port = ":8080" if rng.random() < 0.05 else ""
+        urls.append(f"{rng.choice(('http', 'https'))}://{host}{port}/path/{rng.randrange(1000)}?q={rng.randrange(10)}")
+    return urls
+
+
+def urlparse_base(urls):
+    results = []
+    for url in urls:
+        parsed = urlparse(url)
+        results.append(f"{parsed.scheme}://{parsed.netloc}")
+    return results
+
+
+def per_url(urls):
+    normalizer = default_normalizer()
+    return [normalizer.registrable_domain(url) for url in urls]
+
+
+def batched(urls):
+    return default_normalizer().normalize_batch(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    parser.add_argument("--hosts", type=int, default=50_000, help="distinct host names in the sample")
+    args = parser.parse_args()
+
+    urls = make_urls(args.urls, args.hosts)
+    started = time.perf_counter()
+    default_normalizer()
+    print(f"Suffix list loaded in {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"({default_normalizer().trie.rules} rules)")
+
+    print(f"{'method':<26} {'seconds':>8} {'URLs/min':>14} {'distinct':>10}")
+    for name, func in (("urlparse scheme://netloc", urlparse_base), ("registrable_domain", per_url),
+                       ("normalize_batch", batched)):
+        started = time.perf_counter()
+        results = func(urls)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<26} {elapsed:>8.2f} {len(urls) / elapsed * 60:>14,.0f} {len(set(results)):>10,}")
+
+
+if __name__ == "__main__":
+    main()
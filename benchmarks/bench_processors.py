@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Measure the site processors' parse throughput and memory in each parse mode.
+
+Modes (tld-domain-processor/parsing.py):
+  full  html.parser builds the whole tree, as the processors used to
+  lxml  lxml builds the whole tree
+  fast  lxml builds only the elements the processor reads
+
+    python benchmarks/bench_processors.py --corpus tld-domain-processor/.http_cache
+    python benchmarks/bench_processors.py --synthetic 300
+
+The corpus is either a directory of saved .html pages or the processor's
+response cache (--cache-dir). Every mode runs in its own process so the
+peak RSS reported is that mode's alone. Pages are cut at --max-body MB like
+the HTTP client does.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+PROCESSOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tld-domain-processor")
+sys.path.insert(0, PROCESSOR_DIR)
+
+import parsing
+from http_cache import HttpCache
+from pipeline import MAX_BODY
+from site_processors import generic_processor, get_processor
+
+
+def make_page(rng, index):
+    """A news-site-like page: navigation, scripts, an article (most of the time) and a sidebar"""
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(150))
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    paragraphs = "".join(f"<p>Paragraph {i} of page {index} " + "lorem ipsum dolor sit amet " * 20 + "</p>"
+                         for i in range(rng.randint(10, 60)))
+    sidebar = "".join(f'<div class="teaser"><a href="/story/{i}">Story {i}</a><span>{i} comments</span></div>'
+                      for i in range(300))
+    if index % 10 == 0:
+        body = f'<h1 class="article-title">Story {index}</h1><div class="article-content">{paragraphs}</div>'
+        url = f"https://example.com/story/{index}"
+    elif index % 4 == 0:
+        body = f"<div class='content'>{paragraphs}</div>"
+        url = f"https://site{index}.ir/page"
+    else:
+        body = f"<article><h1>Story {index}</h1>{paragraphs}</article>"
+        url = f"https://site{index}.ir/story"
+    html = (f"<html><head><title>Page {index}</title>{script}</head><body><nav><ul>{nav}</ul></nav>"
+            f"<main>{body}</main><aside>{sidebar}</aside></body></html>")
+    return url, html.encode("utf-8")
+
+
+def load_corpus(args):
+    if args.synthetic:
+        rng = random.Random(1)
+        return [make_page(rng, i) for i in range(args.synthetic)]
+    if any(name.endswith(".html") for name in os.listdir(args.corpus)):
+        pages = []
+        for name in sorted(os.listdir(args.corpus)):
+            if name.endswith(".html"):
+                with open(os.path.join(args.corpus, name), "rb") as f:
+                    pages.append((f"https://{os.path.splitext(name)[0]}/", f.read()))
+        return pages
+    return [(response.url, response.content) for response in HttpCache(args.corpus).responses()]
+
+
+def parse_all(pages):
+    parsed = 0
+    for url, html in pages:
+        host = url.split("/")[2]
+        processor = get_processor(host) or generic_processor.parse
+        try:
+            title, content = processor(html, url)
+        except Exception:
+            continue
+        if title and content:
+            parsed += 1
+    return parsed
+
+
+def run_mode(args):
+    """Child process: parse the corpus in one mode and print the measurements as JSON"""
+    parsing.mode = args.mode
+    limit = int(args.max_body * 1024 * 1024)
+    pages = [(url, html[:limit] if limit else html) for url, html in load_corpus(args)]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    parsed = 0
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        parsed += parse_all(pages)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"pages": len(pages) * args.repeat, "parsed": parsed, "seconds": elapsed,
+                      "baseline_kb": baseline, "peak_kb": peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of .html pages or a processor response cache")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate this many pages instead of a corpus")
+    parser.add_argument("--modes", default=",".join(parsing.MODES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-body", type=float, default=MAX_BODY / (1024 * 1024), help="MB kept per page (0 = all)")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if not args.corpus and not args.synthetic:
+        parser.error("pass --corpus DIR or --synthetic N")
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"Fast parser: {parsing.FAST_PARSER}")
+    print(f"{'mode':<6} {'pages':>7} {'parsed':>7} {'seconds':>8} {'pages/s':>9} {'peak RSS MB':>12} {'parse MB':>9}")
+    for mode in args.modes.split(","):
+        command = [sys.executable, os.path.abspath(__file__), "--mode", mode, "--repeat", str(args.repeat),
+                   "--max-body", str(args.max_body)]
+        command += ["--synthetic", str(args.synthetic)] if args.synthetic else ["--corpus", args.corpus]
+        result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+        # ru_maxrss is in KB on Linux
+        print(f"{mode:<6} {result['pages']:>7} {result['parsed']:>7} {result['seconds']:>8.2f} "
+              f"{result['pages'] / result['seconds']:>9.1f} {result['peak_kb'] / 1024:>12.1f} "
+              f"{(result['peak_kb'] - result['baseline_kb']) / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
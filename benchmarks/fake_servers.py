@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Generated search results and a static news site for offline benchmarks.
+
+Unlike fixture_server.py, which replays a few saved pages, the fake search
+engine generates as many result pages as asked for, for any site: query:
+
+    python benchmarks/fake_servers.py --pages 30 --links 10 --latency 0.05 --captcha-every 50
+    SCRAPER_SEARCH_URL=http://127.0.0.1:8766/search uvicorn app.main:app
+
+/search?q=site:.ir ...&start=N     page N/10 + 1 of the results for the query
+/article/N                         a news article page for the domain processor
+/ (any Host)                       a domain's home page, for the liveness probe
+
+Domains are derived from the query, so different queries (shards) find
+different domains, and --repeat makes part of every page repeat domains of
+earlier pages. --next picks the "Next" link markup: pnnext (Google's id),
+text (a plain "Next" link) or none (a single page of results), and
+--link-style wrapped sends result links through /url?q=<target>, as Google
+does for clients without JavaScript.
+
+With --dns-port a stub DNS server answers every name with 127.0.0.1, except
+names starting with "dead" (NXDOMAIN) and "noaddr" (no address). Home pages
+of hosts starting with "moved" redirect to /home, and hosts starting with
+"nohead" refuse HEAD requests:
+
+    python benchmarks/fake_servers.py --dns-port 8853
+    python tld-domains-probe.py --domains out.txt --resolver 127.0.0.1:8853 --http-port 8766
+"""
+import argparse
+import hashlib
+import html
+import re
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+NEXT_MARKUP = ("pnnext", "text", "none")
+LINK_STYLES = ("direct", "wrapped")
+
+CAPTCHA_HTML = """<!DOCTYPE html>
+<html><head><title>Unusual traffic</title></head>
+<body><div id="captcha"><p>Our systems have detected unusual traffic from your computer network.</p>
+<iframe src="https://www.google.com/recaptcha/api2/anchor?k=fake" width="304" height="78"></iframe></div></body></html>"""
+
+
+def query_zone(query):
+    """The zone of the first site: operator in a query, e.g. 'ir' for 'site:.ir -site:.gov.ir'"""
+    match = re.search(r"(?:^|\s)site:\.?(\S+)", query)
+    return match.group(1).lower() if match else "ir"
+
+
+def result_domains(query, page, links, repeat):
+    """The domains on one results page: fresh ones plus a share of domains from the previous page"""
+    zone = query_zone(query)
+    tag = hashlib.sha1(query.encode("utf-8")).hexdigest()[:6]
+    repeated = int(links * repeat) if page > 1 else 0
+    domains = [f"site-{tag}-{page - 1}-{i}.{zone}" for i in range(repeated)]
+    domains += [f"site-{tag}-{page}-{i}.{zone}" for i in range(links - repeated)]
+    return domains
+
+
+def render_results(query, page, pages, links, repeat, next_markup, link_style="direct"):
+    blocks = []
+    for i, domain in enumerate(result_domains(query, page, links, repeat)):
+        url = f"https://www.{domain}/news/{page}-{i}"
+        href = html.escape(f"/url?{urlencode({'q': url, 'sa': 'U'})}") if link_style == "wrapped" else url
+        blocks.append(
+            f'<div class="g"><div class="yuRUbf"><a href="{href}"><h3>Result {i + 1} for {html.escape(domain)}</h3></a></div>'
+            f'<div class="VwiC3b">Snippet text for result {i + 1}. '
+            f'<a href="https://translate.google.com/translate?u={url}">Translate this page</a></div></div>')
+    footer = "".join(f'<td><a aria-label="Page {n}" href="/search?{urlencode({"q": query, "start": (n - 1) * 10})}">{n}</a></td>'
+                     for n in range(1, min(pages, 10) + 1))
+    if page < pages and next_markup != "none":
+        next_href = f"/search?{urlencode({'q': query, 'start': page * 10})}"
+        link_id = ' id="pnnext"' if next_markup == "pnnext" else ""
+        footer += f'<td><a{link_id} href="{html.escape(next_href)}"><span>Next</span></a></td>'
+    return (f"<!DOCTYPE html><html><head><meta charset=\"UTF-8\"><title>{html.escape(query)} - Search</title></head>"
+            f"<body><div id=\"searchform\"><a href=\"/\">Search</a> <a href=\"https://accounts.google.com/ServiceLogin\">Sign in</a></div>"
+            f"<div id=\"search\"><div id=\"rso\">{''.join(blocks)}</div></div>"
+            f"<div id=\"foot\"><table><tr>{footer}</tr></table></div>"
+            f"<div id=\"footcnt\"><a href=\"https://policies.google.com/privacy\">Privacy</a></div></body></html>")
+
+
+def render_article(index, paragraphs):
+    body = "".join(f"<p>Paragraph {i} of article {index}. " + "Lorem ipsum dolor sit amet. " * 15 + "</p>"
+                   for i in range(paragraphs))
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(60))
+    sidebar = "".join(f'<div class="teaser"><a href="/article/{i}">Story {i}</a></div>' for i in range(100))
+    return (f"<!DOCTYPE html><html><head><title>Article {index}</title><script>{'var x = 1;' * 500}</script></head>"
+            f"<body><nav><ul>{nav}</ul></nav><main><article><h1>Article {index}</h1>{body}</article></main>"
+            f"<aside>{sidebar}</aside></body></html>")
+
+
+class FakeServerConfig:
+    """What the fake search engine and the static site serve"""
+
+    def __init__(self, pages=30, links=10, repeat=0.0, latency=0.0, captcha_every=0, captcha_pages=(),
+                 next_markup="pnnext", articles=300, paragraphs=20, link_style="direct"):
+        if next_markup not in NEXT_MARKUP:
+            raise ValueError(f"next_markup must be one of {', '.join(NEXT_MARKUP)}")
+        if link_style not in LINK_STYLES:
+            raise ValueError(f"link_style must be one of {', '.join(LINK_STYLES)}")
+        self.pages = pages
+        self.links = links
+        self.repeat = repeat
+        self.latency = latency
+        self.captcha_every = captcha_every
+        self.captcha_pages = set(captcha_pages)
+        self.next_markup = next_markup
+        self.articles = articles
+        self.paragraphs = paragraphs
+        self.link_style = link_style
+
+
+def query_name(data, offset=12):
+    """The name and the end offset of the question in a DNS query"""
+    labels = []
+    while data[offset]:
+        labels.append(data[offset + 1:offset + 1 + data[offset]].decode("ascii", "replace"))
+        offset += 1 + data[offset]
+    return ".".join(labels).lower(), offset + 1
+
+
+class StubDnsHandler(socketserver.BaseRequestHandler):
+    """Answers A queries for any name with 127.0.0.1 (see the module docstring for the exceptions)"""
+
+    def handle(self):
+        data, sock = self.request
+        try:
+            name, end = query_name(data)
+            qtype = struct.unpack_from("!H", data, end)[0]
+        except (IndexError, struct.error):
+            return
+        question = data[12:end + 4]
+        rcode, answers = 0, b""
+        if name.startswith("dead"):
+            rcode = 3
+        elif qtype == 1 and not name.startswith("noaddr"):
+            answers = struct.pack("!HHHIH", 0xC00C, 1, 1, 300, 4) + bytes([127, 0, 0, 1])
+        header = struct.pack("!HHHHHH", struct.unpack_from("!H", data)[0], 0x8180 | rcode, 1, 1 if answers else 0, 0, 0)
+        sock.sendto(header + question + answers, self.client_address)
+
+
+def start_stub_dns(port=0):
+    """Start the stub DNS server on a background thread; returns (server, "host:port")"""
+    server = socketserver.UDPServer(("127.0.0.1", port), StubDnsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+
+def make_handler(config):
+    lock = threading.Lock()
+    counts = {"requests": 0}
+    served_captcha = set()
+
+    class FakeHandler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self.do_GET(head=True)
+
+        def do_GET(self, head=False):
+            if config.latency:
+                time.sleep(config.latency)
+            parsed = urlparse(self.path)
+            host = self.headers.get("Host", "")
+            if parsed.path in ("/", "/home"):
+                self._home(parsed.path, host, head)
+            elif parsed.path == "/search":
+                self._search(parse_qs(parsed.query))
+            elif parsed.path.startswith("/article/") and parsed.path[9:].isdigit():
+                index = int(parsed.path[9:])
+                if index >= config.articles:
+                    self._send(404, "Not Found")
+                else:
+                    self._send(200, render_article(index, config.paragraphs))
+            else:
+                self._send(404, "Not Found")
+
+        def _home(self, path, host, head):
+            if head and host.startswith("nohead"):
+                self._send(405, "Method Not Allowed", head)
+            elif path == "/" and host.startswith("moved"):
+                self._send(301, "Moved", head, {"Location": "/home"})
+            else:
+                self._send(200, f"<html><body>Home of {html.escape(host)}</body></html>", head)
+
+        def _search(self, params):
+            query = params.get("q", [""])[0]
+            page = int(params.get("start", ["0"])[0]) // 10 + 1
+            if page > config.pages:
+                self._send(404, "Not Found")
+                return
+            with lock:
+                counts["requests"] += 1
+                # Every Nth request, and the first request for each listed page of a query, is a CAPTCHA
+                captcha = bool(config.captcha_every) and counts["requests"] % config.captcha_every == 0
+                if page in config.captcha_pages and (query, page) not in served_captcha:
+                    served_captcha.add((query, page))
+                    captcha = True
+            if captcha:
+                self._send(200, CAPTCHA_HTML)
+            else:
+                self._send(200, render_results(query, page, config.pages, config.links, config.repeat,
+                                               config.next_markup, config.link_style))
+
+        def _send(self, status, body, head=False, headers=None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeHandler
+
+
+def start_fake_servers(config, port=0):
+    """Start the search engine and the static site on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config), bind_and_activate=False)
+    # Room for many connections arriving at once (the liveness probe opens hundreds)
+    server.request_queue_size = 1024
+    server.server_bind()
+    server.server_activate()
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--pages", type=int, default=30, help="result pages per query")
+    parser.add_argument("--links", type=int, default=10, help="result links per page")
+    parser.add_argument("--repeat", type=float, default=0.0, help="share of each page repeating the previous page's domains")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--captcha-every", type=int, default=0, help="answer every Nth search with a CAPTCHA")
+    parser.add_argument("--captcha-page", type=int, action="append", default=[],
+                        help="answer the first request for this page of every query with a CAPTCHA (repeatable)")
+    parser.add_argument("--next", choices=NEXT_MARKUP, default="pnnext", help="markup of the Next link")
+    parser.add_argument("--link-style", choices=LINK_STYLES, default="direct",
+                        help="result links as plain URLs or wrapped in /url?q=")
+    parser.add_argument("--articles", type=int, default=300, help="article pages on the static site")
+    parser.add_argument("--paragraphs", type=int, default=20, help="paragraphs per article")
+
+
+def config_from_args(args):
+    return FakeServerConfig(args.pages, args.links, args.repeat, args.latency, args.captcha_every,
+                            args.captcha_page, args.next, args.articles, args.paragraphs, args.link_style)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--dns-port", type=int, help="also start the stub DNS server on this UDP port")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_servers(config_from_args(args), args.port)
+    print(f"Search engine at {base_url}/search, articles at {base_url}/article/0 .. /article/{args.articles - 1}")
+    if args.dns_port is not None:
+        _, nameserver = start_stub_dns(args.dns_port)
+        print(f"Stub DNS server at {nameserver}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Serve saved search result pages so the scrapers can run offline.
+
+    python benchmarks/fixture_server.py --port 8765
+    SCRAPER_SEARCH_URL=http://127.0.0.1:8765/search uvicorn app.main:app
+
+/search?...&start=N serves fixtures/serp/page{N/10 + 1}.html.
+"""
+import argparse
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "serp")
+
+
+def load_pages(fixture_dir=FIXTURE_DIR):
+    """Load page1.html, page2.html, ... in order"""
+    pages = []
+    while True:
+        path = os.path.join(fixture_dir, f"page{len(pages) + 1}.html")
+        if not os.path.exists(path):
+            return pages
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+
+
+def make_handler(pages, captcha_html, enablejs_html, captcha_page=None, require_js=False):
+    served_captcha = set()
+    lock = threading.Lock()
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path != "/search":
+                self._send(404, "Not Found")
+                return
+            start = int(parse_qs(parsed.query).get("start", ["0"])[0])
+            page = start // 10 + 1
+            if page > len(pages):
+                self._send(404, "Not Found")
+                return
+            if require_js:
+                self._send(200, enablejs_html)
+                return
+            with lock:
+                # The CAPTCHA is shown once per page, as if a human had solved it
+                show_captcha = page == captcha_page and page not in served_captcha
+                if show_captcha:
+                    served_captcha.add(page)
+            self._send(200, captcha_html if show_captcha else pages[page - 1])
+
+        def _send(self, status, body):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_fixture_server(port=0, fixture_dir=FIXTURE_DIR, captcha_page=None, require_js=False):
+    """Start the server on a background thread; returns (server, search_url)"""
+    with open(os.path.join(fixture_dir, "captcha.html"), encoding="utf-8") as f:
+        captcha_html = f.read()
+    with open(os.path.join(fixture_dir, "enablejs.html"), encoding="utf-8") as f:
+        enablejs_html = f.read()
+    handler = make_handler(load_pages(fixture_dir), captcha_html, enablejs_html, captcha_page, require_js)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/search"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="directory with page1.html, page2.html, ...")
+    parser.add_argument("--captcha-page", type=int, help="serve the CAPTCHA page the first time this page is requested")
+    parser.add_argument("--require-js", action="store_true", help="answer every search with a JavaScript-only page")
+    args = parser.parse_args()
+
+    server, search_url = start_fixture_server(args.port, args.fixtures, args.captcha_page, args.require_js)
+    print(f"Serving {args.fixtures} at {search_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
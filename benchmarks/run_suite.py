@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""End-to-end benchmarks against the local fake search engine and static site.
+
+Scenarios (each runs in its own process, so its peak RSS is its own):
+  domain_scraper  the web app's DomainScraper, --jobs concurrent TLDs over HTTP
+  cli             tld-domains-scraper.py in batch mode over HTTP
+  processor       tld-domain-processor/main.py on the static site's articles
+  db_insert       the web app's upsert_domains into a fresh SQLite database
+  probe           tld-domains-probe.py on --probe-domains domains (a tenth of them
+                  NXDOMAIN) against the stub DNS server and the fake site
+
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --scenarios cli,processor --latency 0.02
+    python benchmarks/run_suite.py --save-baseline
+
+Every scenario runs --runs times and the best run counts. Results are
+compared with benchmarks/baselines.json: a throughput more than --tolerance
+below its baseline, or a peak RSS more than --tolerance above, is flagged
+and makes the run exit with status 1. Baselines are only compared when they
+were recorded with the same workload options, and they depend on the
+machine; record your own with --save-baseline before comparing changes.
+Everything runs offline in a temporary directory; no real database or
+search engine is touched.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+WEBAPP_DIR = os.path.join(REPO_ROOT, "scrapper-web-app-dev")
+PROCESSOR_DIR = os.path.join(REPO_ROOT, "tld-domain-processor")
+CLI_SCRIPT = os.path.join(REPO_ROOT, "tld-domains-scraper.py")
+PROBE_SCRIPT = os.path.join(REPO_ROOT, "tld-domains-probe.py")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baselines.json")
+
+sys.path.insert(0, BENCH_DIR)
+
+from fake_servers import add_config_arguments, config_from_args, start_fake_servers, start_stub_dns
+
+SCENARIOS = ("domain_scraper", "cli", "processor", "db_insert", "probe")
+TLDS = (".ir", ".co.ir", ".ac.ir", ".org.ir", ".id.ir", ".sch.ir", ".net.ir", ".com")
+# Throughputs reported per scenario; all of them are "higher is better"
+RATES = {
+    "domain_scraper": ("pages_per_s", "domains_per_s"),
+    "cli": ("pages_per_s", "domains_per_s"),
+    "processor": ("pages_per_s",),
+    "db_insert": ("inserts_per_s", "updates_per_s"),
+    "probe": ("domains_per_s",),
+}
+
+
+# Child processes: run one scenario and print its counts as JSON
+
+
+def run_domain_scraper(args):
+    sys.path.insert(0, WEBAPP_DIR)
+    from app.services.scraper import DomainScraper
+
+    async def crawl():
+        scrapers = [DomainScraper(backend="http", search_url=args.search_url, max_pages=args.pages)
+                    for _ in range(args.jobs)]
+        results = await asyncio.gather(*(scraper.scrape_tld(tld) for scraper, tld in zip(scrapers, TLDS)))
+        return sum(scraper.state.page for scraper in scrapers), sum(len(domains) for domains in results)
+
+    started = time.perf_counter()
+    pages, domains = asyncio.run(crawl())
+    return {"seconds": time.perf_counter() - started, "pages": pages, "domains": domains}
+
+
+def run_db_insert(args):
+    sys.path.insert(0, WEBAPP_DIR)
+    from app.models import SessionLocal
+    from app.services.storage import upsert_domains
+
+    domains = [f"bench-{i}.ir" for i in range(args.rows)]
+    batches = [domains[i:i + args.batch] for i in range(0, len(domains), args.batch)]
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for batch in batches:
+            upsert_domains(db, batch, ".ir")
+        inserted = time.perf_counter() - started
+        # The same domains again: every row is already known and only gets last_seen refreshed
+        started = time.perf_counter()
+        for batch in batches:
+            upsert_domains(db, batch, ".ir")
+        updated = time.perf_counter() - started
+    finally:
+        db.close()
+    return {"seconds": inserted + updated, "rows": len(domains),
+            "inserts_per_s": len(domains) / inserted, "updates_per_s": len(domains) / updated}
+
+
+CHILD_SCENARIOS = {"domain_scraper": run_domain_scraper, "db_insert": run_db_insert}
+
+
+# Parent: start the servers, run every scenario as a child and compare
+
+
+def measure(command, workdir, env=None):
+    """Run a command to the end; returns (seconds, peak RSS in MB, stdout)"""
+    output_path = os.path.join(workdir, "output.log")
+    started = time.perf_counter()
+    with open(output_path, "w") as output:
+        process = subprocess.Popen(command, cwd=workdir, env=env, stdout=output, stderr=subprocess.STDOUT)
+        # wait4 gives the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - started
+    with open(output_path) as f:
+        text = f.read()
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(command[:2])} failed with status {process.returncode}:\n{text[-2000:]}")
+    # ru_maxrss is in KB on Linux
+    return seconds, usage.ru_maxrss / 1024, text
+
+
+def child_command(args, scenario):
+    return [sys.executable, os.path.abspath(__file__), "--child", scenario, "--search-url", args.search_url,
+            "--jobs", str(args.jobs), "--pages", str(args.pages), "--rows", str(args.rows), "--batch", str(args.batch)]
+
+
+def child_env():
+    env = dict(os.environ)
+    # No pacing: the fake engine never throttles
+    env.update({"SCRAPER_SERP_INTERVAL": "0.001", "SCRAPER_SERP_MIN_INTERVAL": "0.001", "PYTHONPATH": REPO_ROOT})
+    return env
+
+
+def bench_in_child(args, scenario, workdir):
+    _, peak_mb, output = measure(child_command(args, scenario), workdir, child_env())
+    result = json.loads(output.strip().splitlines()[-1])
+    result["peak_rss_mb"] = peak_mb
+    if "pages" in result:
+        result["pages_per_s"] = result["pages"] / result["seconds"]
+        result["domains_per_s"] = result["domains"] / result["seconds"]
+    return result
+
+
+def bench_cli(args, workdir):
+    with open(os.path.join(workdir, "catalog.txt"), "w") as f:
+        f.write("#Benchmark\n" + "\n".join(tld.upper() for tld in TLDS[:args.jobs]) + "\n")
+    command = [sys.executable, CLI_SCRIPT, "--catalog", "catalog.txt", "--workers", str(args.jobs),
+               "--backend", "http", "--min-delay", "0", "--max-delay", "0", "--max-pages", str(args.pages),
+               "--search-url", args.search_url, "--output-dir", "out"]
+    seconds, peak_mb, _ = measure(command, workdir, child_env())
+    pages = domains = 0
+    for name in os.listdir(os.path.join(workdir, "checkpoints")):
+        with open(os.path.join(workdir, "checkpoints", name)) as f:
+            state = json.load(f)
+        pages += state["page"]
+        domains += len(state["domains"])
+    return {"seconds": seconds, "pages": pages, "domains": domains, "peak_rss_mb": peak_mb,
+            "pages_per_s": pages / seconds, "domains_per_s": domains / seconds}
+
+
+def bench_processor(args, workdir):
+    with open(os.path.join(workdir, "domains.txt"), "w") as f:
+        f.writelines(f"{args.base_url}/article/{i}\n" for i in range(args.articles))
+    command = [sys.executable, os.path.join(PROCESSOR_DIR, "main.py"), "--domains", "domains.txt", "--no-cache",
+               "--store", "articles", "--per-host", "16", "--host-rate", "10000", "--rate", "0"]
+    seconds, peak_mb, _ = measure(command, workdir, child_env())
+    with sqlite3.connect(os.path.join(workdir, "articles", "index.sqlite")) as db:
+        saved = db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    return {"seconds": seconds, "pages": args.articles, "saved": saved, "peak_rss_mb": peak_mb,
+            "pages_per_s": args.articles / seconds}
+
+
+def bench_probe(args, workdir):
+    with open(os.path.join(workdir, "domains.txt"), "w") as f:
+        f.writelines(f"{'dead' if i % 10 == 0 else 'site'}-{i}.ir\n" for i in range(args.probe_domains))
+    port = args.base_url.rsplit(":", 1)[1]
+    command = [sys.executable, PROBE_SCRIPT, "--domains", "domains.txt", "--output", "probe.csv",
+               "--resolver", args.nameserver, "--http-port", port, "--concurrency", str(args.probe_concurrency)]
+    seconds, peak_mb, _ = measure(command, workdir, child_env())
+    with open(os.path.join(workdir, "probe.csv")) as f:
+        probed = sum(1 for _ in f) - 1
+    return {"seconds": seconds, "domains": probed, "peak_rss_mb": peak_mb, "domains_per_s": probed / seconds}
+
+
+def best(runs, scenario):
+    """The best of repeated runs: highest throughputs and lowest peak RSS"""
+    result = dict(runs[0])
+    for metric in RATES[scenario]:
+        result[metric] = max(run[metric] for run in runs)
+    result["peak_rss_mb"] = min(run["peak_rss_mb"] for run in runs)
+    result["seconds"] = min(run["seconds"] for run in runs)
+    return result
+
+
+def workload(args):
+    """The options that shape the work; baselines recorded with other values are not comparable"""
+    names = ("jobs", "rows", "batch", "pages", "links", "repeat", "latency", "captcha_every", "captcha_page",
+             "next", "link_style", "articles", "paragraphs", "probe_domains", "probe_concurrency")
+    return {name: getattr(args, name) for name in names}
+
+
+def compare(results, baselines, tolerance):
+    """Regressions against the baselines, as printable lines"""
+    regressions = []
+    for scenario, result in results.items():
+        baseline = baselines.get(scenario)
+        if not baseline:
+            continue
+        for metric in RATES[scenario]:
+            if metric in baseline and result[metric] < baseline[metric] * (1 - tolerance):
+                regressions.append(f"{scenario} {metric}: {result[metric]:.1f} vs. baseline {baseline[metric]:.1f}")
+        if "peak_rss_mb" in baseline and result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{scenario} peak_rss_mb: {result['peak_rss_mb']:.1f} "
+                               f"vs. baseline {baseline['peak_rss_mb']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--jobs", type=int, default=4, help=f"concurrent TLD crawls (at most {len(TLDS)})")
+    parser.add_argument("--rows", type=int, default=20000, help="domains written in the db_insert scenario")
+    parser.add_argument("--batch", type=int, default=500, help="domains per upsert in the db_insert scenario")
+    parser.add_argument("--probe-domains", type=int, default=5000, help="domains checked in the probe scenario")
+    parser.add_argument("--probe-concurrency", type=int, default=200, help="domains in flight in the probe scenario")
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario; the best one counts")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed change against the baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory")
+    add_config_arguments(parser)
+    parser.add_argument("--child", choices=tuple(CHILD_SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--search-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.jobs = max(1, min(args.jobs, len(TLDS)))
+
+    if args.child:
+        print(json.dumps(CHILD_SCENARIOS[args.child](args)))
+        return
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server, args.base_url = start_fake_servers(config_from_args(args))
+    dns_server, args.nameserver = start_stub_dns()
+    args.search_url = f"{args.base_url}/search"
+    root = tempfile.mkdtemp(prefix="tld-bench-")
+    results = {}
+    try:
+        print(f"{'scenario':<15} {'seconds':>8} {'pages/s':>9} {'domains/s':>10} {'rows/s':>9} {'peak RSS MB':>12}")
+        for scenario in scenarios:
+            runs = []
+            for run in range(args.runs):
+                workdir = os.path.join(root, f"{scenario}-{run + 1}")
+                os.makedirs(workdir)
+                if scenario == "cli":
+                    runs.append(bench_cli(args, workdir))
+                elif scenario == "processor":
+                    runs.append(bench_processor(args, workdir))
+                elif scenario == "probe":
+                    runs.append(bench_probe(args, workdir))
+                else:
+                    runs.append(bench_in_child(args, scenario, workdir))
+            result = results[scenario] = best(runs, scenario)
+            rows = result.get("inserts_per_s")
+            print(f"{scenario:<15} {result['seconds']:>8.2f} {result.get('pages_per_s', 0):>9.1f} "
+                  f"{result.get('domains_per_s', 0):>10.1f} {rows or 0:>9.0f} {result['peak_rss_mb']:>12.1f}")
+    finally:
+        server.shutdown()
+        dns_server.shutdown()
+        if args.keep:
+            print(f"Working directory: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+    same_workload = stored.get("workload") == workload(args)
+    baselines = stored.get("results", {}) if same_workload else {}
+    if args.save_baseline:
+        baselines.update({scenario: {metric: round(result[metric], 1) for metric in RATES[scenario] + ("peak_rss_mb",)}
+                          for scenario, result in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump({"workload": workload(args), "results": baselines}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baselines to {args.baseline}")
+        return
+    if stored and not same_workload:
+        print(f"Not comparing: {args.baseline} was recorded with other workload options")
+        return
+
+    regressions = compare(results, baselines, args.tolerance)
+    if regressions:
+        print(f"Regressions (more than {args.tolerance:.0%} worse than the baseline):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    if baselines:
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
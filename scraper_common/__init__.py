@@ -0,0 +1,4 @@
+# scraper_common/__init__.py
+# Code shared by the CLI scraper, the FastAPI app and the Flask app.
+# Both web apps put the repository root on sys.path so this package can be
+# imported without installing it.
@@ -0,0 +1,227 @@
+# scraper_common/browser.py
+import logging
+import os
+import platform
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import weakref
+from typing import Iterable, List, Optional
+
+from .metrics import DRIVER_STARTUP
+
+logger = logging.getLogger(__name__)
+
+# Where ChromeDriver and Chrome usually live; the first path that exists is used
+DRIVER_PATHS = {
+    "Darwin": ("/opt/homebrew/bin/chromedriver", "/usr/local/bin/chromedriver"),
+    "Linux": ("/usr/bin/chromedriver", "/usr/lib/chromium/chromedriver", "/usr/lib/chromium-browser/chromedriver"),
+    "Windows": ("C:\\Program Files\\ChromeDriver\\chromedriver.exe",),
+}
+BINARY_PATHS = {
+    "Darwin": ("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+               "/Applications/Chromium.app/Contents/MacOS/Chromium"),
+    "Linux": ("/usr/bin/google-chrome", "/usr/bin/chromium", "/usr/bin/chromium-browser"),
+    "Windows": ("C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",),
+}
+
+USER_AGENT = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+# URL patterns per resource type. Result pages only need their HTML; these never matter for link extraction.
+RESOURCE_PATTERNS = {
+    "image": ("*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif"),
+    "font": ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"),
+    "stylesheet": ("*.css",),
+    "media": ("*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg"),
+}
+DEFAULT_BLOCKED_TYPES = ("image", "font", "stylesheet", "media")
+# Ads and analytics on result pages and sites
+DEFAULT_BLOCKED_DOMAINS = ("doubleclick.net", "googlesyndication.com", "googletagmanager.com",
+                           "google-analytics.com", "googleadservices.com", "adservice.google.com")
+
+
+def _env_list(name: str, default: Iterable[str]) -> List[str]:
+    value = os.getenv(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _first_existing(paths: Iterable[str]) -> Optional[str]:
+    return next((path for path in paths if os.path.exists(path)), None)
+
+
+class DriverConfig:
+    """How Chrome is started: paths, window, page loading and what it may download.
+
+    debug_port is None (ChromeDriver picks its own connection, the default),
+    "auto" (a free port per browser) or a first port to try; every browser
+    gets its own port and its own throw-away profile directory (under
+    profile_root, or the temp directory), so several browsers can run side
+    by side.
+    """
+
+    def __init__(self, driver_path: Optional[str] = None, binary_path: Optional[str] = None,
+                 headless: bool = False, window_size: str = "800,600", user_agent: Optional[str] = USER_AGENT,
+                 page_load_strategy: str = "eager", blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+                 blocked_domains: Iterable[str] = DEFAULT_BLOCKED_DOMAINS, debug_port: Optional[str] = None,
+                 profile_root: Optional[str] = None, extra_arguments: Iterable[str] = ()):
+        system = platform.system()
+        self.driver_path = driver_path or _first_existing(DRIVER_PATHS.get(system, ()))
+        self.binary_path = binary_path or _first_existing(BINARY_PATHS.get(system, ()))
+        self.headless = headless
+        self.window_size = window_size
+        self.user_agent = user_agent
+        self.page_load_strategy = page_load_strategy
+        self.blocked_types = list(blocked_types)
+        self.blocked_domains = list(blocked_domains)
+        self.debug_port = debug_port
+        self.profile_root = profile_root
+        self.extra_arguments = list(extra_arguments)
+        unknown = set(self.blocked_types) - set(RESOURCE_PATTERNS)
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def from_env(cls, **overrides) -> "DriverConfig":
+        """Config from CHROME_* environment variables; keyword arguments win over the environment"""
+        settings = {
+            "driver_path": os.getenv("CHROMEDRIVER_PATH"),
+            "binary_path": os.getenv("CHROME_BINARY"),
+            "headless": os.getenv("CHROME_HEADLESS", "0").lower() in ("1", "true", "yes"),
+            "window_size": os.getenv("CHROME_WINDOW_SIZE", "800,600"),
+            "page_load_strategy": os.getenv("CHROME_PAGE_LOAD_STRATEGY", "eager"),
+            "blocked_types": _env_list("CHROME_BLOCK_RESOURCES", DEFAULT_BLOCKED_TYPES),
+            "blocked_domains": _env_list("CHROME_BLOCK_DOMAINS", DEFAULT_BLOCKED_DOMAINS),
+            "debug_port": os.getenv("CHROME_DEBUG_PORT") or None,
+            "profile_root": os.getenv("CHROME_PROFILE_ROOT") or None,
+            "extra_arguments": os.getenv("CHROME_ARGS", "").split(),
+        }
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**settings)
+
+    @property
+    def blocked_urls(self) -> List[str]:
+        """URL patterns for Network.setBlockedURLs"""
+        patterns = [pattern for kind in self.blocked_types for pattern in RESOURCE_PATTERNS[kind]]
+        return patterns + [f"*{domain}*" for domain in self.blocked_domains]
+
+
+_port_lock = threading.Lock()
+_ports_in_use = set()
+
+
+def _port_is_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+def allocate_port(setting: str) -> int:
+    """A debugging port nobody in this process or on the host is using"""
+    with _port_lock:
+        if setting == "auto":
+            while True:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.bind(("127.0.0.1", 0))
+                    port = sock.getsockname()[1]
+                if port not in _ports_in_use:
+                    break
+        else:
+            port = int(setting)
+            while port in _ports_in_use or not _port_is_free(port):
+                port += 1
+        _ports_in_use.add(port)
+        return port
+
+
+def _cleanup(port: Optional[int], profile_dir: Optional[str]):
+    with _port_lock:
+        _ports_in_use.discard(port)
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def chrome_options(config: DriverConfig, port: Optional[int] = None, profile_dir: Optional[str] = None):
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    if config.binary_path:
+        options.binary_location = config.binary_path
+    options.page_load_strategy = config.page_load_strategy
+    if config.headless:
+        options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={config.window_size}")
+    options.add_argument("--window-position=0,0")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--no-first-run")
+    if port:
+        options.add_argument(f"--remote-debugging-port={port}")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    if config.user_agent:
+        options.add_argument(f"--user-agent={config.user_agent}")
+    for argument in config.extra_arguments:
+        options.add_argument(argument)
+    return options
+
+
+def set_blocked_urls(driver, patterns: Iterable[str]):
+    """Block requests matching URL patterns in the browser (Chrome DevTools); other drivers are left alone"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+    except Exception as e:
+        logger.debug(f"Request blocking is not available: {e}")
+
+
+def pause_blocking(driver):
+    """Let everything load again, e.g. while a human solves a CAPTCHA"""
+    set_blocked_urls(driver, [])
+
+
+def resume_blocking(driver):
+    set_blocked_urls(driver, getattr(driver, "blocked_urls", ()))
+
+
+def launch_chrome(config: Optional[DriverConfig] = None, max_retries: int = 3):
+    """Start Chrome as configured, retrying failed launches"""
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.chrome.service import Service
+    from urllib3.exceptions import NewConnectionError
+
+    config = config or DriverConfig.from_env()
+    last_error = None
+    for attempt in range(1, max_retries + 1):
+        port = allocate_port(config.debug_port) if config.debug_port else None
+        if config.profile_root:
+            os.makedirs(config.profile_root, exist_ok=True)
+        profile_dir = tempfile.mkdtemp(prefix="chrome-profile-", dir=config.profile_root)
+        try:
+            # Without a configured path Selenium Manager (or PATH) finds chromedriver
+            service = Service(executable_path=config.driver_path) if config.driver_path else Service()
+            with DRIVER_STARTUP.time():
+                driver = webdriver.Chrome(service=service, options=chrome_options(config, port, profile_dir))
+        except (WebDriverException, NewConnectionError, socket.error) as e:
+            last_error = e
+            _cleanup(port, profile_dir)
+            logger.warning(f"Failed to start Chrome (attempt {attempt}/{max_retries}): {e}")
+            time.sleep(2)
+            continue
+        # The port and the throw-away profile are given back once the driver is gone
+        weakref.finalize(driver, _cleanup, port, profile_dir)
+        driver.debug_port = port
+        driver.blocked_urls = config.blocked_urls
+        resume_blocking(driver)
+        return driver
+    raise Exception(f"Failed to start Chrome after {max_retries} attempts. Last error: {last_error}")
@@ -0,0 +1,108 @@
+# scraper_common/bulk.py
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import bindparam, select, update
+
+UpsertResult = namedtuple("UpsertResult", ["inserted", "known"])
+
+# SQLite builds before 3.32 allow at most 999 bound parameters per statement
+SQLITE_MAX_VARIABLES = 999
+
+
+def dialect_insert(dialect: str):
+    """The dialect-specific insert() that supports ON CONFLICT"""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT inserts are not supported for the {dialect} dialect")
+    return insert
+
+
+def insert_columns(table, row: dict, seen_column: Optional[str] = None) -> set:
+    """The columns a multi-row INSERT binds a parameter for in every row.
+
+    Besides the row's own keys, SQLAlchemy binds a value for each column
+    with a Python-side default (e.g. default=datetime.utcnow) the row leaves
+    out, so those count towards SQLite's bound-parameter limit too.
+    """
+    columns = set(row)
+    if seen_column:
+        columns.add(seen_column)
+    columns.update(column.name for column in table.columns
+                   if column.default is not None or column.onupdate is not None)
+    return columns
+
+
+def bulk_upsert(session, table, rows: Iterable[dict], key: str, seen_column: Optional[str] = None,
+                chunk_size: int = 500) -> UpsertResult:
+    """Insert rows that are new and touch rows that already exist, in chunks.
+
+    Rows are matched on the unique column `key`. New rows are inserted with
+    INSERT ... ON CONFLICT DO NOTHING, so a row that another writer added in
+    the meantime is skipped instead of failing the whole batch. Rows that
+    already existed get `seen_column` set to the current time. Works on
+    SQLite and PostgreSQL; the caller commits.
+    """
+    table = getattr(table, "__table__", table)
+    key_column = table.c[key]
+    dialect = session.get_bind().dialect.name
+    insert = dialect_insert(dialect)
+
+    # Deduplicate on the key, keeping the first row for each value
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault(row[key], row)
+    rows = list(unique_rows.values())
+    if not rows:
+        return UpsertResult(0, 0)
+
+    if dialect == "sqlite":
+        columns = len(insert_columns(table, rows[0], seen_column))
+        chunk_size = max(1, min(chunk_size, SQLITE_MAX_VARIABLES // columns))
+
+    now = datetime.utcnow()
+    inserted = known = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk: List[dict] = rows[start:start + chunk_size]
+        keys = [row[key] for row in chunk]
+        existing = set(session.execute(select(key_column).where(key_column.in_(keys))).scalars())
+
+        chunk_inserted = 0
+        new_rows = [row for row in chunk if row[key] not in existing]
+        if new_rows:
+            if seen_column:
+                new_rows = [{seen_column: now, **row} for row in new_rows]
+            result = session.execute(insert(table).values(new_rows).on_conflict_do_nothing(index_elements=[key]))
+            chunk_inserted = result.rowcount
+
+        # Rows that were already there, or were inserted concurrently, count as known
+        inserted += chunk_inserted
+        known += len(chunk) - chunk_inserted
+        if existing and seen_column:
+            session.execute(update(table).where(key_column.in_(existing)).values({seen_column: now}))
+
+    return UpsertResult(inserted, known)
+
+
+def bulk_update(session, table, rows: Iterable[dict], key: str, chunk_size: int = 500) -> int:
+    """Write column values to existing rows, matched on the unique column `key`, one executemany per chunk.
+
+    Every row needs the same columns. Rows without a match are ignored;
+    returns the number of rows sent. The caller commits.
+    """
+    table = getattr(table, "__table__", table)
+    rows = list(rows)
+    if not rows:
+        return 0
+    # Bound parameter names must differ from the column names they set
+    columns = [column for column in rows[0] if column != key]
+    stmt = (update(table).where(table.c[key] == bindparam("_key"))
+            .values({column: bindparam(f"_{column}") for column in columns}))
+    for start in range(0, len(rows), chunk_size):
+        session.execute(stmt, [{"_key": row[key], **{f"_{column}": row[column] for column in columns}}
+                               for row in rows[start:start + chunk_size]])
+    return len(rows)
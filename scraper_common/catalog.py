@@ -0,0 +1,38 @@
+# scraper_common/catalog.py
+from collections import OrderedDict
+from typing import Dict, List
+
+UNGROUPED = "Ungrouped"
+
+
+def load_tld_catalog(path: str) -> Dict[str, List[str]]:
+    """Load a TLD catalog laid out like tlds.txt.
+
+    "#Country" lines start a group and every following non-empty line is a
+    TLD of that group. Returns an ordered mapping of group name to TLDs;
+    groups without TLDs (e.g. a country that has not been filled in yet) are
+    kept so callers can report them.
+    """
+    catalog = OrderedDict()
+    group = UNGROUPED
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                group = line.lstrip("#").strip() or UNGROUPED
+                catalog.setdefault(group, [])
+                continue
+            tld = line.split()[0]
+            if not tld.startswith("."):
+                tld = "." + tld
+            tlds = catalog.setdefault(group, [])
+            if tld not in tlds:
+                tlds.append(tld)
+    return catalog
+
+
+def country_code(tld: str) -> str:
+    """Return the country-level label of a TLD, e.g. "eg" for ".COM.EG" """
+    return tld.rstrip(".").rsplit(".", 1)[-1].lower()
@@ -0,0 +1,131 @@
+# scraper_common/checkpoint.py
+import json
+import os
+import re
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from .metrics import NEW_DOMAINS_PER_PAGE, PAGE_DOMAINS, STORE_WRITE
+
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+# Waiting for a CAPTCHA to be solved; the crawl continues from its checkpoint
+PARKED = "captcha"
+
+
+class StopRule:
+    """When a query has stopped paying off: `patience` result pages in a row with fewer than `min_new` new domains.
+
+    A patience of 0 never stops early.
+    """
+
+    def __init__(self, min_new: int = 1, patience: int = 2):
+        self.min_new = min_new
+        self.patience = patience
+
+    def dry(self, new: int) -> bool:
+        return new < self.min_new
+
+    def exhausted(self, dry_pages: int) -> bool:
+        return self.patience > 0 and dry_pages >= self.patience
+
+    def describe(self) -> str:
+        return f"{self.patience} pages in a row with fewer than {self.min_new} new domains"
+
+
+class CrawlState:
+    """Progress of one crawl: enough to continue from the last finished page"""
+
+    def __init__(self, tld: str, query: str, page: int = 0, next_url: Optional[str] = None,
+                 domains: Iterable[str] = (), status: str = RUNNING, error: Optional[str] = None,
+                 updated_at: Optional[str] = None, plan: Optional[dict] = None, dry_pages: int = 0,
+                 known: Iterable[str] = ()):
+        self.tld = tld
+        self.query = query
+        self.page = page
+        self.next_url = next_url
+        self.domains = set(domains)
+        self.status = status
+        self.error = error
+        self.updated_at = updated_at
+        self.plan = plan  # QueryPlanner state when the crawl is sharded over several queries
+        self.dry_pages = dry_pages  # Latest pages in a row that found too few new domains
+        # Domains stored by earlier crawls: found again they count as seen, not as new. Not checkpointed,
+        # the caller seeds them from its database or output files.
+        self.known = set(known)
+
+    @property
+    def resumable(self) -> bool:
+        return self.status != COMPLETED
+
+    def advance(self, next_url: Optional[str], domains: Iterable[str], stop_rule: Optional[StopRule] = None) -> int:
+        """Record a finished page; returns how many of its domains neither this crawl nor an earlier one had found"""
+        domains = set(domains)
+        new = len(domains - self.domains - self.known)
+        PAGE_DOMAINS.inc(new, result="new")
+        PAGE_DOMAINS.inc(len(domains) - new, result="duplicate")
+        NEW_DOMAINS_PER_PAGE.observe(new)
+        self.page += 1
+        self.next_url = next_url
+        self.domains.update(domains)
+        if stop_rule:
+            self.dry_pages = self.dry_pages + 1 if stop_rule.dry(new) else 0
+        return new
+
+    def to_dict(self) -> dict:
+        return {
+            "tld": self.tld,
+            "query": self.query,
+            "page": self.page,
+            "next_url": self.next_url,
+            "domains": sorted(self.domains),
+            "status": self.status,
+            "error": self.error,
+            "updated_at": self.updated_at,
+            "plan": self.plan,
+            "dry_pages": self.dry_pages,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CrawlState":
+        return cls(data["tld"], data["query"], data.get("page", 0), data.get("next_url"),
+                   data.get("domains", ()), data.get("status", RUNNING), data.get("error"),
+                   data.get("updated_at"), data.get("plan"), data.get("dry_pages", 0))
+
+
+class JsonCheckpointStore:
+    """One JSON file per crawl, rewritten atomically after every page"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", key.lower()).strip(".") or "crawl"
+        return os.path.join(self.directory, f"{name}.json")
+
+    def save(self, key: str, state: CrawlState):
+        state.updated_at = datetime.utcnow().isoformat()
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with STORE_WRITE.time(store="checkpoint"):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state.to_dict(), f)
+            os.replace(tmp_path, path)
+
+    def load(self, key: str) -> Optional[CrawlState]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return CrawlState.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def list(self) -> List[CrawlState]:
+        states = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    states.append(CrawlState.from_dict(json.load(f)))
+        return states
@@ -0,0 +1,280 @@
+# scraper_common/dns.py
+import asyncio
+import itertools
+import logging
+import random
+import socket
+import struct
+import time
+from collections import OrderedDict, namedtuple
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_AAAA = 28
+CLASS_IN = 1
+
+NOERROR = 0
+SERVFAIL = 2
+NXDOMAIN = 3
+
+FLAG_TRUNCATED = 0x0200
+FLAG_RECURSION_DESIRED = 0x0100
+
+# Used when there is no /etc/resolv.conf (e.g. on Windows)
+FALLBACK_NAMESERVERS = ("1.1.1.1", "8.8.8.8")
+
+# rcode: NOERROR, NXDOMAIN, ...; addresses: the A (or AAAA) records after following CNAMEs; ttl: seconds to cache it
+DnsAnswer = namedtuple("DnsAnswer", ["rcode", "addresses", "ttl"])
+
+
+class DnsError(Exception):
+    """No nameserver answered"""
+
+
+class TTLCache:
+    """Values that expire after their own TTL, with the least recently used dropped beyond max_entries"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+
+    def get(self, key: str):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        if ttl <= 0:
+            return
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def parse_nameserver(spec: str) -> Tuple[str, int]:
+    """'1.1.1.1', '127.0.0.1:5353', '::1' or '[::1]:5353' -> (host, port)"""
+    spec = spec.strip()
+    if spec.startswith("["):
+        host, _, port = spec[1:].partition("]")
+        return host, int(port.lstrip(":") or 53)
+    if spec.count(":") == 1:
+        host, port = spec.split(":")
+        return host, int(port)
+    return spec, 53
+
+
+def system_nameservers(path: str = "/etc/resolv.conf") -> List[str]:
+    """The nameservers the system uses"""
+    nameservers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    nameservers.append(fields[1].split("%")[0])
+    except OSError:
+        pass
+    return nameservers or list(FALLBACK_NAMESERVERS)
+
+
+def encode_name(name: str) -> bytes:
+    """A domain name in DNS wire format; raises ValueError for names DNS cannot carry"""
+    try:
+        labels = name.rstrip(".").encode("idna").split(b".")
+    except UnicodeError as e:
+        raise ValueError(f"Invalid domain name: {name!r}") from e
+    if not all(0 < len(label) < 64 for label in labels):
+        raise ValueError(f"Invalid domain name: {name!r}")
+    return b"".join(bytes([len(label)]) + label for label in labels) + b"\0"
+
+
+def build_query(query_id: int, name: str, qtype: int = TYPE_A) -> bytes:
+    header = struct.pack("!HHHHHH", query_id, FLAG_RECURSION_DESIRED, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack("!HH", qtype, CLASS_IN)
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:  # Compression pointer
+            return offset + 2
+        offset += 1 + length
+
+
+def parse_response(data: bytes, qtype: int = TYPE_A, negative_ttl: float = 300) -> Tuple[int, bool, DnsAnswer]:
+    """(query id, truncated, answer) of a response; raises ValueError if it is malformed"""
+    try:
+        query_id, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", data)
+        offset = 12
+        for _ in range(qdcount):
+            offset = _skip_name(data, offset) + 4
+        addresses, ttls = [], []
+        for _ in range(ancount):
+            offset = _skip_name(data, offset)
+            rtype, rclass, ttl, length = struct.unpack_from("!HHIH", data, offset)
+            offset += 10
+            rdata = data[offset:offset + length]
+            offset += length
+            if rclass != CLASS_IN:
+                continue
+            if rtype == qtype == TYPE_A and length == 4:
+                addresses.append(socket.inet_ntop(socket.AF_INET, rdata))
+            elif rtype == qtype == TYPE_AAAA and length == 16:
+                addresses.append(socket.inet_ntop(socket.AF_INET6, rdata))
+            elif rtype != TYPE_CNAME:
+                continue
+            ttls.append(ttl)
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Malformed DNS response: {e}") from e
+    rcode = flags & 0x000F
+    ttl = min(ttls) if addresses else negative_ttl
+    return query_id, bool(flags & FLAG_TRUNCATED), DnsAnswer(rcode, addresses, ttl)
+
+
+class _NameserverProtocol(asyncio.DatagramProtocol):
+    """One UDP socket to a nameserver; answers are matched to queries by their id"""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        future = self.pending.pop(struct.unpack_from("!H", data)[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable; the queries in flight time out and are retried elsewhere
+        logger.debug(f"Nameserver socket error: {exc}")
+
+    def connection_lost(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(DnsError("Nameserver socket closed"))
+        self.pending.clear()
+
+
+class Nameserver:
+    def __init__(self, spec: str, limit: int):
+        self.host, self.port = parse_nameserver(spec)
+        self.limit = limit
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.protocol: Optional[_NameserverProtocol] = None
+        self._opening: Optional[asyncio.Lock] = None
+
+    async def connect(self) -> _NameserverProtocol:
+        if self._opening is None:
+            self._opening = asyncio.Lock()
+            self.semaphore = asyncio.Semaphore(self.limit)
+        async with self._opening:
+            if self.protocol is None or self.protocol.transport is None or self.protocol.transport.is_closing():
+                loop = asyncio.get_running_loop()
+                _, self.protocol = await loop.create_datagram_endpoint(_NameserverProtocol,
+                                                                       remote_addr=(self.host, self.port))
+        return self.protocol
+
+    def close(self):
+        if self.protocol is not None and self.protocol.transport is not None:
+            self.protocol.transport.close()
+        # Opened again, on whatever event loop is running then
+        self.protocol = None
+        self._opening = None
+
+
+class AsyncResolver:
+    """Resolve many names at once over UDP, spread over several nameservers.
+
+    Each nameserver gets one socket with at most per_nameserver queries in
+    flight. A query that times out or gets SERVFAIL is retried on the next
+    nameserver, and a truncated answer is asked again over TCP. Answers are
+    cached for their TTL (at most max_ttl), NXDOMAIN and empty answers for
+    negative_ttl.
+    """
+
+    def __init__(self, nameservers: Optional[Iterable[str]] = None, per_nameserver: int = 256, timeout: float = 2.0,
+                 retries: int = 2, max_ttl: float = 3600, negative_ttl: float = 300,
+                 cache: Optional[TTLCache] = None):
+        self.nameservers = [Nameserver(spec, per_nameserver) for spec in (nameservers or system_nameservers())]
+        self.timeout = timeout
+        self.retries = retries
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = cache if cache is not None else TTLCache()
+        self._next = itertools.count()
+
+    async def resolve(self, name: str, qtype: int = TYPE_A) -> DnsAnswer:
+        """The answer for a name; raises DnsError when no nameserver answers and ValueError for invalid names"""
+        name = name.lower().rstrip(".")
+        key = f"{qtype}:{name}"
+        answer = self.cache.get(key)
+        if answer is not None:
+            return answer
+        encode_name(name)
+        first = next(self._next)
+        answer, error = None, None
+        for attempt in range(self.retries + 1):
+            nameserver = self.nameservers[(first + attempt) % len(self.nameservers)]
+            try:
+                answer = await self._query(nameserver, name, qtype)
+            except (DnsError, OSError, ValueError, asyncio.TimeoutError) as e:
+                error = str(e) or "timed out"
+                continue
+            if answer.rcode != SERVFAIL:
+                break
+        if answer is None:
+            raise DnsError(f"No answer for {name}: {error or 'timed out'}")
+        self.cache.set(key, answer, min(answer.ttl, self.max_ttl))
+        return answer
+
+    async def _query(self, nameserver: Nameserver, name: str, qtype: int) -> DnsAnswer:
+        protocol = await nameserver.connect()
+        async with nameserver.semaphore:
+            query_id = random.randrange(65536)
+            while query_id in protocol.pending:
+                query_id = random.randrange(65536)
+            future = asyncio.get_running_loop().create_future()
+            protocol.pending[query_id] = future
+            try:
+                protocol.transport.sendto(build_query(query_id, name, qtype))
+                data = await asyncio.wait_for(future, self.timeout)
+            finally:
+                protocol.pending.pop(query_id, None)
+            _, truncated, answer = parse_response(data, qtype, self.negative_ttl)
+            if truncated:
+                answer = await asyncio.wait_for(self._query_tcp(nameserver, name, qtype), self.timeout)
+            return answer
+
+    async def _query_tcp(self, nameserver: Nameserver, name: str, qtype: int) -> DnsAnswer:
+        reader, writer = await asyncio.open_connection(nameserver.host, nameserver.port)
+        try:
+            query = build_query(random.randrange(65536), name, qtype)
+            writer.write(struct.pack("!H", len(query)) + query)
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+            _, _, answer = parse_response(await reader.readexactly(length), qtype, self.negative_ttl)
+            return answer
+        finally:
+            writer.close()
+
+    def close(self):
+        for nameserver in self.nameservers:
+            nameserver.close()
@@ -0,0 +1,214 @@
+# scraper_common/domains.py
+import os
+import threading
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+# Registrable domain plus the pieces around it, all lower-case ASCII (IDNA):
+# "https://www.shop.example.co.ir/x" -> host "www.shop.example.co.ir",
+# subdomain "www.shop", domain "example.co.ir", suffix "co.ir".
+# domain is None when the host is itself a public suffix or not a domain name.
+DomainParts = namedtuple("DomainParts", ["host", "subdomain", "domain", "suffix"])
+
+BUNDLED_PSL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat")
+
+_TERMINAL = 0  # node is the end of a rule
+_EXCEPTION = 1  # node is the end of an exception ("!") rule
+
+
+def to_ascii(name: str) -> str:
+    """Lower-case a host name and convert internationalized labels to punycode"""
+    name = name.strip().rstrip(".").lower()
+    if name.isascii():
+        return name
+    try:
+        return name.encode("idna").decode("ascii")
+    except UnicodeError:
+        # Labels the IDNA 2003 codec rejects are kept as they are; they simply won't match a rule
+        return name
+
+
+def to_unicode(name: str) -> str:
+    """Inverse of to_ascii, for display"""
+    if "xn--" not in name:
+        return name
+    try:
+        return name.encode("ascii").decode("idna")
+    except UnicodeError:
+        return name
+
+
+class SuffixTrie:
+    """Public suffix rules in a trie keyed by labels from the right.
+
+    Nodes are plain dicts from label to child node; the integer keys
+    _TERMINAL and _EXCEPTION mark where rules end. Lookups walk at most as
+    many nodes as the host has labels.
+    """
+
+    def __init__(self, rules: Iterable[str] = ()):
+        self.root: Dict = {}
+        self.rules = 0
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def from_file(cls, path: str) -> "SuffixTrie":
+        """Load a file in public_suffix_list.dat format"""
+        with open(path, encoding="utf-8") as f:
+            return cls(f)
+
+    def add(self, rule: str):
+        rule = rule.split()[0] if rule.strip() else ""
+        if not rule or rule.startswith("//"):
+            return
+        exception = rule.startswith("!")
+        labels = [label if label == "*" else to_ascii(label) for label in rule.lstrip("!").split(".")]
+        node = self.root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        node[_EXCEPTION if exception else _TERMINAL] = True
+        self.rules += 1
+
+    def children(self, zone: str) -> List[str]:
+        """Public suffixes one label below a zone, e.g. "co.ir" and "ac.ir" for ".ir" """
+        zone = to_ascii(zone).strip(".")
+        node = self.root
+        for label in reversed(zone.split(".")):
+            node = node.get(label)
+            if node is None:
+                return []
+        return sorted(f"{label}.{zone}" for label, child in node.items()
+                      if isinstance(label, str) and label != "*" and _TERMINAL in child)
+
+    def suffix_labels(self, labels: List[str]) -> int:
+        """Number of trailing labels that form the public suffix (the implicit "*" rule gives at least 1)"""
+        best = 1
+        node = self.root
+        for depth, label in enumerate(reversed(labels), 1):
+            wildcard = node.get("*")
+            if wildcard is not None and _TERMINAL in wildcard:
+                best = max(best, depth)
+            child = node.get(label)
+            if child is None:
+                break
+            if _EXCEPTION in child:
+                return depth - 1
+            if _TERMINAL in child:
+                best = max(best, depth)
+            node = child
+        return best
+
+
+def host_of(url: str) -> Optional[str]:
+    """Host part of a URL (or of a bare host name) without parsing the rest of it"""
+    start = url.find("://")
+    start = start + 3 if start != -1 else (2 if url.startswith("//") else 0)
+    end = len(url)
+    for sep in "/?#":
+        pos = url.find(sep, start, end)
+        if pos != -1:
+            end = pos
+    host = url[start:end]
+    at = host.rfind("@")
+    if at != -1:
+        host = host[at + 1:]
+    if host.startswith("["):
+        return None  # IPv6 literal
+    colon = host.find(":")
+    if colon != -1:
+        host = host[:colon]
+    return host or None
+
+
+def _is_ipv4(host: str) -> bool:
+    parts = host.split(".")
+    return len(parts) == 4 and all(part.isdigit() for part in parts)
+
+
+class DomainNormalizer:
+    """Split hosts into subdomain, registrable domain and public suffix"""
+
+    def __init__(self, trie: SuffixTrie):
+        self.trie = trie
+
+    def split_host(self, host: str, tld: Optional[str] = None) -> Optional[DomainParts]:
+        """Split a host name; with tld, the registrable domain is never shallower than one label under it.
+
+        That covers zones the public suffix list does not know about, such as
+        a requested ".gov.sd" when the list only has "sd".
+        """
+        host = to_ascii(host)
+        if not host or _is_ipv4(host):
+            return None
+        labels = host.split(".")
+        if "" in labels:
+            return None
+
+        suffix_len = self.trie.suffix_labels(labels)
+        if tld:
+            tld_labels = to_ascii(tld).lstrip(".").split(".")
+            if len(tld_labels) > suffix_len and labels[-len(tld_labels):] == tld_labels:
+                suffix_len = len(tld_labels)
+
+        suffix = ".".join(labels[-suffix_len:])
+        if len(labels) <= suffix_len:
+            return DomainParts(host, "", None, suffix)
+        return DomainParts(host, ".".join(labels[:-suffix_len - 1]), ".".join(labels[-suffix_len - 1:]), suffix)
+
+    def parse(self, url: str, tld: Optional[str] = None) -> Optional[DomainParts]:
+        """Split the host of a URL; None for URLs without a usable host name"""
+        host = host_of(url.strip())
+        return self.split_host(host, tld) if host else None
+
+    def registrable_domain(self, url: str, tld: Optional[str] = None) -> Optional[str]:
+        parts = self.parse(url, tld)
+        return parts.domain if parts else None
+
+    def normalize_batch(self, urls: Iterable[str], tld: Optional[str] = None) -> List[Optional[str]]:
+        """registrable_domain() for many URLs; hosts repeat a lot, so each is only split once"""
+        cache: Dict[str, Optional[str]] = {}
+        results = []
+        append = results.append
+        for url in urls:
+            host = host_of(url.strip())
+            if host is None:
+                append(None)
+                continue
+            domain = cache.get(host, cache)
+            if domain is cache:
+                parts = self.split_host(host, tld)
+                domain = cache[host] = parts.domain if parts else None
+            append(domain)
+        return results
+
+
+def in_zone(host: str, tld: str) -> bool:
+    """Exact suffix match: host is tld or below it on a label boundary ("x.ir" is in ".ir", "x.irx.com" is not)"""
+    host = to_ascii(host)
+    zone = to_ascii(tld).lstrip(".")
+    return host == zone or host.endswith("." + zone)
+
+
+_default: Optional[DomainNormalizer] = None
+_default_lock = threading.Lock()
+
+
+def default_normalizer() -> DomainNormalizer:
+    """Shared normalizer built from SCRAPER_PSL_PATH, or the bundled ICANN suffix list"""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = DomainNormalizer(SuffixTrie.from_file(os.getenv("SCRAPER_PSL_PATH") or BUNDLED_PSL_PATH))
+    return _default
+
+
+def registrable_domain(url: str, tld: Optional[str] = None) -> Optional[str]:
+    """Registrable domain of a URL using the default suffix list, e.g. "https://www.x.co.ir/a" -> "x.co.ir" """
+    return default_normalizer().registrable_domain(url, tld)
+
+
+def normalize_batch(urls: Iterable[str], tld: Optional[str] = None) -> List[Optional[str]]:
+    """Registrable domains of many URLs using the default suffix list"""
+    return default_normalizer().normalize_batch(urls, tld)
@@ -0,0 +1,116 @@
+# scraper_common/export.py
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import select
+
+CONTENT_TYPES = {
+    "txt": "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+# Rows are fetched from the database this many at a time
+DEFAULT_CHUNK_SIZE = 1000
+# Serialized rows are buffered up to roughly this many bytes per response chunk
+FLUSH_BYTES = 64 * 1024
+
+
+def export_select(table, fields: Sequence[str], tld: Optional[str] = None, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, since_id: Optional[int] = None,
+                  tld_column: str = "tld", date_column: str = "created_at", id_column: str = "id"):
+    """Build the export query; the id column is always selected first so rows can be paged on it"""
+    table = getattr(table, "__table__", table)
+    id_col = table.c[id_column]
+    stmt = select(id_col, *[table.c[field] for field in fields])
+    if tld:
+        stmt = stmt.where(table.c[tld_column] == tld)
+    if start:
+        stmt = stmt.where(table.c[date_column] >= start)
+    if end:
+        stmt = stmt.where(table.c[date_column] < end)
+    if since_id is not None:
+        stmt = stmt.where(id_col > since_id)
+    return stmt.order_by(id_col)
+
+
+def iter_rows(session, stmt, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple]:
+    """Yield the rows of an export_select() query, reading chunk_size rows per round trip.
+
+    Paging continues from the last id seen (keyset pagination), so every
+    chunk is an index range scan no matter how deep into the table it is,
+    and only one chunk is held in memory at a time.
+    """
+    id_col = stmt.selected_columns[0]
+    last_id = None
+    while True:
+        page = stmt if last_id is None else stmt.where(id_col > last_id)
+        rows = session.execute(page.limit(chunk_size)).all()
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row[1:])
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize_rows(rows: Iterable[tuple], fmt: str, fields: Sequence[str]) -> Iterator[bytes]:
+    """Encode rows as txt (first field only), csv (with header) or jsonl, in buffered byte chunks"""
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(CONTENT_TYPES)}")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(fields)
+
+    for row in rows:
+        if fmt == "txt":
+            buffer.write(f"{row[0]}\n")
+        elif fmt == "csv":
+            writer.writerow(["" if value is None else value.isoformat() if isinstance(value, datetime) else value
+                             for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(fields, row)), default=_json_default) + "\n")
+
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream into a gzip stream without buffering it whole"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(session, stmt, fmt: str, fields: Sequence[str], compress: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream the rows of stmt as an encoded (and optionally gzipped) file body"""
+    chunks = serialize_rows(iter_rows(session, stmt, chunk_size), fmt, fields)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(prefix: str, fmt: str, compress: bool = False) -> str:
+    """Timestamped download name, e.g. domains_ir_20240101_120000.csv.gz"""
+    name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return name + ".gz" if compress else name
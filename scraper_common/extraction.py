@@ -0,0 +1,124 @@
+# scraper_common/extraction.py
+from collections import namedtuple
+from typing import Iterable, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .domains import host_of, in_zone, to_ascii
+
+# One result link: absolute href, anchor text and its index among the page's anchors
+Link = namedtuple("Link", ["href", "text", "position"])
+
+DEFAULT_EXCLUDES = ("translate.google.com",)
+
+# Redirect paths the engine wraps result links in when the page is rendered
+# without JavaScript, and the parameter that carries the target
+REDIRECT_PARAMS = {"/url": ("q", "url"), "/interstitial": ("url",)}
+
+# Collects every link of the page plus the navigation state in a single
+# WebDriver round trip. Links are filtered in the browser so only matches
+# are serialized back to Python.
+EXTRACT_PAGE_JS = """
+var opts = arguments[0] || {};
+var zone = (opts.include || '').toLowerCase();
+var exclude = opts.exclude || [];
+var anchors = document.getElementsByTagName('a');
+var links = [];
+var next = document.getElementById('pnnext');
+var redirects = {'/url': ['q', 'url'], '/interstitial': ['url']};
+function unwrap(a) {
+    // The target of an engine redirect such as /url?q=<target>, as in unwrap_redirect()
+    var names = redirects[a.pathname];
+    if (!names || a.hostname !== location.hostname) return a.href;
+    var params = new URLSearchParams(a.search);
+    for (var k = 0; k < names.length; k++) {
+        var target = params.get(names[k]);
+        if (target && /^https?:[/][/]/i.test(target)) return target;
+    }
+    return a.href;
+}
+for (var i = 0; i < anchors.length; i++) {
+    var a = anchors[i];
+    if (!a.href || typeof a.href !== 'string') continue;
+    var href = unwrap(a);
+    var text = (a.innerText || a.textContent || '').trim();
+    if (!next && text.indexOf('Next') !== -1) next = a;
+    if (zone) {
+        // Exact zone match on the host, not a substring test on the whole URL
+        var url;
+        try { url = new URL(href); } catch (e) { continue; }
+        if (url.protocol !== 'http:' && url.protocol !== 'https:') continue;
+        var host = (url.hostname || '').toLowerCase().replace(/\.$/, '');
+        if (host !== zone && host.slice(-zone.length - 1) !== '.' + zone) continue;
+    }
+    var skip = false;
+    for (var j = 0; j < exclude.length; j++) {
+        if (href.indexOf(exclude[j]) !== -1) { skip = true; break; }
+    }
+    if (skip) continue;
+    links.push([href, text, i]);
+}
+return {
+    links: links,
+    next: next && next.href ? next.href : null,
+    captcha: document.querySelector("div#captcha, iframe[src*='recaptcha']") !== null,
+    has_results: document.querySelector('div.g') !== null
+};
+"""
+
+
+class LinkFilter:
+    """Keep http(s) links whose host is in the TLD's zone and that contain none of the excluded substrings"""
+
+    def __init__(self, include: str = "", exclude: Iterable[str] = DEFAULT_EXCLUDES):
+        # Stored the way browsers report a.hostname: lower-case punycode, no leading dot
+        self.include = to_ascii(include).lstrip(".")
+        self.exclude = tuple(exclude)
+
+    def matches(self, href: str) -> bool:
+        if self.include:
+            if not href.lower().startswith(("http://", "https://")):
+                return False
+            host = host_of(href)
+            if not host or not in_zone(host, self.include):
+                return False
+        return not any(pattern in href for pattern in self.exclude)
+
+    def to_js(self) -> dict:
+        return {"include": self.include, "exclude": list(self.exclude)}
+
+
+def unwrap_redirect(href: str, engine_host: Optional[str] = None) -> str:
+    """The target of an engine redirect such as /url?q=<target>&sa=U; other links are returned unchanged.
+
+    Only links on engine_host (the results page's host) are unwrapped, so a
+    result site that happens to have a /url path keeps its own link.
+    """
+    parts = urlsplit(href)
+    names = REDIRECT_PARAMS.get(parts.path)
+    if not names or (engine_host and (parts.hostname or "") != engine_host):
+        return href
+    params = parse_qs(parts.query)
+    for name in names:
+        target = params.get(name, [""])[0]
+        if target.lower().startswith(("http://", "https://")):
+            return target
+    return href
+
+
+def filter_links(links: Iterable[Link], link_filter: Optional[LinkFilter]) -> List[Link]:
+    """Apply a LinkFilter to links parsed outside the browser"""
+    if link_filter is None:
+        return list(links)
+    return [link for link in links if link.href and link_filter.matches(link.href)]
+
+
+def extract_page(driver, link_filter: Optional[LinkFilter] = None) -> dict:
+    """Return the page's links (filtered in the browser), "Next" URL and CAPTCHA/result markers"""
+    data = driver.execute_script(EXTRACT_PAGE_JS, link_filter.to_js() if link_filter else {})
+    data["links"] = [Link(href, text, position) for href, text, position in data["links"]]
+    return data
+
+
+def extract_links(driver, link_filter: Optional[LinkFilter] = None) -> List[Link]:
+    """Return the page's links in one WebDriver call instead of one call per element"""
+    return extract_page(driver, link_filter)["links"]
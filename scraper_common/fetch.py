@@ -0,0 +1,326 @@
+# scraper_common/fetch.py
+from html.parser import HTMLParser
+from typing import Callable, List, Optional
+from urllib.parse import urljoin, urlencode, urlsplit
+import logging
+import time
+
+from .extraction import Link, LinkFilter, extract_page, filter_links, unwrap_redirect
+from .metrics import CAPTCHAS, LINK_EXTRACTION, PAGE_LOAD, PAGES
+from .ratelimit import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_SEARCH_URL = "https://www.google.com/search"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+CAPTCHA_XPATH = "//div[@id='captcha'] | //iframe[contains(@src, 'recaptcha')]"
+RESULT_CSS = "div.g"
+
+
+def build_search_url(query: str, search_url: str = GOOGLE_SEARCH_URL, params: Optional[dict] = None) -> str:
+    """Build the results page URL for a search query, with extra parameters such as lr=lang_fa"""
+    return f"{search_url}?{urlencode({'q': query, **(params or {})})}"
+
+
+class SerpPage:
+    """Links and navigation state extracted from one results page"""
+
+    def __init__(self, url: str, links: List[Link], next_url: Optional[str] = None,
+                 captcha: bool = False, has_results: bool = True, needs_js: bool = False,
+                 backend: str = ""):
+        self.url = url
+        self.links = links
+        self.next_url = next_url
+        self.captcha = captcha
+        self.has_results = has_results
+        self.needs_js = needs_js
+        self.backend = backend
+
+    def __repr__(self):
+        return (f"SerpPage(url={self.url!r}, links={len(self.links)}, next_url={self.next_url!r}, "
+                f"captcha={self.captcha}, has_results={self.has_results}, needs_js={self.needs_js})")
+
+
+class SerpParser(HTMLParser):
+    """Single-pass parser that pulls links, the "Next" link and CAPTCHA markers out of a results page.
+
+    Result links wrapped in the engine's /url?q= redirect (as served to
+    clients without JavaScript) are replaced by their targets.
+    """
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.engine_host = urlsplit(base_url).hostname
+        self.links: List[Link] = []
+        self.next_url: Optional[str] = None
+        self.captcha = False
+        self.has_results = False
+        self.needs_js = False
+        self._anchor_href: Optional[str] = None
+        self._anchor_text: List[str] = []
+        self._anchor_position = 0
+        self._anchors = 0
+        self._in_noscript = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a":
+            href = attrs.get("href")
+            self._anchor_href = unwrap_redirect(urljoin(self.base_url, href), self.engine_host) if href else None
+            self._anchor_text = []
+            self._anchor_position = self._anchors
+            self._anchors += 1
+            if self._anchor_href and attrs.get("id") == "pnnext" and self.next_url is None:
+                self.next_url = self._anchor_href
+        elif tag == "div":
+            if attrs.get("id") == "captcha":
+                self.captcha = True
+            if "g" in (attrs.get("class") or "").split():
+                self.has_results = True
+        elif tag == "iframe":
+            if "recaptcha" in (attrs.get("src") or ""):
+                self.captcha = True
+        elif tag == "noscript":
+            self._in_noscript = True
+        elif tag == "meta" and self._in_noscript:
+            if "enablejs" in (attrs.get("content") or ""):
+                self.needs_js = True
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            if self._anchor_href:
+                text = " ".join("".join(self._anchor_text).split())
+                self.links.append(Link(self._anchor_href, text, self._anchor_position))
+                if self.next_url is None and "Next" in text:
+                    self.next_url = self._anchor_href
+            self._anchor_href = None
+        elif tag == "noscript":
+            self._in_noscript = False
+
+    def handle_data(self, data):
+        if self._anchor_href is not None:
+            self._anchor_text.append(data)
+        if self._in_noscript and "javascript" in data.lower():
+            self.needs_js = True
+
+
+def parse_serp(html: str, url: str, backend: str = "http",
+               link_filter: Optional[LinkFilter] = None) -> SerpPage:
+    """Parse a results page into a SerpPage, keeping only links accepted by link_filter"""
+    parser = SerpParser(url)
+    parser.feed(html)
+    parser.close()
+    # A page with results is usable even if it carries a <noscript> banner
+    needs_js = parser.needs_js and not parser.has_results and not parser.captcha
+    return SerpPage(url, filter_links(parser.links, link_filter), parser.next_url, parser.captcha,
+                    parser.has_results, needs_js, backend)
+
+
+class FetchBackend:
+    """Interface for fetching results pages"""
+
+    name = "base"
+
+    @property
+    def driver(self):
+        """Browser session a human can solve a CAPTCHA in, if the backend has one"""
+        return None
+
+    def fetch(self, url: str, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        raise NotImplementedError
+
+    def reload(self, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        """Re-read the current page, e.g. after a CAPTCHA was solved"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HttpFetchBackend(FetchBackend):
+    """Fetch results pages with a plain HTTP client and parse them without a browser"""
+
+    name = "http"
+
+    def __init__(self, session=None, timeout: float = 15.0, headers: Optional[dict] = None):
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(headers or DEFAULT_HEADERS)
+        self.session = session
+        self.timeout = timeout
+        self._last_url: Optional[str] = None
+
+    def fetch(self, url: str, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        self._last_url = url
+        with PAGE_LOAD.time(backend=self.name):
+            response = self.session.get(url, timeout=self.timeout)
+        PAGES.inc(backend=self.name)
+        # Google answers rate limited clients with a 429 or a redirect to /sorry/
+        if response.status_code == 429 or "/sorry/" in response.url:
+            CAPTCHAS.inc(backend=self.name)
+            return SerpPage(response.url, [], captcha=True, has_results=False, backend=self.name)
+        response.raise_for_status()
+        with LINK_EXTRACTION.time(backend=self.name):
+            page = parse_serp(response.text, response.url, self.name, link_filter)
+        if page.captcha:
+            CAPTCHAS.inc(backend=self.name)
+        return page
+
+    def reload(self, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        return self.fetch(self._last_url, link_filter)
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetchBackend(FetchBackend):
+    """Fetch results pages in Chrome; the driver is only started on first use"""
+
+    name = "selenium"
+
+    def __init__(self, driver_factory: Callable, timeout: float = 10.0, release: Optional[Callable] = None):
+        self.driver_factory = driver_factory
+        self.timeout = timeout
+        # release(driver, pages) hands a borrowed driver back instead of quitting it
+        self.release = release
+        self.pages = 0
+        self._driver = None
+
+    @property
+    def driver(self):
+        return self._driver
+
+    def _ensure_driver(self):
+        if self._driver is None:
+            self._driver = self.driver_factory()
+            self.pages = 0
+        return self._driver
+
+    def fetch(self, url: str, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        driver = self._ensure_driver()
+        with PAGE_LOAD.time(backend=self.name):
+            driver.get(url)
+        self.pages += 1
+        PAGES.inc(backend=self.name)
+        page = self.reload(link_filter)
+        if page.captcha:
+            CAPTCHAS.inc(backend=self.name)
+        return page
+
+    def reload(self, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        driver = self._ensure_driver()
+        try:
+            WebDriverWait(driver, self.timeout).until(EC.any_of(
+                EC.presence_of_element_located((By.CSS_SELECTOR, RESULT_CSS)),
+                EC.presence_of_element_located((By.XPATH, CAPTCHA_XPATH)),
+            ))
+        except TimeoutException:
+            pass
+
+        with LINK_EXTRACTION.time(backend=self.name):
+            page = extract_page(driver, link_filter)
+        return SerpPage(driver.current_url, page["links"], page["next"], page["captcha"],
+                        page["has_results"], False, self.name)
+
+    def close(self):
+        if self._driver:
+            driver, self._driver = self._driver, None
+            if self.release:
+                self.release(driver, self.pages)
+                return
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class FallbackFetchBackend(FetchBackend):
+    """Use the primary backend and switch to the fallback when a page needs JavaScript or a CAPTCHA is hit.
+
+    The switch is sticky: once the browser holds the session (and any solved
+    CAPTCHA cookies) the remaining pages are fetched with it as well.
+    """
+
+    name = "auto"
+
+    def __init__(self, primary: FetchBackend, fallback: FetchBackend):
+        self.primary = primary
+        self.fallback = fallback
+        self.active = primary
+
+    @property
+    def driver(self):
+        return self.fallback.driver
+
+    def fetch(self, url: str, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        if self.active is self.primary:
+            try:
+                page = self.primary.fetch(url, link_filter)
+            except Exception as e:
+                logger.warning(f"{self.primary.name} fetch failed for {url}, falling back: {e}")
+            else:
+                if not page.captcha and not page.needs_js:
+                    return page
+                reason = "CAPTCHA" if page.captcha else "JavaScript-only page"
+                logger.info(f"{reason} from {self.primary.name} backend, switching to {self.fallback.name}")
+            self.active = self.fallback
+        return self.fallback.fetch(url, link_filter)
+
+    def reload(self, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        return self.active.reload(link_filter)
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+class PacedFetchBackend(FetchBackend):
+    """Space out requests through a shared AdaptiveRateLimiter and report how each one went.
+
+    All sessions pacing the same engine share its bucket, so a CAPTCHA seen
+    by one of them slows every one of them down.
+    """
+
+    def __init__(self, backend: FetchBackend, limiter: AdaptiveRateLimiter, key: Optional[str] = None):
+        self.backend = backend
+        self.limiter = limiter
+        self.key = key
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    @property
+    def driver(self):
+        return self.backend.driver
+
+    def fetch(self, url: str, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        key = self.key or self.limiter.key_for(url)
+        self.limiter.acquire(key)
+        started = time.monotonic()
+        try:
+            page = self.backend.fetch(url, link_filter)
+        except Exception:
+            self.limiter.record(key, time.monotonic() - started, error=True)
+            raise
+        self.limiter.record(key, time.monotonic() - started, captcha=page.captcha)
+        return page
+
+    def reload(self, link_filter: Optional[LinkFilter] = None) -> SerpPage:
+        return self.backend.reload(link_filter)
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,193 @@
+# scraper_common/metrics.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds, from a fast HTTP answer to a browser start
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    pairs = [f'{name}="{value}"' for name, value in zip(names, escaped)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric with one series per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.values: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def summary(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label set"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"
+                    for key, value in sorted(self.values.items())]
+
+    def summary(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)}: {_format_number(value)}"
+                    for key, value in sorted(self.values.items())]
+
+
+class HistogramSeries:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram(Metric):
+    """Observations per label set in cumulative buckets, plus their count, sum and maximum"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = TIME_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], HistogramSeries] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = HistogramSeries(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series.counts[i] += 1
+            series.count += 1
+            series.sum += value
+            series.max = max(series.max, value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block took, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets + (math.inf,), series.counts + [series.count]):
+                    labels = _format_labels(self.label_names, key, f'le="{_format_number(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(series.sum)}")
+                lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+    def summary(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)}: {series.count} samples, "
+                    f"mean {series.sum / series.count:.3f}, max {series.max:.3f}"
+                    for key, series in sorted(self.values.items()) if series.count]
+
+
+class MetricsRegistry:
+    """Named metrics that can be exposed in the Prometheus text format or summarized at the end of a run"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = TIME_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self, prefix: Optional[str] = None) -> List[str]:
+        """One line per series that has data, e.g. for the end of a CLI run"""
+        lines = []
+        for name, metric in self.metrics.items():
+            if prefix is None or name.startswith(prefix):
+                lines.extend(metric.summary())
+        return lines
+
+
+REGISTRY = MetricsRegistry()
+
+# Scraping stages shared by the CLI and both web apps
+DRIVER_STARTUP = REGISTRY.histogram("scraper_driver_startup_seconds", "Time to start a browser")
+PAGE_LOAD = REGISTRY.histogram("scraper_page_load_seconds", "Time to load a results page", ["backend"])
+LINK_EXTRACTION = REGISTRY.histogram("scraper_link_extraction_seconds",
+                                     "Time to extract the links of a loaded results page", ["backend"])
+PAGES = REGISTRY.counter("scraper_pages_total", "Results pages fetched", ["backend"])
+CAPTCHAS = REGISTRY.counter("scraper_captchas_total", "Results pages answered with a CAPTCHA", ["backend"])
+PAGE_DOMAINS = REGISTRY.counter("scraper_page_domains_total",
+                                "Domains on results pages, new to the crawl or already found by it", ["result"])
+NEW_DOMAINS_PER_PAGE = REGISTRY.histogram("scraper_new_domains_per_page", "New domains per results page",
+                                          buckets=COUNT_BUCKETS)
+STORE_WRITE = REGISTRY.histogram("scraper_store_write_seconds",
+                                 "Time to write domains or a checkpoint to the database or disk", ["store"])
+
+# Domain processor stages
+PROCESSOR_STAGE = REGISTRY.histogram("processor_stage_seconds", "Time per domain processor stage", ["stage"])
+PROCESSOR_PAGES = REGISTRY.counter("processor_pages_total", "Pages handled by the domain processor", ["result"])
+
+# Liveness probe of stored domains
+PROBE_STAGE = REGISTRY.histogram("probe_stage_seconds", "Time to resolve a domain or to get its HTTP answer", ["stage"])
+PROBE_RESULTS = REGISTRY.counter("probe_results_total", "Probed domains by outcome", ["status"])
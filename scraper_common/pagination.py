@@ -0,0 +1,85 @@
+# scraper_common/pagination.py
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# items: list of row dicts, next_cursor: token for the following page (None on the last page),
+# total: number of matching rows, or None when counting was skipped
+Page = namedtuple("Page", ["items", "next_cursor", "total"])
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque token for the position after (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed tokens"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def domain_filters(table, tld: Optional[str] = None, search: Optional[str] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   domain_column: str = "domain_name", date_column: str = "created_at",
+                   tld_column: str = "tld") -> list:
+    """WHERE clauses for an exact TLD, a case-insensitive substring of the domain and a date range"""
+    table = getattr(table, "__table__", table)
+    clauses = []
+    if tld:
+        clauses.append(table.c[tld_column] == tld)
+    if search:
+        clauses.append(table.c[domain_column].ilike(f"%{_escape_like(search)}%", escape="\\"))
+    if start:
+        clauses.append(table.c[date_column] >= start)
+    if end:
+        clauses.append(table.c[date_column] < end)
+    return clauses
+
+
+def paginate(session, table, filters: list, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+             with_total: bool = True, date_column: str = "created_at", id_column: str = "id") -> Page:
+    """Return one page of rows, newest first, continuing after cursor.
+
+    Rows are ordered on (date_column, id_column) and each page starts
+    strictly after the last row of the previous one (keyset pagination), so
+    the cost of a page does not depend on how deep it is, unlike OFFSET.
+    The total is a separate COUNT and can be skipped on large tables.
+    """
+    table = getattr(table, "__table__", table)
+    date_col, id_col = table.c[date_column], table.c[id_column]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    stmt = select(table).where(*filters)
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(date_col < after_date, and_(date_col == after_date, id_col < after_id)))
+    # One extra row tells whether there is a next page without a second query
+    rows = session.execute(stmt.order_by(date_col.desc(), id_col.desc()).limit(limit + 1)).mappings().all()
+
+    items: List[dict] = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last[date_column], last[id_column])
+
+    total = None
+    if with_total:
+        total = session.execute(select(func.count()).select_from(table).where(*filters)).scalar()
+    return Page(items, next_cursor, total)
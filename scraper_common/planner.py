@@ -0,0 +1,148 @@
+# scraper_common/planner.py
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from .checkpoint import StopRule
+from .domains import default_normalizer
+
+# Search engines ignore query words past this
+MAX_QUERY_WORDS = 32
+# Yield credited to a shard before its first page, so every shard is tried once
+PRIOR_YIELD = 10.0
+# Weight of the latest page in a shard's yield
+YIELD_ALPHA = 0.5
+# Pages in a row without a new domain before a shard is dropped, unless another stop rule is given
+MAX_DRY_PAGES = 2
+
+DEFAULT_KEYWORDS = ("news", "shop", "company", "university", "school", "hotel", "bank", "blog", "services", "contact")
+
+
+class Shard:
+    """One query of a TLD plan and what it has yielded so far"""
+
+    def __init__(self, query: str, kind: str = "base", params: Optional[dict] = None, pages: int = 0,
+                 new_domains: int = 0, next_url: Optional[str] = None, done: bool = False, dry_pages: int = 0,
+                 yield_rate: float = PRIOR_YIELD, hits: Optional[dict] = None):
+        self.query = query
+        self.kind = kind
+        self.params = params or {}
+        self.pages = pages
+        self.new_domains = new_domains
+        self.next_url = next_url
+        self.done = done
+        self.dry_pages = dry_pages
+        self.yield_rate = yield_rate
+        self.hits = Counter(hits or {})
+
+    def to_dict(self) -> dict:
+        return {
+            "query": self.query,
+            "kind": self.kind,
+            "params": self.params,
+            "pages": self.pages,
+            "new_domains": self.new_domains,
+            "next_url": self.next_url,
+            "done": self.done,
+            "dry_pages": self.dry_pages,
+            "yield_rate": self.yield_rate,
+            "hits": dict(self.hits.most_common(MAX_QUERY_WORDS)),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Shard":
+        return cls(**data)
+
+
+class QueryPlanner:
+    """Split a TLD into narrower queries and always run the most productive one next.
+
+    A single site: query stops finding new domains long before the zone is
+    exhausted because the engine caps its results. The plan has a base
+    query for domains directly under the TLD, one query per sub-zone (from
+    the public suffix list), and keyword and language slices of the base
+    query. Sub-zones are excluded from the base query so shards overlap
+    little. Each shard's yield (new domains per request, exponentially
+    weighted) decides which one gets the next request; a shard is dropped
+    after max_pages, at the end of its results or once stop_rule says it
+    stopped paying off (by default MAX_DRY_PAGES pages without anything
+    new). Domains in `known` (e.g. from an earlier crawl) never count as
+    new. A dropped shard that found domains is followed
+    by the same query with its most frequent domains excluded (-site:),
+    which makes the engine return different ones.
+    """
+
+    def __init__(self, tld: str, exclude_query: str = "", exclude_zones: Iterable[str] = (),
+                 skip_zones: Iterable[str] = (), keywords: Iterable[str] = (), languages: Iterable[str] = (),
+                 max_pages: int = 30, budget: int = 100, known: Iterable[str] = (),
+                 stop_rule: Optional[StopRule] = None):
+        self.tld = tld.lower()
+        self.max_pages = max_pages
+        self.stop_rule = stop_rule or StopRule(1, MAX_DRY_PAGES)
+        self.budget = budget
+        self.requests = 0
+        self.seen = set(known)
+        zone_suffix = "." + self.tld.strip(".")
+        excluded = {zone.lower().strip(".") for zone in exclude_zones}
+        skipped = {zone.lower().strip(".") for zone in skip_zones if zone.lower().endswith(zone_suffix)}
+        zones = [zone for zone in default_normalizer().trie.children(self.tld)
+                 if zone not in excluded and zone not in skipped]
+        # Domains directly under the TLD: every sub-zone is left to its own shard (or its own crawl)
+        words = [f"site:{self.tld}"] + exclude_query.split() + [f"-site:.{zone}" for zone in sorted(skipped | set(zones))]
+        scope = " ".join(words[:MAX_QUERY_WORDS - 1])
+        self.shards: List[Shard] = [Shard(scope, "base")]
+        self.shards += [Shard(f"site:.{zone}", "zone") for zone in zones]
+        self.shards += [Shard(f"{scope} {keyword}", "keyword") for keyword in keywords]
+        self.shards += [Shard(scope, "language", {"lr": f"lang_{language}"}) for language in languages]
+
+    @property
+    def key(self) -> str:
+        """Identifies the plan in a checkpoint, like the query of a single-query crawl"""
+        return " | ".join(shard.query for shard in self.shards if shard.kind in ("base", "zone"))
+
+    def next_shard(self) -> Optional[Shard]:
+        """The open shard with the best recent yield, or None once the budget is spent or every shard is done"""
+        if self.requests >= self.budget:
+            return None
+        open_shards = [shard for shard in self.shards if not shard.done]
+        if not open_shards:
+            return None
+        return max(open_shards, key=lambda shard: (shard.yield_rate, -shard.pages))
+
+    def record(self, shard: Shard, domains: Iterable[str], next_url: Optional[str]) -> List[str]:
+        """Account for one results page of a shard; returns the domains no shard had found yet"""
+        domains = list(domains)
+        new = sorted(set(domains) - self.seen)
+        self.seen.update(new)
+        shard.hits.update(domains)
+        self.requests += 1
+        shard.pages += 1
+        shard.new_domains += len(new)
+        shard.next_url = next_url
+        shard.yield_rate = YIELD_ALPHA * len(new) + (1 - YIELD_ALPHA) * shard.yield_rate
+        shard.dry_pages = shard.dry_pages + 1 if self.stop_rule.dry(len(new)) else 0
+        if not next_url or shard.pages >= self.max_pages or self.stop_rule.exhausted(shard.dry_pages):
+            self._retire(shard)
+        return new
+
+    def _retire(self, shard: Shard):
+        shard.done = True
+        if not shard.new_domains:
+            return
+        words = shard.query.split()
+        excluded = {word[len("-site:"):] for word in words if word.startswith("-site:")}
+        room = MAX_QUERY_WORDS - len(words)
+        exclusions = [f"-site:{domain}" for domain, _ in shard.hits.most_common() if domain not in excluded][:room]
+        if exclusions:
+            self.shards.append(Shard(" ".join(words + exclusions), "exclude", dict(shard.params)))
+
+    def summary(self) -> List[Dict]:
+        return [{"query": shard.query, "kind": shard.kind, "params": shard.params, "pages": shard.pages,
+                 "new_domains": shard.new_domains, "done": shard.done} for shard in self.shards]
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "budget": self.budget, "shards": [shard.to_dict() for shard in self.shards]}
+
+    def restore(self, data: dict):
+        """Continue a plan saved with to_dict()"""
+        self.requests = data.get("requests", 0)
+        self.shards = [Shard.from_dict(shard) for shard in data["shards"]]
@@ -0,0 +1,216 @@
+# scraper_common/probe.py
+import asyncio
+import ssl
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Optional, Union
+from urllib.parse import urljoin, urlsplit
+
+from .browser import USER_AGENT
+from .dns import NOERROR, NXDOMAIN, AsyncResolver, DnsError, TTLCache
+from .metrics import PROBE_RESULTS, PROBE_STAGE
+
+# Outcomes of a probe
+ALIVE = "alive"  # Answered over HTTP, whatever the status code
+UNREACHABLE = "unreachable"  # Resolves, but the HTTP connection failed or timed out
+NO_ADDRESS = "no_address"  # The name exists without an address record
+NXDOMAIN_STATUS = "nxdomain"  # The name does not exist
+DNS_ERROR = "dns_error"  # No nameserver gave an answer (timeouts, SERVFAIL)
+INVALID = "invalid"  # Not a name DNS can carry
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Longest status line or header accepted from a server
+MAX_LINE = 8192
+MAX_HEADERS = 100
+
+RESULT_FIELDS = ("domain", "status", "ip", "http_status", "final_url", "latency", "error", "checked_at")
+# latency: seconds for DNS and HTTP together; checked_at: ISO time (UTC) of the probe
+ProbeResult = namedtuple("ProbeResult", RESULT_FIELDS)
+
+
+class BadResponse(Exception):
+    """The server did not answer with HTTP"""
+
+
+async def _aiter(domains: Union[Iterable[str], AsyncIterator[str]]) -> AsyncIterator[str]:
+    if hasattr(domains, "__aiter__"):
+        async for domain in domains:
+            yield domain
+    else:
+        for domain in domains:
+            yield domain
+
+
+class Prober:
+    """Find out which domains resolve and answer over HTTP, many at a time.
+
+    Every domain is resolved with the AsyncResolver and then asked for
+    http://domain/ (HEAD, or GET where HEAD is refused) on the resolved
+    address, following redirects up to max_redirects to get the final URL.
+    Up to `concurrency` domains are in flight and at most per_host
+    connections go to one host, e.g. a parking service many domains
+    redirect to. Certificates are not verified: this checks that a site
+    answers, not that it is trustworthy. Results are cached for ttl seconds,
+    so a domain listed twice or probed again soon is only checked once.
+    http_port and https_port point the probe at a local test server.
+    """
+
+    def __init__(self, resolver: Optional[AsyncResolver] = None, concurrency: int = 1000, per_host: int = 4,
+                 timeout: float = 10.0, max_redirects: int = 5, method: str = "HEAD", ttl: float = 86400,
+                 http_port: int = 80, https_port: int = 443, user_agent: str = USER_AGENT,
+                 cache: Optional[TTLCache] = None):
+        self.resolver = resolver or AsyncResolver()
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.method = method
+        self.ttl = ttl
+        self.ports = {"http": http_port, "https": https_port}
+        self.user_agent = user_agent
+        self.cache = cache if cache is not None else TTLCache()
+        self._hosts: Dict[str, list] = {}  # host -> [semaphore, users]
+        self._ssl = ssl.create_default_context()
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        """Hold one of the host's per_host connections; idle hosts are forgotten"""
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = [asyncio.Semaphore(self.per_host), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._hosts[host]
+
+    async def _request(self, method: str, url: str, address: str):
+        """Send one request and read the status and headers; returns (status, headers)"""
+        parts = urlsplit(url)
+        host = parts.hostname.encode("idna").decode("ascii")
+        port = parts.port or self.ports[parts.scheme]
+        secure = parts.scheme == "https"
+        reader, writer = await asyncio.open_connection(address, port, ssl=self._ssl if secure else None,
+                                                       server_hostname=host if secure else None, limit=MAX_LINE)
+        try:
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            host_header = f"{host}:{parts.port}" if parts.port else host
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {self.user_agent}\r\n"
+                         f"Accept: */*\r\nConnection: close\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            status_line = (await reader.readline()).decode("latin-1").split()
+            if len(status_line) < 2 or not status_line[0].startswith("HTTP/") or not status_line[1].isdigit():
+                raise BadResponse(f"Not an HTTP response: {' '.join(status_line)[:100]!r}")
+            headers = {}
+            for _ in range(MAX_HEADERS):
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            return int(status_line[1]), headers
+        finally:
+            writer.close()
+
+    async def _resolve(self, host: str):
+        with PROBE_STAGE.time(stage="dns"):
+            return await self.resolver.resolve(host)
+
+    async def _address(self, host: str) -> str:
+        """An address of a host a redirect points to"""
+        answer = await self._resolve(host)
+        if not answer.addresses:
+            raise DnsError(f"{host} does not resolve")
+        return answer.addresses[0]
+
+    async def _probe(self, domain: str, started: float) -> ProbeResult:
+        def result(status, ip=None, http_status=None, final_url=None, error=None):
+            return ProbeResult(domain, status, ip, http_status, final_url, round(time.monotonic() - started, 3),
+                               error, datetime.utcnow().isoformat(timespec="seconds"))
+
+        try:
+            answer = await self._resolve(domain)
+        except ValueError as e:
+            return result(INVALID, error=str(e))
+        except DnsError as e:
+            return result(DNS_ERROR, error=str(e))
+        if answer.rcode == NXDOMAIN:
+            return result(NXDOMAIN_STATUS)
+        if answer.rcode != NOERROR:
+            return result(DNS_ERROR, error=f"DNS rcode {answer.rcode}")
+        if not answer.addresses:
+            return result(NO_ADDRESS)
+
+        ip = answer.addresses[0]
+        url, method, status, redirects = f"http://{domain}/", self.method, None, 0
+        while True:
+            parts = urlsplit(url)
+            host = parts.hostname
+            if parts.scheme not in self.ports or not host:
+                return result(ALIVE, ip, status, url, error="Redirect not followed")
+            try:
+                address = ip if host == domain else await self._address(host)
+                async with self._host_slot(host):
+                    with PROBE_STAGE.time(stage="http"):
+                        new_status, headers = await asyncio.wait_for(self._request(method, url, address),
+                                                                     self.timeout)
+            except (OSError, asyncio.TimeoutError, BadResponse, DnsError, ValueError) as e:
+                error = str(e) or type(e).__name__
+                if status is None:
+                    return result(UNREACHABLE, ip, error=error)
+                # The domain answered; only a later hop (e.g. to https) failed
+                return result(ALIVE, ip, status, url, error=f"{url}: {error}")
+            status = new_status
+            if method == "HEAD" and status in (405, 501):
+                method = "GET"
+                continue
+            location = headers.get("location")
+            if status not in REDIRECT_CODES or not location:
+                return result(ALIVE, ip, status, url)
+            if redirects >= self.max_redirects:
+                return result(ALIVE, ip, status, url, error="Too many redirects")
+            redirects += 1
+            url = urljoin(url, location)
+
+    async def probe(self, domain: str) -> ProbeResult:
+        """Resolve and request one domain; never raises"""
+        domain = domain.strip().lower().rstrip(".")
+        cached = self.cache.get(domain)
+        if cached is not None:
+            return cached
+        result = await self._probe(domain, time.monotonic())
+        PROBE_RESULTS.inc(status=result.status)
+        self.cache.set(domain, result, self.ttl)
+        return result
+
+    async def probe_many(self, domains: Union[Iterable[str], AsyncIterator[str]]) -> AsyncIterator[ProbeResult]:
+        """Probe domains with up to `concurrency` in flight; yields results as they finish, not in input order.
+
+        Domains are taken from the iterable only as slots free up, so it can be a generator over millions of rows.
+        """
+        pending = set()
+        try:
+            async for domain in _aiter(domains):
+                pending.add(asyncio.ensure_future(self.probe(domain)))
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # The caller stopped early
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        self.resolver.close()
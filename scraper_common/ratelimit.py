@@ -0,0 +1,153 @@
+# scraper_common/ratelimit.py
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Requests per second for one key, with the signals that adjusted it"""
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = float("-inf")
+        self.streak = 0
+        self.counts = {"requests": 0, "successes": 0, "captchas": 0, "throttled": 0, "slow": 0, "errors": 0}
+        self.last_latency: Optional[float] = None
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long the caller has to wait for it"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        self.counts["requests"] += 1
+        # Negative tokens are requests already promised a later slot
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def scale(self, factor: float):
+        self.rate = min(self.max_rate, max(self.min_rate, self.rate * factor))
+
+    def decrease(self, factor: float, now: float, latency: Optional[float]):
+        """Cut the rate once per congestion event: answers to requests that were already in flight don't cut it again"""
+        self.streak = 0
+        if now - self.last_decrease < max(1 / self.rate, latency or 0.0):
+            return
+        self.scale(factor)
+        self.last_decrease = now
+
+
+class AdaptiveRateLimiter:
+    """Token bucket per key (a search engine or a host), adjusted by what the key answers.
+
+    Rates follow AIMD: every success_streak successful requests the rate
+    grows by `increase`, while a 429/5xx halves it (and honours
+    Retry-After), a CAPTCHA quarters it and pauses the key for
+    captcha_cooldown seconds, and a response slower than slow_latency cuts
+    it by a fifth. Cuts happen at most once per request interval, so a
+    burst of concurrent 429s counts as one signal. An optional global_rate
+    caps all keys together. Works from threads (acquire) and from asyncio
+    (acquire_async).
+    """
+
+    def __init__(self, rate: float = 0.25, burst: float = 1.0, min_rate: float = 0.02, max_rate: float = 2.0,
+                 increase: Optional[float] = None, success_streak: int = 3, slow_latency: float = 10.0,
+                 captcha_cooldown: float = 30.0, jitter: float = 0.0, global_rate: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.increase = increase if increase is not None else rate * 0.1
+        self.success_streak = success_streak
+        self.slow_latency = slow_latency
+        self.captcha_cooldown = captcha_cooldown
+        self.jitter = jitter
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._global = TokenBucket(global_rate, 1.0, global_rate, global_rate) if global_rate else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """Bucket key for a URL: its host"""
+        return (urlparse(url).hostname or "").lower()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst, self.min_rate, self.max_rate)
+        return bucket
+
+    def reserve(self, key: str) -> float:
+        """Claim the next request slot for a key; returns the seconds to wait before sending it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._bucket(key).reserve(now)
+            if self._global:
+                wait = max(wait, self._global.reserve(now))
+        if wait > 0 and self.jitter:
+            wait *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return wait
+
+    def acquire(self, key: str):
+        wait = self.reserve(key)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, key: str):
+        wait = self.reserve(key)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, key: str, latency: Optional[float] = None, captcha: bool = False, throttled: bool = False,
+               retry_after: Optional[float] = None, error: bool = False):
+        """Feed back how a request went so the key's rate can adapt"""
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.last_latency = latency
+            now = time.monotonic()
+            if captcha:
+                bucket.counts["captchas"] += 1
+                bucket.decrease(0.25, now, latency)
+                bucket.paused_until = max(bucket.paused_until, now + self.captcha_cooldown)
+            elif throttled:
+                bucket.counts["throttled"] += 1
+                bucket.decrease(0.5, now, latency)
+                if retry_after:
+                    bucket.paused_until = max(bucket.paused_until, now + retry_after)
+            elif error:
+                bucket.counts["errors"] += 1
+                bucket.streak = 0
+            elif latency is not None and latency > self.slow_latency:
+                bucket.counts["slow"] += 1
+                bucket.decrease(0.8, now, latency)
+            else:
+                bucket.counts["successes"] += 1
+                bucket.streak += 1
+                if bucket.streak >= self.success_streak:
+                    bucket.rate = min(bucket.max_rate, bucket.rate + self.increase)
+                    bucket.streak = 0
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current rate and signal counts per key, for /rates and logs"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key: {
+                    "rate": round(bucket.rate, 4),
+                    "interval": round(1 / bucket.rate, 2),
+                    "min_rate": bucket.min_rate,
+                    "max_rate": bucket.max_rate,
+                    "paused_for": round(max(0.0, bucket.paused_until - now), 1),
+                    "last_latency": round(bucket.last_latency, 3) if bucket.last_latency is not None else None,
+                    **bucket.counts,
+                }
+                for key, bucket in sorted(self.buckets.items())
+            }
@@ -0,0 +1,55 @@
+# scraper_common/schema.py
+import logging
+
+from sqlalchemy import UniqueConstraint, inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(metadata, engine):
+    """Add columns and indexes introduced after a table was first created.
+
+    create_all() only creates missing tables, so existing databases would
+    otherwise never get new columns. New columns are added as nullable.
+    Unique constraints (e.g. Column(unique=True)) cannot be added to an
+    existing SQLite table, so they become unique indexes, which ON CONFLICT
+    accepts just the same.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    logger.info(f"Adding column {table.name}.{column.name}")
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                try:
+                    index.create(conn, checkfirst=True)
+                except Exception as e:
+                    # e.g. a unique index over rows that already contain duplicates
+                    logger.warning(f"Could not create index {index.name}: {e}")
+            _add_missing_unique(conn, inspector, table)
+
+
+def _add_missing_unique(conn, inspector, table):
+    """Create a unique index for each unique constraint the existing table does not enforce yet"""
+    enforced = {tuple(constraint["column_names"]) for constraint in inspector.get_unique_constraints(table.name)}
+    enforced.update(tuple(index["column_names"]) for index in inspector.get_indexes(table.name) if index["unique"])
+    enforced.update(tuple(index.columns.keys()) for index in table.indexes if index.unique)
+    for constraint in table.constraints:
+        if not isinstance(constraint, UniqueConstraint):
+            continue
+        columns = tuple(constraint.columns.keys())
+        if columns in enforced:
+            continue
+        name = constraint.name if isinstance(constraint.name, str) else f"uq_{table.name}_{'_'.join(columns)}"
+        try:
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table.name} ({', '.join(columns)})"))
+            logger.info(f"Added unique index {name}")
+        except Exception as e:
+            # Rows that already contain duplicates
+            logger.warning(f"Could not create unique index {name}: {e}")
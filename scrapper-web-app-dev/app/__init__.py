@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Make the repository-level scraper_common package importable when the app
+# is started from this directory (uvicorn app.main:app).
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
@@ -1,17 +1,30 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, Form, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, Depends, HTTPException, Form, BackgroundTasks, Query, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
 import os
 from sqlalchemy.sql import func
 import logging
 import json
+import asyncio
+import functools
 from datetime import datetime
 
-from .models import Domain, get_db
-from .services.scraper import DomainScraper
+from .models import Domain, SessionLocal, get_db
+from .services.driver_pool import DriverPool
+from .services.jobs import create_job, list_jobs, load_job, save_checkpoint
+from .services.probe import PROBE_MAX_AGE, ProbeRun
+from .services.progress import JobProgress, ProgressHub
+from .services.scraper import MAX_PAGES, SEED_KNOWN_DOMAINS, SERP_RATE_LIMITER, DomainScraper, create_chrome_driver
+from .services.stats import discovery_rates, rebuild_if_empty, rebuild_stats, tld_totals
+from .services.storage import known_domains, upsert_domains
+from scraper_common.checkpoint import PARKED, CrawlState
+from scraper_common.export import CONTENT_TYPES, export_filename, export_select, export_stream
+from scraper_common.metrics import REGISTRY
+from scraper_common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, domain_filters, paginate
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +32,43 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="TLD Domain Scraper")
 
-# Store active scraping tasks
-active_scrapers: Dict[str, DomainScraper] = {}
+# Running scrapers by crawl job id; viewers follow them through the progress hub
+active_scrapers: Dict[int, DomainScraper] = {}
+progress_hub = ProgressHub()
+background_jobs: Set[asyncio.Task] = set()
+# Serializes "is a job running for this TLD, else start one" between viewers
+job_start_lock = asyncio.Lock()
+# The latest liveness probe of the stored domains
+probe_run: Optional[ProbeRun] = None
+
+# Warm Chrome instances shared by all scrape jobs
+driver_pool = DriverPool(
+    create_chrome_driver,
+    size=int(os.getenv("DRIVER_POOL_SIZE", "2")),
+    warm=int(os.getenv("DRIVER_POOL_WARM", "1")),
+    max_pages=int(os.getenv("DRIVER_POOL_MAX_PAGES", "200")),
+    max_age=float(os.getenv("DRIVER_POOL_MAX_AGE", "1800")),
+)
+
+@app.on_event("startup")
+async def start_driver_pool():
+    """Launch the warm drivers without blocking startup"""
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, driver_pool.start)
+
+@app.on_event("startup")
+def backfill_stats():
+    """Build the counters for a database that predates them"""
+    db = SessionLocal()
+    try:
+        if rebuild_if_empty(db):
+            logger.info("Rebuilt TLD statistics from the domains table")
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_driver_pool():
+    driver_pool.shutdown()
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -29,11 +77,11 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 @app.get("/")
-async def home(request: Request, db: Session = Depends(get_db)):
+def home(request: Request, db: Session = Depends(get_db)):
     """Render the home page with the scraping form and dashboard"""
     # Get recent domains for the dashboard
     recent_domains = db.query(Domain).order_by(Domain.created_at.desc()).limit(10).all()
-    tld_stats = db.query(Domain.tld, func.count(Domain.id)).group_by(Domain.tld).all()
+    totals = tld_totals(db)
     
     return templates.TemplateResponse(
         "index.html",
@@ -41,48 +89,159 @@ async def home(request: Request, db: Session = Depends(get_db)):
             "request": request,
             "title": "TLD Domain Scraper",
             "recent_domains": recent_domains,
-            "tld_stats": tld_stats
+            "total_domains": sum(stats.total for stats in totals),
+            "tld_stats": [(stats.tld, stats.total) for stats in totals]
         }
     )
 
-@app.websocket("/ws/{tld}")
-async def websocket_endpoint(websocket: WebSocket, tld: str):
-    """WebSocket endpoint for real-time scraping updates"""
-    await websocket.accept()
-    scraper = None
+def store_domains(domains, tld: str):
+    """Store scraped domains in the database; returns inserted vs. already known counts"""
+    db = next(get_db())
     try:
-        scraper = DomainScraper(websocket)
-        active_scrapers[tld] = scraper
-        domains = await scraper.scrape_tld(tld)
-        
-        # Store domains in database
-        db = next(get_db())
-        for domain in domains:
-            db_domain = Domain(domain_name=domain, tld=tld)
-            db.add(db_domain)
-        db.commit()
-        
-        await websocket.send_json({
+        return upsert_domains(db, domains, tld)
+    finally:
+        db.close()
+
+def load_known_domains(tld: str) -> Set[str]:
+    """Domains of a TLD stored by earlier crawls"""
+    db = next(get_db())
+    try:
+        return known_domains(db, tld)
+    finally:
+        db.close()
+
+async def run_job(job_id: int, state: CrawlState, progress: JobProgress):
+    """Scrape a TLD in the background, publishing progress to every viewer of the job"""
+    tld = state.tld
+    scraper = DomainScraper(progress, driver_pool=driver_pool, checkpoint=functools.partial(save_checkpoint, job_id))
+    active_scrapers[job_id] = scraper
+    try:
+        if SEED_KNOWN_DOMAINS:
+            # Re-crawls only count domains missing from the database as new, so dead pages end the crawl early
+            state.known = await run_in_threadpool(load_known_domains, tld)
+        domains = await scraper.scrape_tld(tld, state)
+
+        # Store domains in database off the event loop
+        stored = await run_in_threadpool(store_domains, domains, tld)
+        message = f"Found {len(domains)} domains ({stored.inserted} new, {stored.known} already known)."
+        if state.status == PARKED:
+            message = f"{state.error}. {message} Resume crawl job {job_id} to continue."
+        else:
+            message = f"Scraping completed. {message}"
+        progress_hub.close(job_id, {
             "type": "complete",
-            "message": f"Scraping completed. Found {len(domains)} domains.",
-            "domains": list(domains)
+            "message": message,
+            "domains": sorted(domains),
+            "inserted": stored.inserted,
+            "known": stored.known
         })
+    except Exception as e:
+        logger.error(f"Scrape job {job_id} for {tld} failed: {str(e)}")
+        progress_hub.close(job_id, {"type": "error", "message": str(e)})
+    finally:
+        active_scrapers.pop(job_id, None)
+
+async def attach_job(tld: str, job_id: Optional[int]):
+    """Find the job a viewer should watch, starting (or resuming) one if it is not running.
+
+    Returns the job's progress, or a final frame for jobs that cannot run.
+    """
+    async with job_start_lock:
+        job = progress_hub.get(job_id) if job_id is not None else progress_hub.running_for(tld)
+        if job is not None:
+            if job.tld != tld:
+                return None, {"type": "error", "message": f"Crawl job {job_id} is not scraping {tld}"}
+            return job, None
+
+        if job_id is None:
+            state = DomainScraper.new_state(tld)
+            job_id = await run_in_threadpool(create_job, state)
+        else:
+            state = await run_in_threadpool(load_job, job_id)
+            if state is None or state.tld != tld:
+                return None, {"type": "error", "message": f"Unknown crawl job {job_id} for {tld}"}
+            if not state.resumable:
+                return None, {
+                    "type": "complete",
+                    "message": f"Crawl job {job_id} already completed with {len(state.domains)} domains.",
+                    "domains": sorted(state.domains)
+                }
+
+        job = progress_hub.open(job_id, tld, MAX_PAGES, state.page, state.domains)
+        task = asyncio.create_task(run_job(job_id, state, job))
+        background_jobs.add(task)
+        task.add_done_callback(background_jobs.discard)
+        return job, None
+
+def resolve_captcha(job_id: int) -> bool:
+    """Tell a job parked on a CAPTCHA that it has been solved"""
+    scraper = active_scrapers.get(job_id)
+    if scraper is None or not scraper.parked:
+        return False
+    scraper.resolve_captcha()
+    return True
+
+async def receive_actions(websocket: WebSocket, handle):
+    """Pass {"action": ...} messages from the client to handle; return once the client goes away"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        try:
+            action = json.loads(message.get("text") or "{}").get("action")
+        except (ValueError, AttributeError):
+            continue
+        if action:
+            handle(action)
+
+@app.websocket("/ws/{tld}")
+async def websocket_endpoint(websocket: WebSocket, tld: str, job_id: Optional[int] = None):
+    """Watch the scrape job for a TLD, starting one if none is running; pass job_id to follow or resume a job"""
+    await websocket.accept()
+    job = queue = None
+
+    def handle(action: str):
+        if action == "captcha_solved" and job is not None:
+            resolve_captcha(job.job_id)
+
+    disconnected = asyncio.create_task(receive_actions(websocket, handle))
+    try:
+        job, final = await attach_job(tld, job_id)
+        if job is None:
+            if job_id is not None:
+                await websocket.send_json({"type": "job", "job_id": job_id})
+            await websocket.send_json(final)
+            return
+
+        await websocket.send_json({"type": "job", "job_id": job.job_id})
+        # Leaving only unsubscribes: the job keeps running for other viewers and reconnects
+        queue = job.subscribe()
+        while True:
+            frame_ready = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({frame_ready, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                frame_ready.cancel()
+                return
+            frame = frame_ready.result()
+            if frame is None:
+                break
+            await websocket.send_json(frame)
     except WebSocketDisconnect:
-        if tld in active_scrapers:
-            active_scrapers[tld].cancel()
-            del active_scrapers[tld]
+        pass
     except Exception as e:
         logger.error(f"Error in WebSocket connection: {str(e)}")
-        if scraper:
-            scraper.cancel()
-        await websocket.send_json({
-            "type": "error",
-            "message": str(e)
-        })
+        try:
+            await websocket.send_json({"type": "error", "message": str(e)})
+        except Exception:
+            pass
     finally:
-        if tld in active_scrapers:
-            del active_scrapers[tld]
-        await websocket.close()
+        disconnected.cancel()
+        if job is not None and queue is not None:
+            job.unsubscribe(queue)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
 @app.post("/scrape")
 async def scrape_domains(
@@ -90,89 +249,208 @@ async def scrape_domains(
     tld: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    """Trigger domain scraping for a specific TLD"""
-    if tld in active_scrapers:
-        raise HTTPException(status_code=400, detail="Scraping already in progress for this TLD")
-    
+    """Open the progress page for a TLD; joins the running job if there is one"""
+    running = progress_hub.running_for(tld)
     return templates.TemplateResponse(
         "scraping.html",
         {
             "request": request,
             "tld": tld,
-            "ws_url": f"/ws/{tld}"
+            "ws_url": f"/ws/{tld}?job_id={running.job_id}" if running else f"/ws/{tld}"
         }
     )
 
+@app.get("/jobs")
+def get_jobs():
+    """List recent crawl jobs and their last checkpoint"""
+    return list_jobs()
+
+@app.post("/jobs/{job_id}/resume")
+def resume_job(request: Request, job_id: int):
+    """Continue a crawl job from its last checkpoint"""
+    state = load_job(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Crawl job not found")
+    if not state.resumable:
+        raise HTTPException(status_code=400, detail="Crawl job already completed")
+    running = progress_hub.running_for(state.tld)
+    if running is not None and running.job_id != job_id:
+        raise HTTPException(status_code=400, detail="Another job is already scraping this TLD")
+
+    return templates.TemplateResponse(
+        "scraping.html",
+        {
+            "request": request,
+            "tld": state.tld,
+            "ws_url": f"/ws/{state.tld}?job_id={job_id}"
+        }
+    )
+
+@app.post("/jobs/{job_id}/captcha")
+async def captcha_solved(job_id: int):
+    """Resume a job parked on a CAPTCHA once it has been solved in its browser window"""
+    if job_id not in active_scrapers:
+        raise HTTPException(status_code=404, detail="Crawl job is not running")
+    if not resolve_captcha(job_id):
+        raise HTTPException(status_code=409, detail="Crawl job is not waiting for a CAPTCHA")
+    return {"message": "Checking the CAPTCHA"}
+
 @app.post("/cancel/{tld}")
 async def cancel_scraping(tld: str):
     """Cancel an ongoing scraping operation"""
-    if tld in active_scrapers:
-        active_scrapers[tld].cancel()
-        del active_scrapers[tld]
+    running = progress_hub.running_for(tld)
+    if running is not None and running.job_id in active_scrapers:
+        active_scrapers[running.job_id].cancel()
         return {"message": "Scraping cancelled"}
     raise HTTPException(status_code=404, detail="No active scraping found for this TLD")
 
+EXPORT_FIELDS = ("domain_name", "tld", "created_at", "last_seen")
+
 @app.get("/download/{tld}")
-async def download_domains(tld: str, db: Session = Depends(get_db)):
-    """Download domains for a specific TLD as a text file"""
-    domains = db.query(Domain).filter(Domain.tld == tld).all()
-    if not domains:
+def download_domains(
+    tld: str,
+    format: str = "txt",
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Stream domains for a TLD as txt, csv or jsonl, optionally gzipped and filtered by date or id"""
+    if format not in CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of: {', '.join(CONTENT_TYPES)}")
+
+    stmt = export_select(Domain, EXPORT_FIELDS, tld=tld, start=start, end=end, since_id=since_id)
+    if db.execute(stmt.limit(1)).first() is None:
         raise HTTPException(status_code=404, detail="No domains found for this TLD")
-    
-    # Create temporary file
-    filename = f"domains_{tld.replace('.', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    filepath = f"app/static/downloads/{filename}"
-    os.makedirs("app/static/downloads", exist_ok=True)
-    
-    with open(filepath, "w") as f:
-        for domain in domains:
-            f.write(f"{domain.domain_name}\n")
-    
-    return FileResponse(
-        filepath,
-        media_type="text/plain",
-        filename=filename,
-        background=None
+
+    def body():
+        # The request's session is closed once the response starts, so the stream owns its own
+        export_db = SessionLocal()
+        try:
+            yield from export_stream(export_db, stmt, format, EXPORT_FIELDS, compress=gzip)
+        finally:
+            export_db.close()
+
+    filename = export_filename(f"domains_{tld.strip('.').replace('.', '_')}", format, gzip)
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else CONTENT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
+def _domain_page(db: Session, tld: Optional[str], q: Optional[str], start: Optional[datetime],
+                 end: Optional[datetime], cursor: Optional[str], limit: int, count: bool):
+    """One keyset page of domains, newest first"""
+    filters = domain_filters(Domain, tld=tld, search=q, start=start, end=end)
+    try:
+        page = paginate(db, Domain, filters, limit=limit, cursor=cursor, with_total=count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "items": [
+            {
+                "id": domain["id"],
+                "domain_name": domain["domain_name"],
+                "tld": domain["tld"],
+                "created_at": domain["created_at"],
+                "last_seen": domain["last_seen"]
+            }
+            for domain in page.items
+        ],
+        "next_cursor": page.next_cursor,
+        "total": page.total
+    }
+
 @app.get("/domains")
-async def list_domains(db: Session = Depends(get_db)):
-    """List all stored domains"""
-    domains = db.query(Domain).all()
-    return [
-        {
-            "id": domain.id,
-            "domain_name": domain.domain_name,
-            "tld": domain.tld,
-            "created_at": domain.created_at
-        }
-        for domain in domains
-    ]
+def list_domains(
+    tld: Optional[str] = None,
+    q: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    count: bool = True,
+    db: Session = Depends(get_db)
+):
+    """List stored domains a page at a time; pass next_cursor back as cursor for the next page"""
+    return _domain_page(db, tld, q, start, end, cursor, limit, count)
 
 @app.get("/domains/{tld}")
-async def list_domains_by_tld(tld: str, db: Session = Depends(get_db)):
-    """List domains for a specific TLD"""
-    domains = db.query(Domain).filter(Domain.tld == tld).all()
-    return [
-        {
-            "id": domain.id,
-            "domain_name": domain.domain_name,
-            "tld": domain.tld,
-            "created_at": domain.created_at
-        }
-        for domain in domains
-    ]
+def list_domains_by_tld(
+    tld: str,
+    q: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    count: bool = True,
+    db: Session = Depends(get_db)
+):
+    """List domains for a specific TLD a page at a time"""
+    return _domain_page(db, tld, q, start, end, cursor, limit, count)
+
+@app.get("/jobs/active")
+def get_active_jobs():
+    """Running (and just finished) jobs with their number of viewers"""
+    return progress_hub.stats()
+
+@app.get("/stats/drivers")
+async def get_driver_pool_stats():
+    """Get the state of the warm driver pool"""
+    return driver_pool.stats()
+
+@app.post("/probe", status_code=202)
+async def start_probe(tld: Optional[str] = None, max_age: float = Query(PROBE_MAX_AGE, ge=0)):
+    """Check in the background which stored domains still resolve and answer over HTTP"""
+    global probe_run
+    if probe_run is not None and probe_run.running:
+        raise HTTPException(status_code=409, detail="A probe is already running")
+    probe_run = ProbeRun(tld, max_age)
+    probe_run.start()
+    return probe_run.to_dict()
+
+@app.get("/probe")
+def get_probe(db: Session = Depends(get_db)):
+    """Progress of the latest probe and the stored probe outcomes"""
+    totals = db.query(Domain.probe_status, func.count(Domain.id)).group_by(Domain.probe_status).all()
+    return {
+        "run": probe_run.to_dict() if probe_run else None,
+        "stored": {status or "unprobed": count for status, count in totals}
+    }
+
+@app.get("/rates")
+def get_rates():
+    """Current adaptive request rate per search engine"""
+    return SERP_RATE_LIMITER.snapshot()
+
+@app.get("/metrics")
+def get_metrics():
+    """Stage timings and counters in the Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/stats")
-async def get_stats(db: Session = Depends(get_db)):
-    """Get scraping statistics"""
-    total_domains = db.query(Domain).count()
-    tld_stats = db.query(Domain.tld, func.count(Domain.id)).group_by(Domain.tld).all()
+def get_stats(hours: int = Query(24, ge=1, le=24 * 30), db: Session = Depends(get_db)):
+    """Get scraping statistics from the precomputed per-TLD counters"""
+    totals = tld_totals(db)
     recent_domains = db.query(Domain).order_by(Domain.created_at.desc()).limit(10).all()
     
     return {
-        "total_domains": total_domains,
-        "tld_stats": dict(tld_stats),
+        "total_domains": sum(stats.total for stats in totals),
+        "tld_stats": {stats.tld: stats.total for stats in totals},
+        "tlds": [
+            {
+                "tld": stats.tld,
+                "total": stats.total,
+                "first_seen": stats.first_seen,
+                "last_seen": stats.last_seen,
+                "runs": stats.runs,
+                "last_run_added": stats.last_run_added,
+                "last_run_known": stats.last_run_known
+            }
+            for stats in totals
+        ],
+        "discovery": discovery_rates(db, hours),
         "recent_domains": [
             {
                 "domain_name": domain.domain_name,
@@ -181,4 +459,15 @@ async def get_stats(db: Session = Depends(get_db)):
             }
             for domain in recent_domains
         ]
-    } 
\ No newline at end of file
+    }
+
+@app.get("/stats/{tld}/discovery")
+def get_tld_discovery(tld: str, hours: int = Query(24, ge=1, le=24 * 30), db: Session = Depends(get_db)):
+    """Hourly discovery rate for one TLD"""
+    return discovery_rates(db, hours, tld)
+
+@app.post("/stats/rebuild")
+def rebuild_statistics(db: Session = Depends(get_db)):
+    """Recompute the counters from the domains table"""
+    rebuild_stats(db)
+    return {"message": "Statistics rebuilt"}
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, create_engine
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, Index, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
+from scraper_common.schema import add_missing_columns
+
 Base = declarative_base()
 
 class Domain(Base):
@@ -12,14 +14,65 @@ class Domain(Base):
     domain_name = Column(String, unique=True, index=True)
     tld = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow, index=True)
+    # Latest liveness probe (services/probe.py)
+    probe_status = Column(String, nullable=True, index=True)
+    ip = Column(String, nullable=True)
+    http_status = Column(Integer, nullable=True)
+    final_url = Column(String, nullable=True)
+    latency = Column(Float, nullable=True)  # Seconds for DNS and HTTP together
+    probed_at = Column(DateTime, nullable=True, index=True)
+
+    # Keyset pagination walks (created_at, id), optionally within one TLD
+    __table_args__ = (
+        Index("ix_domains_created_at_id", "created_at", "id"),
+        Index("ix_domains_tld_created_at_id", "tld", "created_at", "id"),
+    )
+
+class CrawlJob(Base):
+    __tablename__ = "crawl_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tld = Column(String, index=True)
+    query = Column(String)
+    status = Column(String, default="running", index=True)
+    page = Column(Integer, default=0)  # Result pages finished so far
+    next_url = Column(String, nullable=True)
+    domains = Column(Text, default="[]")  # JSON list of domains found so far
+    dry_pages = Column(Integer, default=0)  # Latest pages in a row with too few new domains
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TldStats(Base):
+    """Running totals per TLD, updated with every batch of stored domains"""
+    __tablename__ = "tld_stats"
+
+    tld = Column(String, primary_key=True)
+    total = Column(Integer, default=0)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    runs = Column(Integer, default=0)
+    last_run_added = Column(Integer, default=0)  # New domains found by the latest run
+    last_run_known = Column(Integer, default=0)  # Domains the latest run found again
+
+class DiscoveryBucket(Base):
+    """New and re-seen domains per TLD per hour"""
+    __tablename__ = "discovery_buckets"
+
+    tld = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True, index=True)
+    added = Column(Integer, default=0)
+    seen = Column(Integer, default=0)
 
 # Database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///./domains.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create tables
+# Create tables, and columns added to existing tables since they were created
 Base.metadata.create_all(bind=engine)
+add_missing_columns(Base.metadata, engine)
 
 # Dependency
 def get_db():
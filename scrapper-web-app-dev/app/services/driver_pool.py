@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """A driver owned by the pool plus the bookkeeping used for recycling"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.pages = 0
+        self.leases = 0
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class DriverPool:
+    """Bounded pool of pre-launched WebDrivers that scrape jobs lease and return.
+
+    Drivers are health checked before every lease, reset (cookies, storage,
+    extra tabs) when they come back, and recycled once they have served
+    max_pages pages or are older than max_age seconds so Chrome's memory
+    growth stays bounded.
+    """
+
+    def __init__(self, factory: Callable, size: int = 2, warm: int = 1,
+                 max_pages: int = 200, max_age: float = 30 * 60, lease_timeout: float = 120):
+        self.factory = factory
+        self.size = size
+        self.warm = min(warm, size)
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.lease_timeout = lease_timeout
+        self._idle = deque()
+        self._leased: Dict[int, PooledDriver] = {}
+        self._launching = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        """Launch the warm drivers; blocks until they are up"""
+        for _ in range(self.warm):
+            with self._cond:
+                if self._closed or self._total() >= self.size:
+                    return
+                self._launching += 1
+            pooled = self._launch()
+            with self._cond:
+                self._launching -= 1
+                if pooled:
+                    self._idle.append(pooled)
+                self._cond.notify()
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._leased) + self._launching
+
+    def _launch(self) -> Optional[PooledDriver]:
+        try:
+            return PooledDriver(self.factory())
+        except Exception as e:
+            logger.error(f"Failed to launch pooled driver: {e}")
+            return None
+
+    def _quit(self, pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled: PooledDriver) -> bool:
+        return pooled.pages >= self.max_pages or pooled.age >= self.max_age
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return 1")
+            return bool(pooled.driver.window_handles)
+        except Exception:
+            return False
+
+    def _reset(self, pooled: PooledDriver) -> bool:
+        """Close extra tabs and clear cookies and storage so the next job starts clean"""
+        driver = pooled.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.delete_all_cookies()
+            driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled driver, recycling it: {e}")
+            return False
+
+    def lease(self, timeout: Optional[float] = None):
+        """Lease a healthy driver, launching one if the pool is not full yet"""
+        deadline = time.monotonic() + (self.lease_timeout if timeout is None else timeout)
+        while True:
+            with self._cond:
+                while not self._idle and self._total() >= self.size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No WebDriver available in the pool")
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise RuntimeError("Driver pool is shut down")
+                pooled = self._idle.popleft() if self._idle else None
+                if pooled is None:
+                    self._launching += 1
+
+            if pooled is None:
+                pooled = self._launch()
+                with self._cond:
+                    self._launching -= 1
+                    if pooled is None:
+                        self._cond.notify()
+                        raise RuntimeError("Failed to launch a WebDriver")
+            elif self._is_expired(pooled) or not self._is_healthy(pooled):
+                logger.info(f"Recycling driver after {pooled.pages} pages / {pooled.age:.0f}s")
+                self._quit(pooled)
+                with self._cond:
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                pooled.leases += 1
+                self._leased[id(pooled.driver)] = pooled
+            return pooled.driver
+
+    def release(self, driver, pages: int = 0, broken: bool = False):
+        """Return a leased driver; it is reset, or quit if it is broken or due for recycling"""
+        with self._cond:
+            pooled = self._leased.pop(id(driver), None)
+        if pooled is None:
+            # Not ours (or already released)
+            return
+        pooled.pages += pages
+        keep = not broken and not self._closed and not self._is_expired(pooled) and self._reset(pooled)
+        if not keep:
+            self._quit(pooled)
+        with self._cond:
+            if keep:
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    def shutdown(self):
+        """Quit every idle driver; leased drivers are quit when they are released"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "launching": self._launching,
+            }
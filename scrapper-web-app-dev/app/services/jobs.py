@@ -0,0 +1,75 @@
+import json
+from typing import List, Optional
+
+from ..models import CrawlJob, SessionLocal
+from scraper_common.checkpoint import CrawlState
+from scraper_common.metrics import STORE_WRITE
+
+
+def _to_state(job: CrawlJob) -> CrawlState:
+    return CrawlState(job.tld, job.query, job.page or 0, job.next_url, json.loads(job.domains or "[]"),
+                      job.status, job.error, job.updated_at.isoformat() if job.updated_at else None,
+                      dry_pages=job.dry_pages or 0)
+
+
+def create_job(state: CrawlState) -> int:
+    """Persist a new crawl job and return its id"""
+    db = SessionLocal()
+    try:
+        job = CrawlJob(tld=state.tld, query=state.query, status=state.status)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def load_job(job_id: int) -> Optional[CrawlState]:
+    """Load the last checkpoint of a crawl job"""
+    db = SessionLocal()
+    try:
+        job = db.get(CrawlJob, job_id)
+        return _to_state(job) if job else None
+    finally:
+        db.close()
+
+
+def save_checkpoint(job_id: int, state: CrawlState):
+    """Write the crawl state after a finished page"""
+    db = SessionLocal()
+    try:
+        with STORE_WRITE.time(store="checkpoint"):
+            job = db.get(CrawlJob, job_id)
+            if job is None:
+                return
+            job.page = state.page
+            job.next_url = state.next_url
+            job.domains = json.dumps(sorted(state.domains))
+            job.dry_pages = state.dry_pages
+            job.status = state.status
+            job.error = state.error
+            db.commit()
+    finally:
+        db.close()
+
+
+def list_jobs(limit: int = 50) -> List[dict]:
+    """Most recent crawl jobs, newest first"""
+    db = SessionLocal()
+    try:
+        jobs = db.query(CrawlJob).order_by(CrawlJob.id.desc()).limit(limit).all()
+        return [
+            {
+                "id": job.id,
+                "tld": job.tld,
+                "status": job.status,
+                "page": job.page,
+                "domains": len(json.loads(job.domains or "[]")),
+                "error": job.error,
+                "created_at": job.created_at,
+                "updated_at": job.updated_at,
+            }
+            for job in jobs
+        ]
+    finally:
+        db.close()
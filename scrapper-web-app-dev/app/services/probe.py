@@ -0,0 +1,167 @@
+"""Check which stored domains still resolve and answer over HTTP, and store the outcome on each row.
+
+Domains probed within --max-age seconds are skipped, so a rerun only
+checks new domains and stale results. Run from scrapper-web-app-dev:
+
+    python -m app.services.probe [--tld .ir] [--max-age 86400]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+
+from ..models import Domain, SessionLocal
+from scraper_common.bulk import bulk_update
+from scraper_common.dns import AsyncResolver
+from scraper_common.metrics import STORE_WRITE
+from scraper_common.probe import Prober, ProbeResult
+
+logger = logging.getLogger(__name__)
+
+# Nameservers as comma-separated host[:port] (default: the system's) and how hard the probe may push
+PROBE_RESOLVERS = [spec.strip() for spec in os.getenv("PROBE_RESOLVERS", "").split(",") if spec.strip()]
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "1000"))
+PROBE_PER_RESOLVER = int(os.getenv("PROBE_PER_RESOLVER", "256"))
+PROBE_PER_HOST = int(os.getenv("PROBE_PER_HOST", "4"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "10"))
+# Port for http:// URLs, e.g. of a local test server
+PROBE_HTTP_PORT = int(os.getenv("PROBE_HTTP_PORT", "80"))
+# Domains probed more recently than this many seconds are not probed again
+PROBE_MAX_AGE = float(os.getenv("PROBE_MAX_AGE", "86400"))
+
+
+def create_prober() -> Prober:
+    resolver = AsyncResolver(PROBE_RESOLVERS or None, per_nameserver=PROBE_PER_RESOLVER)
+    return Prober(resolver, concurrency=PROBE_CONCURRENCY, per_host=PROBE_PER_HOST, timeout=PROBE_TIMEOUT,
+                  ttl=PROBE_MAX_AGE, http_port=PROBE_HTTP_PORT)
+
+
+def _due_chunk(tld: Optional[str], cutoff: datetime, after_id: int, limit: int) -> List[Tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        clauses = [Domain.id > after_id, or_(Domain.probed_at.is_(None), Domain.probed_at < cutoff)]
+        if tld:
+            clauses.append(Domain.tld == tld)
+        stmt = select(Domain.id, Domain.domain_name).where(*clauses).order_by(Domain.id).limit(limit)
+        return db.execute(stmt).all()
+    finally:
+        db.close()
+
+
+async def due_domains(tld: Optional[str], max_age: float, chunk_size: int = 5000) -> AsyncIterator[str]:
+    """Domains never probed or probed before max_age seconds ago, read in id order off the event loop"""
+    loop = asyncio.get_running_loop()
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    after_id = 0
+    while True:
+        rows = await loop.run_in_executor(None, _due_chunk, tld, cutoff, after_id, chunk_size)
+        for _, domain in rows:
+            yield domain
+        if len(rows) < chunk_size:
+            return
+        after_id = rows[-1][0]
+
+
+def save_results(results: List[ProbeResult]):
+    """Write a batch of probe results to their domain rows"""
+    rows = [{"domain_name": result.domain, "probe_status": result.status, "ip": result.ip,
+             "http_status": result.http_status, "final_url": result.final_url, "latency": result.latency,
+             "probed_at": datetime.fromisoformat(result.checked_at)} for result in results]
+    db = SessionLocal()
+    try:
+        with STORE_WRITE.time(store="probe"):
+            bulk_update(db, Domain, rows, key="domain_name")
+            db.commit()
+    finally:
+        db.close()
+
+
+async def probe_stored_domains(prober: Prober, tld: Optional[str] = None, max_age: float = PROBE_MAX_AGE,
+                               batch_size: int = 500, counts: Optional[Counter] = None) -> Counter:
+    """Probe the due domains (of one TLD, or all) and write the results back batch_size at a time"""
+    counts = counts if counts is not None else Counter()
+    loop = asyncio.get_running_loop()
+    batch = []
+    async for result in prober.probe_many(due_domains(tld, max_age)):
+        counts[result.status] += 1
+        batch.append(result)
+        if len(batch) >= batch_size:
+            # Probes already in flight keep running while the batch is written
+            await loop.run_in_executor(None, save_results, batch)
+            batch = []
+    if batch:
+        await loop.run_in_executor(None, save_results, batch)
+    return counts
+
+
+class ProbeRun:
+    """A probe of the stored domains running in the background of the app"""
+
+    def __init__(self, tld: Optional[str], max_age: float):
+        self.tld = tld
+        self.max_age = max_age
+        self.counts = Counter()
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def run(self):
+        prober = create_prober()
+        try:
+            await probe_stored_domains(prober, self.tld, self.max_age, counts=self.counts)
+        except Exception as e:
+            logger.error(f"Probe of stored domains failed: {e}")
+            self.error = str(e)
+        finally:
+            prober.close()
+            self.finished_at = datetime.utcnow()
+
+    def to_dict(self) -> dict:
+        return {
+            "tld": self.tld,
+            "running": self.running,
+            "probed": sum(self.counts.values()),
+            "counts": dict(self.counts),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tld", help="only domains of this TLD, e.g. .ir")
+    parser.add_argument("--max-age", type=float, default=PROBE_MAX_AGE,
+                        help="seconds a stored result stays valid (0 probes everything again)")
+    parser.add_argument("--batch-size", type=int, default=500, help="results written to the database at a time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        prober = create_prober()
+        try:
+            return await probe_stored_domains(prober, args.tld, args.max_age, args.batch_size)
+        finally:
+            prober.close()
+
+    counts = asyncio.run(run())
+    print(f"Probed {sum(counts.values())} domains: {dict(counts)}")
+
+
+if __name__ == "__main__":
+    main()
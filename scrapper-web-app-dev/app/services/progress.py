@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Seconds between coalesced progress frames
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "1.0"))
+# Frames a subscriber may fall behind before its backlog is replaced by a snapshot
+SUBSCRIBER_QUEUE_SIZE = 32
+# How long a finished job stays in the hub so reconnecting viewers still get its final frame
+FINISHED_JOB_TTL = 60.0
+
+
+class JobProgress:
+    """Progress of one scrape job, fanned out to every subscriber in periodic batched frames.
+
+    The scraper only records what happened (new domains, status messages,
+    the current page); a flusher task turns that into at most one frame per
+    PROGRESS_INTERVAL. Subscribers get a snapshot first, so viewers that
+    join late see everything found so far.
+    """
+
+    def __init__(self, job_id: int, tld: str, max_pages: int, page: int = 0,
+                 domains: Iterable[str] = (), interval: float = PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.tld = tld
+        self.max_pages = max_pages
+        self.page = page
+        self.domains: List[str] = sorted(domains)
+        self.status = "running"
+        self.message = "Starting scraping process..."
+        self.messages = deque(maxlen=20)
+        self.final: Optional[dict] = None
+        self.interval = interval
+        self.started = time.monotonic()
+        self._start_count = len(self.domains)
+        self._known: Set[str] = set(self.domains)
+        self._new_domains: List[str] = []
+        self._new_messages: List[str] = []
+        self._dirty = False
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+    # Producer side, called by the scraper
+
+    def add_domains(self, domains: Iterable[str]):
+        for domain in domains:
+            if domain not in self._known:
+                self._known.add(domain)
+                self.domains.append(domain)
+                self._new_domains.append(domain)
+                self._dirty = True
+
+    def log(self, message: str):
+        self.message = message
+        self.messages.append(message)
+        self._new_messages.append(message)
+        self._dirty = True
+
+    def set_status(self, status: str):
+        """"running", or "captcha" while the job is parked on a CAPTCHA"""
+        self.status = status
+        self._dirty = True
+
+    def set_page(self, page: int):
+        self.page = page
+        self._dirty = True
+
+    def finish(self, frame: dict):
+        """Publish the final frame (complete or error) and close every subscription"""
+        self.flush()
+        self.status = frame.get("type", "complete")
+        self.final = frame
+        for queue in list(self._subscribers):
+            self._deliver(queue, frame)
+            self._deliver(queue, None)
+        self._subscribers.clear()
+        if self._flusher:
+            self._flusher.cancel()
+
+    # Frames
+
+    @property
+    def progress(self) -> float:
+        if self.status == "complete":
+            return 1.0
+        return min(self.page / self.max_pages, 1.0) if self.max_pages else 0.0
+
+    @property
+    def rate(self) -> float:
+        """New domains per minute since the job (or this resume of it) started"""
+        elapsed = time.monotonic() - self.started
+        return round((len(self.domains) - self._start_count) / elapsed * 60, 1) if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "type": "snapshot",
+            "job_id": self.job_id,
+            "tld": self.tld,
+            "status": self.status,
+            "message": self.message,
+            "messages": list(self.messages),
+            "domains": list(self.domains),
+            "page": self.page,
+            "max_pages": self.max_pages,
+            "progress": self.progress,
+            "rate": self.rate,
+        }
+
+    def flush(self):
+        """Send everything recorded since the last frame as one progress frame"""
+        if not self._dirty:
+            return
+        frame = {
+            "type": "progress",
+            "status": self.status,
+            "message": self.message,
+            "messages": self._new_messages,
+            "new_domains": self._new_domains,
+            "total_domains": len(self.domains),
+            "page": self.page,
+            "max_pages": self.max_pages,
+            "progress": self.progress,
+            "rate": self.rate,
+        }
+        self._new_domains, self._new_messages, self._dirty = [], [], False
+        for queue in list(self._subscribers):
+            self._deliver(queue, frame)
+
+    def _deliver(self, queue: asyncio.Queue, frame: Optional[dict]):
+        if queue.full():
+            # A slow viewer gets its backlog replaced by one snapshot instead of holding frames for everybody
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(self.snapshot())
+        queue.put_nowait(frame)
+
+    # Consumer side
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue of frames for one viewer; starts with a snapshot and ends with None"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + 2)
+        queue.put_nowait(self.snapshot())
+        if self.final is not None:
+            queue.put_nowait(self.final)
+            queue.put_nowait(None)
+        else:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self.final is None:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+
+class ProgressHub:
+    """Running jobs by id, with at most one running job per TLD"""
+
+    def __init__(self):
+        self.jobs: Dict[int, JobProgress] = {}
+
+    def open(self, job_id: int, tld: str, max_pages: int, page: int = 0, domains: Iterable[str] = ()) -> JobProgress:
+        job = JobProgress(job_id, tld, max_pages, page, domains)
+        self.jobs[job_id] = job
+        job.start()
+        return job
+
+    def get(self, job_id: int) -> Optional[JobProgress]:
+        return self.jobs.get(job_id)
+
+    def running_for(self, tld: str) -> Optional[JobProgress]:
+        """The job currently scraping a TLD, if any"""
+        for job in self.jobs.values():
+            if job.tld == tld and job.final is None:
+                return job
+        return None
+
+    def close(self, job_id: int, frame: dict):
+        """Finish a job and forget it once late reconnects have had a chance to see the final frame"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.finish(frame)
+        asyncio.get_running_loop().call_later(FINISHED_JOB_TTL, self._forget, job_id, job)
+
+    def _forget(self, job_id: int, job: JobProgress):
+        if self.jobs.get(job_id) is job:
+            del self.jobs[job_id]
+
+    def stats(self) -> List[dict]:
+        return [
+            {"job_id": job.job_id, "tld": job.tld, "status": job.status, "page": job.page,
+             "domains": len(job.domains), "subscribers": job.subscribers}
+            for job in self.jobs.values()
+        ]
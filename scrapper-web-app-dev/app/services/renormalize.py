@@ -0,0 +1,117 @@
+"""Rewrite stored domains to their registrable form and merge the duplicates this creates.
+
+Older versions stored "scheme://host", so http://x.ir, https://x.ir and
+https://www.x.ir ended up as three rows. Run from scrapper-web-app-dev:
+
+    python -m app.services.renormalize [--dry-run]
+"""
+import argparse
+import logging
+from collections import defaultdict
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from ..models import Domain, SessionLocal
+from .stats import rebuild_stats
+from scraper_common.domains import normalize_batch
+
+logger = logging.getLogger(__name__)
+
+
+def _earliest(a, b):
+    return min(d for d in (a, b) if d) if (a or b) else None
+
+
+def _latest(a, b):
+    return max(d for d in (a, b) if d) if (a or b) else None
+
+
+def renormalize_domains(db: Session, chunk_size: int = 5000, dry_run: bool = False) -> dict:
+    """Normalize every domain_name; rows that collapse onto an existing domain are merged into it"""
+    counts = {"scanned": 0, "renamed": 0, "merged": 0, "dropped": 0}
+    # In a dry run renames are not written, so later chunks cannot find them in the table
+    dry_renamed = set()
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Domain.id, Domain.domain_name, Domain.tld, Domain.created_at, Domain.last_seen)
+            .where(Domain.id > last_id).order_by(Domain.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        counts["scanned"] += len(rows)
+
+        by_tld = defaultdict(list)
+        for row in rows:
+            by_tld[row.tld].append(row)
+        normalized = {}
+        for tld, tld_rows in by_tld.items():
+            for row, name in zip(tld_rows, normalize_batch([row.domain_name for row in tld_rows], tld)):
+                normalized[row.id] = name
+
+        changed = [row for row in rows if normalized[row.id] != row.domain_name]
+        targets = {normalized[row.id] for row in changed if normalized[row.id]}
+        existing = {
+            row.domain_name: row
+            for row in db.execute(
+                select(Domain.id, Domain.domain_name, Domain.created_at, Domain.last_seen)
+                .where(Domain.domain_name.in_(targets))
+            )
+        } if targets else {}
+        # name -> [id, created_at, last_seen] of the row that keeps it
+        keepers = {name: [row.id, row.created_at, row.last_seen] for name, row in existing.items()}
+
+        doomed = []
+        for row in changed:
+            name = normalized[row.id]
+            if not name:
+                counts["dropped"] += 1
+                doomed.append(row.id)
+            elif name in keepers or name in dry_renamed:
+                if name in keepers:
+                    keeper = keepers[name]
+                    keeper[1] = _earliest(keeper[1], row.created_at)
+                    keeper[2] = _latest(keeper[2], row.last_seen)
+                counts["merged"] += 1
+                doomed.append(row.id)
+            else:
+                keepers[name] = [row.id, row.created_at, row.last_seen]
+                counts["renamed"] += 1
+                if dry_run:
+                    dry_renamed.add(name)
+                else:
+                    db.execute(update(Domain).where(Domain.id == row.id).values(domain_name=name))
+
+        if not dry_run:
+            if doomed:
+                db.execute(delete(Domain).where(Domain.id.in_(doomed)))
+            for name, (keeper_id, created_at, last_seen) in keepers.items():
+                db.execute(update(Domain).where(Domain.id == keeper_id)
+                           .values(created_at=created_at, last_seen=last_seen))
+            db.commit()
+        logger.info(f"Renormalized {counts['scanned']} domains so far: {counts}")
+
+    if not dry_run and (counts["renamed"] or counts["merged"] or counts["dropped"]):
+        rebuild_stats(db)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        counts = renormalize_domains(db, args.chunk_size, args.dry_run)
+    finally:
+        db.close()
+    print(f"{'Would change' if args.dry_run else 'Changed'}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
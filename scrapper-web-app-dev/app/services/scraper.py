@@ -1,225 +1,329 @@
-import platform
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, ElementNotInteractableException, NoSuchElementException, WebDriverException
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import importlib
 import time
-import random
-from typing import List, Set, Optional
+from typing import Callable, Set, Optional
 import logging
-from fastapi import WebSocket
 import os
-import socket
-from urllib3.exceptions import NewConnectionError
+
+from .driver_pool import DriverPool
+from .progress import JobProgress
+from scraper_common.browser import DriverConfig, launch_chrome, pause_blocking, resume_blocking
+from scraper_common.checkpoint import CANCELLED, COMPLETED, FAILED, PARKED, RUNNING, CrawlState, StopRule
+from scraper_common.domains import registrable_domain
+from scraper_common.extraction import LinkFilter
+from scraper_common.fetch import (
+    GOOGLE_SEARCH_URL,
+    FallbackFetchBackend,
+    FetchBackend,
+    HttpFetchBackend,
+    SeleniumFetchBackend,
+    build_search_url,
+)
+from scraper_common.ratelimit import AdaptiveRateLimiter
 
 logger = logging.getLogger(__name__)
 
+# "http" fetches result pages without a browser, "selenium" always drives
+# Chrome and "auto" uses HTTP with Chrome as a fallback for JavaScript-only
+# pages and CAPTCHAs.
+FETCH_BACKEND = os.getenv("SCRAPER_FETCH_BACKEND", "auto")
+SEARCH_URL = os.getenv("SCRAPER_SEARCH_URL", GOOGLE_SEARCH_URL)
+# Result pages fetched per TLD at most
+MAX_PAGES = int(os.getenv("SCRAPER_MAX_PAGES", "30"))
+# A crawl stops early after SCRAPER_STOP_PATIENCE pages in a row with fewer than SCRAPER_STOP_MIN_NEW
+# new domains each (0 pages: never)
+STOP_RULE = StopRule(int(os.getenv("SCRAPER_STOP_MIN_NEW", "1")), int(os.getenv("SCRAPER_STOP_PATIENCE", "2")))
+# Whether crawls start with the TLD's domains from the database, so only domains missing there count as new
+SEED_KNOWN_DOMAINS = os.getenv("SCRAPER_SEED_KNOWN", "1").lower() in ("1", "true", "yes")
+
+# Blocking Selenium and HTTP calls run here so they never stall the event loop
+SCRAPER_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SCRAPER_THREADS", "8")),
+    thread_name_prefix="scraper",
+)
+
+# Pacing of result pages, shared by every job hitting the same search engine. Starts at one
+# request per SCRAPER_SERP_INTERVAL seconds and adapts to CAPTCHAs, 429s and slow pages.
+SERP_RATE_LIMITER = AdaptiveRateLimiter(
+    rate=1 / float(os.getenv("SCRAPER_SERP_INTERVAL", "4")),
+    min_rate=1 / 120,
+    max_rate=1 / float(os.getenv("SCRAPER_SERP_MIN_INTERVAL", "1")),
+    jitter=0.25,
+)
+
+# How often a parked job re-checks the page while a human solves a CAPTCHA
+CAPTCHA_POLL_INTERVAL = 5.0
+CAPTCHA_TIMEOUT = float(os.getenv("SCRAPER_CAPTCHA_TIMEOUT", "600"))
+# Optional "module:function" tried before waiting for a human; called as solver(driver, url) -> bool
+CAPTCHA_SOLVER = os.getenv("SCRAPER_CAPTCHA_SOLVER")
+
+def load_captcha_solver(spec: Optional[str]) -> Optional[Callable]:
+    """Import a CAPTCHA solver given as "module:function" """
+    if not spec:
+        return None
+    module_name, _, function = spec.partition(":")
+    return getattr(importlib.import_module(module_name), function or "solve")
+
+# Chrome settings (paths, headless mode, blocked resources, ports) from the CHROME_* environment variables
+DRIVER_CONFIG = DriverConfig.from_env()
+
+def create_chrome_driver(max_retries: int = 3):
+    """Start Chrome as configured by DRIVER_CONFIG, with retry logic"""
+    return launch_chrome(DRIVER_CONFIG, max_retries)
+
 class DomainScraper:
-    def __init__(self, websocket: Optional[WebSocket] = None):
-        self.current_os = platform.system()
-        self.websocket = websocket
+    def __init__(self, progress: Optional[JobProgress] = None, backend: str = FETCH_BACKEND,
+                 search_url: str = SEARCH_URL, driver_pool: Optional[DriverPool] = None,
+                 checkpoint: Optional[Callable[[CrawlState], None]] = None, max_pages: int = MAX_PAGES,
+                 captcha_solver: Optional[Callable] = None, stop_rule: StopRule = STOP_RULE):
+        # Where viewers pick up status messages, found domains and the current page
+        self.progress = progress
+        self.max_pages = max_pages
+        self.stop_rule = stop_rule
+        self.driver_pool = driver_pool
+        # Called (on the executor) with the crawl state after every page
+        self.checkpoint = checkpoint
+        self.state: Optional[CrawlState] = None
         self.is_cancelled = False
+        self.captcha_solver = captcha_solver or load_captcha_solver(CAPTCHA_SOLVER)
+        # Set by resolve_captcha() when someone reports the CAPTCHA as solved
+        self._captcha_resolved: Optional[asyncio.Event] = None
         self.driver = None
         self.wait = None
-        self._setup_chrome_driver()
+        self.search_url = search_url
+        self.backend = self._create_backend(backend)
+
+    def _create_backend(self, name: str) -> FetchBackend:
+        """Create the fetch backend; Chrome is only started once a page needs it"""
+        if name == "http":
+            return HttpFetchBackend()
+        release = self._release_driver if self.driver_pool else None
+        selenium_backend = SeleniumFetchBackend(self._launch_driver, release=release)
+        if name == "selenium":
+            return selenium_backend
+        if name == "auto":
+            return FallbackFetchBackend(HttpFetchBackend(), selenium_backend)
+        raise ValueError(f"Unknown fetch backend: {name}")
+
+    def _launch_driver(self):
+        """Lease a warm driver from the pool, or start Chrome if there is no pool"""
+        if self.driver_pool:
+            self.driver = self.driver_pool.lease()
+            self.wait = WebDriverWait(self.driver, 10)
+        else:
+            self._setup_chrome_driver()
+        return self.driver
+
+    def _release_driver(self, driver, pages: int):
+        """Hand a leased driver back to the pool"""
+        self.driver_pool.release(driver, pages=pages)
+        self.driver = None
         
     def _setup_chrome_driver(self, max_retries: int = 3):
         """Setup Chrome driver based on operating system with retry logic"""
-        retry_count = 0
-        last_error = None
+        self.driver = create_chrome_driver(max_retries)
+        self.wait = WebDriverWait(self.driver, 10)  # 10 seconds timeout
 
-        while retry_count < max_retries:
-            try:
-                if self.current_os == "Darwin":  # macOS
-                    chrome_driver_path = "/opt/homebrew/bin/chromedriver"  # Typical path for chromedriver on macOS
-                    chrome_binary_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-                elif self.current_os == "Linux":
-                    chrome_driver_path = "/usr/bin/chromedriver"
-                    chrome_binary_path = "/usr/bin/google-chrome"
-                elif self.current_os == "Windows":
-                    chrome_driver_path = "C:\\path\\to\\chromedriver.exe"
-                    chrome_binary_path = "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe"
-                else:
-                    raise Exception(f"Unsupported OS: {self.current_os}")
-
-                if not os.path.exists(chrome_driver_path):
-                    raise Exception(f"ChromeDriver not found at {chrome_driver_path}. Please install it using Homebrew: brew install chromedriver")
-
-                chrome_options = Options()
-                chrome_options.binary_location = chrome_binary_path
-                
-                # Configure window size and position
-                chrome_options.add_argument("--window-size=800,600")
-                chrome_options.add_argument("--window-position=0,0")  # Position on the left side
-                
-                # Additional options for better scraping
-                chrome_options.add_argument("--disable-gpu")
-                chrome_options.add_argument("--no-sandbox")
-                chrome_options.add_argument("--disable-dev-shm-usage")
-                chrome_options.add_argument("--remote-debugging-port=9222")  # Enable remote debugging
-                
-                # Add user agent to avoid detection
-                chrome_options.add_argument("--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-                
-                service = Service(executable_path=chrome_driver_path)
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-                self.wait = WebDriverWait(self.driver, 10)  # 10 seconds timeout
-                return  # Successfully initialized
-
-            except (WebDriverException, NewConnectionError, socket.error) as e:
-                last_error = e
-                retry_count += 1
-                logger.warning(f"Failed to initialize ChromeDriver (attempt {retry_count}/{max_retries}): {str(e)}")
-                
-                # Clean up any partially initialized driver
-                if self.driver:
-                    try:
-                        self.driver.quit()
-                    except:
-                        pass
-                    self.driver = None
-                
-                # Wait before retrying
-                time.sleep(2)
-        
-        # If we get here, all retries failed
-        raise Exception(f"Failed to initialize ChromeDriver after {max_retries} attempts. Last error: {str(last_error)}")
+    async def _run(self, func, *args):
+        """Run a blocking call on the scraper executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(SCRAPER_EXECUTOR, functools.partial(func, *args))
 
-    async def _send_progress(self, message: str, progress: float = None):
-        """Send progress update through WebSocket"""
-        if self.websocket:
-            try:
-                await self.websocket.send_json({
-                    "message": message,
-                    "progress": progress
-                })
-            except Exception as e:
-                logger.error(f"Failed to send progress update: {e}")
+    def _set_status(self, status: str):
+        if self.progress:
+            self.progress.set_status(status)
+
+    def _send_progress(self, message: str):
+        """Record a status message; the progress hub batches it into the next frame for every viewer"""
+        if self.progress:
+            self.progress.log(message)
+        else:
+            logger.info(message)
 
-    def _is_captcha_present(self):
-        """Check if CAPTCHA is present on the page"""
+    @property
+    def parked(self) -> bool:
+        """Whether the job is waiting for a CAPTCHA to be solved"""
+        return self.state is not None and self.state.status == PARKED
+
+    def resolve_captcha(self):
+        """Report the CAPTCHA as solved; the parked job re-checks the page right away"""
+        if self._captcha_resolved is not None:
+            self._captcha_resolved.set()
+
+    async def _try_solver(self, url: str) -> bool:
         try:
-            # Wait for CAPTCHA elements with a shorter timeout
-            WebDriverWait(self.driver, 3).until(
-                EC.presence_of_element_located((By.XPATH, "//div[@id='captcha'] | //iframe[contains(@src, 'recaptcha')]"))
-            )
-            return True
-        except TimeoutException:
+            return bool(await self._run(self.captcha_solver, self.backend.driver, url))
+        except Exception as e:
+            logger.error(f"CAPTCHA solver failed: {e}")
             return False
 
-    def _is_next_button_present(self):
-        """Check if next button is present and clickable"""
+    async def _wait_for_captcha(self, link_filter: LinkFilter, url: str):
+        """Park the job until its CAPTCHA is solved, keeping the browser session.
+
+        The page is re-checked every CAPTCHA_POLL_INTERVAL seconds, right away
+        when resolve_captcha() is called, and after the solver hook says it
+        solved it. Only this job waits; returns None after CAPTCHA_TIMEOUT.
+        """
+        self._captcha_resolved = asyncio.Event()
+        deadline = time.monotonic() + CAPTCHA_TIMEOUT
+        # The CAPTCHA widget needs the images and styles blocked for scraping
+        await self._run(pause_blocking, self.backend.driver)
         try:
-            next_button = self.wait.until(
-                EC.element_to_be_clickable((By.XPATH, "//a[@id='pnnext' or contains(text(), 'Next')]"))
-            )
-            return next_button
-        except (TimeoutException, ElementNotInteractableException):
+            if self.captcha_solver and await self._try_solver(url):
+                result = await self._run(self.backend.reload, link_filter)
+                if not result.captcha:
+                    return result
+                self._send_progress("CAPTCHA solver did not get past the CAPTCHA")
+            while not self.is_cancelled and time.monotonic() < deadline:
+                timeout = min(CAPTCHA_POLL_INTERVAL, deadline - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._captcha_resolved.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                if self.is_cancelled:
+                    break
+                reported = self._captcha_resolved.is_set()
+                self._captcha_resolved.clear()
+                result = await self._run(self.backend.reload, link_filter)
+                if not result.captcha:
+                    return result
+                if reported:
+                    self._send_progress("The CAPTCHA is still there, please solve it in the browser window.")
             return None
+        finally:
+            self._captcha_resolved = None
+            if self.backend.driver is not None:
+                await self._run(resume_blocking, self.backend.driver)
 
-    def _get_base_domain(self, url: str) -> str:
-        """Extract base domain from URL"""
-        parsed_url = urlparse(url)
-        return f"{parsed_url.scheme}://{parsed_url.netloc}"
+    def _get_base_domain(self, url: str, tld: Optional[str] = None) -> Optional[str]:
+        """Extract the registrable domain from a URL (www.x.co.ir -> x.co.ir)"""
+        return registrable_domain(url, tld)
 
-    async def scrape_tld(self, tld: str) -> Set[str]:
-        """Scrape domains for a specific TLD"""
-        domain_list = set()
+    @staticmethod
+    def new_state(tld: str) -> CrawlState:
+        """Fresh crawl state for a TLD"""
         base_query = "-site:.gov.ir"
-        query = f"site:{tld} {base_query}"
-        url = f"https://www.google.com/search?q={query}"
+        return CrawlState(tld, f"site:{tld} {base_query}")
 
-        try:
-            # Ensure driver is still valid
-            if not self.driver:
-                self._setup_chrome_driver()
+    async def _save_checkpoint(self, state: CrawlState):
+        if self.checkpoint:
+            try:
+                await self._run(self.checkpoint, state)
+            except Exception as e:
+                logger.error(f"Failed to save checkpoint: {e}")
 
-            self.driver.get(url)
-            await self._send_progress(f"Starting scrape for TLD: {tld}", 0.0)
-            time.sleep(2)  # Initial page load
+    async def scrape_tld(self, tld: str, state: Optional[CrawlState] = None) -> Set[str]:
+        """Scrape domains for a specific TLD, continuing from state if one is given"""
+        if state is None:
+            state = self.new_state(tld)
+        state.status, state.error = RUNNING, None
+        self.state = state
+        domain_list = state.domains
+        url = state.next_url or build_search_url(state.query, self.search_url)
+        link_filter = LinkFilter(tld, exclude=('.gov.ir', 'translate.google.com'))
 
-            for page in range(30):
+        try:
+            if state.page:
+                self._send_progress(f"Resuming scrape for TLD: {tld} at page {state.page + 1}")
+            else:
+                self._send_progress(f"Starting scrape for TLD: {tld}")
+
+            for page in range(state.page, self.max_pages):
                 if self.is_cancelled:
-                    await self._send_progress("Scraping cancelled by user", 0.0)
+                    state.status = CANCELLED
+                    self._send_progress("Scraping cancelled by user")
                     break
 
+                engine = SERP_RATE_LIMITER.key_for(url)
+                await SERP_RATE_LIMITER.acquire_async(engine)
+                started = time.monotonic()
+                try:
+                    result = await self._run(self.backend.fetch, url, link_filter)
+                except Exception:
+                    SERP_RATE_LIMITER.record(engine, time.monotonic() - started, error=True)
+                    raise
+                SERP_RATE_LIMITER.record(engine, time.monotonic() - started, captcha=result.captcha)
+
                 # Check for CAPTCHA
-                if self._is_captcha_present():
-                    await self._send_progress("CAPTCHA detected! Please solve it manually.", 0.0)
-                    input("Press Enter after solving the CAPTCHA...")
-                    await self._send_progress("CAPTCHA solved, resuming...", 0.0)
-                    time.sleep(2)  # Wait for page to stabilize after CAPTCHA
+                if result.captcha:
+                    if self.backend.driver is None:
+                        state.status, state.error = FAILED, "CAPTCHA detected and no browser fallback is configured"
+                        self._send_progress(state.error)
+                        break
+                    # Park the job (and checkpoint it) while the CAPTCHA waits; other jobs keep running
+                    state.status = PARKED
+                    self._set_status("captcha")
+                    await self._save_checkpoint(state)
+                    self._send_progress("CAPTCHA detected! Please solve it manually in the browser window.")
+                    result = await self._wait_for_captcha(link_filter, url)
+                    if result is None:
+                        if self.is_cancelled:
+                            state.status = CANCELLED
+                            self._send_progress("Scraping cancelled by user")
+                        else:
+                            # Stays parked: the job can be resumed from its checkpoint later
+                            state.error = "CAPTCHA was not solved in time"
+                            self._send_progress(state.error)
+                        break
+                    state.status = RUNNING
+                    self._set_status("running")
+                    self._send_progress("CAPTCHA solved, resuming...")
 
-                # Wait for search results to load
-                try:
-                    self.wait.until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, 'div.g'))
-                    )
-                except TimeoutException:
-                    await self._send_progress("No search results found", 0.0)
+                if not result.has_results:
+                    state.status = COMPLETED
+                    self._send_progress("No search results found")
                     break
 
                 # Scrape current page
-                results = self.driver.find_elements(By.CSS_SELECTOR, 'a')
-                for link in results:
-                    try:
-                        href = link.get_attribute('href')
-                        if href and tld.lower() in href.lower() and '.gov.ir' not in href and 'translate.google.com' not in href:
-                            base_domain = self._get_base_domain(href)
-                            domain_list.add(base_domain)
-                            await self._send_progress(f"Found domain: {base_domain}", 0.0)
-                    except Exception as e:
-                        logger.error(f"Error processing link: {e}")
-                        continue
-
-                # Try to click next button
-                next_button = self._is_next_button_present()
-                if next_button:
-                    try:
-                        next_button.click()
-                        await self._send_progress(f"Moving to page {page + 1}", 0.0)
-                        time.sleep(random.uniform(3, 5))  # Random delay between pages
-                    except Exception as e:
-                        logger.error(f"Error clicking next button: {e}")
-                        break
+                page_domains = set()
+                for link in result.links:
+                    base_domain = self._get_base_domain(link.href, tld)
+                    if base_domain:
+                        page_domains.add(base_domain)
+
+                # Checkpoint after every page so a crash only loses the page in flight
+                new = state.advance(result.next_url, page_domains, self.stop_rule)
+                if self.progress:
+                    # One update per page instead of one frame per link
+                    self.progress.add_domains(page_domains)
+                    self.progress.set_page(state.page)
+                self._send_progress(f"Page {state.page}: {new} new of {len(page_domains)} domains")
+                exhausted = self.stop_rule.exhausted(state.dry_pages)
+                if not result.next_url or exhausted:
+                    state.status = COMPLETED
+                await self._save_checkpoint(state)
+
+                if exhausted:
+                    self._send_progress(f"Stopping early after {self.stop_rule.describe()}")
+                    break
+                if result.next_url:
+                    url = result.next_url
+                    self._send_progress(f"Moving to page {state.page + 1}")
                 else:
-                    await self._send_progress("No more pages available", 0.0)
+                    self._send_progress("No more pages available")
                     break
+            else:
+                state.status = COMPLETED
 
-            await self._send_progress(f"Completed scraping for {tld}. Found {len(domain_list)} domains.", 1.0)
+            self._send_progress(f"Completed scraping for {tld}. Found {len(domain_list)} domains.")
             return domain_list
 
         except Exception as e:
             logger.error(f"Error during scraping: {e}")
-            await self._send_progress(f"Error: {str(e)}", 0.0)
+            state.status, state.error = FAILED, str(e)
+            self._send_progress(f"Error: {str(e)}")
             raise
         finally:
-            # Clean up the driver in case of errors
-            if self.driver:
-                try:
-                    self.driver.quit()
-                except:
-                    pass
-                self.driver = None
+            await self._save_checkpoint(state)
+            # Clean up the backend (and the driver, if one was started)
+            await self._run(self.backend.close)
+            self.driver = None
 
     def cancel(self):
-        """Cancel the scraping operation"""
+        """Cancel the scraping operation; the scrape loop stops before its next page"""
         self.is_cancelled = True
-        if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass
-            self.driver = None
-
-    def __del__(self):
-        """Cleanup when the scraper is destroyed"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass 
\ No newline at end of file
+        # A parked job stops waiting for its CAPTCHA
+        self.resolve_captcha()
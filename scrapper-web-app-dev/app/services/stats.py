@@ -0,0 +1,97 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..models import DiscoveryBucket, Domain, TldStats
+from scraper_common.bulk import dialect_insert
+
+BUCKET = timedelta(hours=1)
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the hourly bucket a timestamp falls into"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_run(db: Session, tld: str, inserted: int, known: int, now: Optional[datetime] = None):
+    """Fold one batch of stored domains into the counters; runs in the caller's transaction"""
+    now = now or datetime.utcnow()
+    insert = dialect_insert(db.get_bind().dialect.name)
+
+    stats = insert(TldStats).values(tld=tld, total=inserted, first_seen=now, last_seen=now, runs=1,
+                                    last_run_added=inserted, last_run_known=known)
+    db.execute(stats.on_conflict_do_update(index_elements=["tld"], set_={
+        "total": TldStats.total + inserted,
+        "first_seen": func.coalesce(TldStats.first_seen, now),
+        "last_seen": now,
+        "runs": TldStats.runs + 1,
+        "last_run_added": inserted,
+        "last_run_known": known,
+    }))
+
+    bucket = insert(DiscoveryBucket).values(tld=tld, bucket_start=bucket_start(now), added=inserted, seen=known)
+    db.execute(bucket.on_conflict_do_update(index_elements=["tld", "bucket_start"], set_={
+        "added": DiscoveryBucket.added + inserted,
+        "seen": DiscoveryBucket.seen + known,
+    }))
+
+
+def rebuild_stats(db: Session, chunk_size: int = 5000):
+    """Recompute every counter from the domains table, e.g. for a database written by an older version.
+
+    Runs and per-run counts cannot be recovered from the domains alone and
+    start from zero; re-seen counts are lost for the same reason.
+    """
+    db.execute(delete(TldStats))
+    db.execute(delete(DiscoveryBucket))
+
+    totals = db.execute(
+        select(Domain.tld, func.count(Domain.id), func.min(Domain.created_at),
+               func.max(func.coalesce(Domain.last_seen, Domain.created_at)))
+        .group_by(Domain.tld)
+    ).all()
+    for tld, total, first_seen, last_seen in totals:
+        db.add(TldStats(tld=tld, total=total, first_seen=first_seen, last_seen=last_seen,
+                        runs=0, last_run_added=0, last_run_known=0))
+
+    # Bucketing in Python keeps this independent of the database's date functions
+    buckets = defaultdict(int)
+    for tld, created_at in db.execute(select(Domain.tld, Domain.created_at)).yield_per(chunk_size):
+        if created_at:
+            buckets[(tld, bucket_start(created_at))] += 1
+    db.add_all(DiscoveryBucket(tld=tld, bucket_start=start, added=added, seen=0)
+               for (tld, start), added in buckets.items())
+    db.commit()
+
+
+def rebuild_if_empty(db: Session) -> bool:
+    """Backfill the counters once when they are missing but domains exist"""
+    if db.query(TldStats.tld).first() is not None or db.query(Domain.id).first() is None:
+        return False
+    rebuild_stats(db)
+    return True
+
+
+def tld_totals(db: Session) -> List[TldStats]:
+    return db.query(TldStats).order_by(TldStats.total.desc()).all()
+
+
+def discovery_rates(db: Session, hours: int = 24, tld: Optional[str] = None) -> List[dict]:
+    """New and re-seen domains per hour over the last `hours` hours, oldest first, empty hours included"""
+    end = bucket_start(datetime.utcnow())
+    start = end - BUCKET * (hours - 1)
+    query = (db.query(DiscoveryBucket.bucket_start, func.sum(DiscoveryBucket.added), func.sum(DiscoveryBucket.seen))
+             .filter(DiscoveryBucket.bucket_start >= start))
+    if tld:
+        query = query.filter(DiscoveryBucket.tld == tld)
+    counts = {row[0]: (row[1], row[2]) for row in query.group_by(DiscoveryBucket.bucket_start)}
+
+    rates = []
+    for i in range(hours):
+        moment = start + BUCKET * i
+        added, seen = counts.get(moment, (0, 0))
+        rates.append({"bucket_start": moment, "added": added, "seen": seen})
+    return rates
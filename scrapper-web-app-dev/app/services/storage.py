@@ -0,0 +1,24 @@
+from typing import Iterable, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import Domain
+from .stats import record_run
+from scraper_common.bulk import UpsertResult, bulk_upsert
+from scraper_common.metrics import STORE_WRITE
+
+
+def upsert_domains(db: Session, domains: Iterable[str], tld: str, chunk_size: int = 500) -> UpsertResult:
+    """Insert new domains, refresh last_seen on known ones and update the TLD counters in one transaction"""
+    rows = [{"domain_name": domain, "tld": tld} for domain in domains]
+    with STORE_WRITE.time(store="domains"):
+        result = bulk_upsert(db, Domain, rows, key="domain_name", seen_column="last_seen", chunk_size=chunk_size)
+        record_run(db, tld, result.inserted, result.known)
+        db.commit()
+    return result
+
+
+def known_domains(db: Session, tld: str) -> Set[str]:
+    """Every stored domain of a TLD, so a re-crawl can tell new domains from ones it finds again"""
+    return set(db.execute(select(Domain.domain_name).where(Domain.tld == tld)).scalars())
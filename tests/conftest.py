@@ -0,0 +1,134 @@
+# tests/conftest.py
+# Both web apps are a package called "app" that expects its project
+# directory on sys.path, so tests import them through load_app().
+import importlib
+import os
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FASTAPI_DIR = os.path.join(REPO_ROOT, "scrapper-web-app-dev")
+FLASK_DIR = os.path.join(REPO_ROOT, "tld-domain-scraper-webapp")
+
+
+@pytest.fixture
+def load_app(monkeypatch, tmp_path):
+    """Import a module of one web app's "app" package, run from tmp_path so its database files land there"""
+    def load(project_dir: str, module: str):
+        for name in [name for name in sys.modules if name == "app" or name.startswith("app.")]:
+            monkeypatch.delitem(sys.modules, name)
+        monkeypatch.syspath_prepend(project_dir)
+        monkeypatch.chdir(tmp_path)
+        return importlib.import_module(module)
+
+    yield load
+    # Don't leave one app's modules behind for a test that loads the other
+    for name in [name for name in sys.modules if name == "app" or name.startswith("app.")]:
+        del sys.modules[name]
+
+
+@pytest.fixture
+def bench_import(monkeypatch):
+    """Import a module of benchmarks/, e.g. the fake servers"""
+    monkeypatch.syspath_prepend(os.path.join(REPO_ROOT, "benchmarks"))
+    return importlib.import_module
+
+
+@pytest.fixture
+def processor_import(monkeypatch):
+    """Import a module of tld-domain-processor, which runs with its own directory on sys.path"""
+    monkeypatch.syspath_prepend(os.path.join(REPO_ROOT, "tld-domain-processor"))
+    return importlib.import_module
+
+
+class StubNameserver:
+    """A local nameserver over UDP and TCP whose answer per name the test picks.
+
+    Behaviours: "a" (127.0.0.1), "nxdomain", "servfail", "noaddr",
+    "truncated" (TC set over UDP, the full answer over TCP), "silent" (no
+    reply) and "garbage" (an unparseable reply). Every UDP reply is held for
+    `delay` seconds, and max_in_flight records how many queries were waiting
+    at the same time.
+    """
+
+    def __init__(self, default="a", delay=0.0):
+        self.behaviour = {}
+        self.default = default
+        self.delay = delay
+        self.queries = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class UdpHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                reply = stub._handle(data, tcp=False)
+                if reply is not None:
+                    sock.sendto(reply, self.client_address)
+
+        class TcpHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                length = struct.unpack("!H", self.rfile.read(2))[0]
+                reply = stub._handle(self.rfile.read(length), tcp=True)
+                self.wfile.write(struct.pack("!H", len(reply)) + reply)
+
+        self.udp = socketserver.ThreadingUDPServer(("127.0.0.1", 0), UdpHandler)
+        self.udp.daemon_threads = True
+        self.port = self.udp.server_address[1]
+        self.tcp = socketserver.ThreadingTCPServer(("127.0.0.1", self.port), TcpHandler)
+        self.tcp.daemon_threads = True
+        for server in (self.udp, self.tcp):
+            threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.spec = f"127.0.0.1:{self.port}"
+
+    def _handle(self, data, tcp):
+        offset, labels = 12, []
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode("ascii"))
+            offset += 1 + data[offset]
+        name, question = ".".join(labels), data[12:offset + 5]
+        behaviour = self.behaviour.get(name, self.default)
+        with self._lock:
+            self.queries.append((name, "tcp" if tcp else "udp"))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay and not tcp:
+                time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if behaviour == "silent":
+            return None
+        if behaviour == "garbage":
+            return data[:2] + b"\x81"
+        flags, rcode, answers = 0x8180, 0, b""
+        if behaviour == "nxdomain":
+            rcode = 3
+        elif behaviour == "servfail":
+            rcode = 2
+        elif behaviour == "truncated" and not tcp:
+            flags |= 0x0200
+        elif behaviour != "noaddr":
+            answers = struct.pack("!HHHIH", 0xC00C, 1, 1, 60, 4) + bytes([127, 0, 0, 1])
+        header = struct.pack("!HHHHHH", struct.unpack_from("!H", data)[0], flags | rcode, 1,
+                             1 if answers else 0, 0, 0)
+        return header + question + answers
+
+    def close(self):
+        for server in (self.udp, self.tcp):
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.fixture
+def nameserver():
+    stub = StubNameserver()
+    yield stub
+    stub.close()
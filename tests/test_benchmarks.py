@@ -0,0 +1,45 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from scraper_common.extraction import LinkFilter
+from scraper_common.fetch import HttpFetchBackend, build_search_url
+
+
+@pytest.fixture(params=["direct", "wrapped"])
+def fake_search(request, bench_import):
+    """The fake search engine with 3 pages of 5 results per query, result links plain or wrapped in /url?q="""
+    fake_servers = bench_import("fake_servers")
+    config = fake_servers.FakeServerConfig(pages=3, links=5, link_style=request.param)
+    server, base_url = fake_servers.start_fake_servers(config)
+    yield f"{base_url}/search"
+    server.shutdown()
+
+
+def test_http_backend_finds_every_result(fake_search):
+    backend = HttpFetchBackend()
+    try:
+        page = backend.fetch(build_search_url("site:.ir", fake_search), LinkFilter(".ir"))
+    finally:
+        backend.close()
+    assert len(page.links) == 5
+    assert all(link.href.startswith("https://www.site-") for link in page.links)
+    assert page.next_url
+
+
+def test_cli_scenario(fake_search, bench_import, tmp_path):
+    run_suite = bench_import("run_suite")
+    args = SimpleNamespace(jobs=2, pages=3, search_url=fake_search)
+    result = run_suite.bench_cli(args, str(tmp_path))
+
+    # Two TLDs, three pages of five new domains each
+    assert result["pages"] == 6
+    assert result["domains"] == 30
+    assert result["pages_per_s"] > 0
+    outputs = sorted(os.listdir(tmp_path / "out"))
+    assert outputs
+    for name in os.listdir(tmp_path / "checkpoints"):
+        with open(tmp_path / "checkpoints" / name) as f:
+            assert json.load(f)["status"] == "completed"
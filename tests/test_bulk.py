@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from conftest import FASTAPI_DIR, FLASK_DIR
+from scraper_common.bulk import SQLITE_MAX_VARIABLES, bulk_upsert, insert_columns
+from scraper_common.schema import add_missing_columns
+
+
+def count_parameters(engine):
+    """Record the number of bound parameters of every statement the engine runs"""
+    counts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            counts.append(len(parameters))
+
+    return counts
+
+
+def test_insert_columns_include_python_defaults(load_app):
+    models = load_app(FASTAPI_DIR, "app.models")
+    columns = insert_columns(models.Domain.__table__, {"domain_name": "a.ir", "tld": ".ir"}, "last_seen")
+    assert columns == {"domain_name", "tld", "last_seen", "created_at"}
+
+
+def test_sqlite_chunks_stay_under_parameter_limit(load_app, tmp_path):
+    models = load_app(FASTAPI_DIR, "app.models")
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    models.Base.metadata.create_all(engine)
+    inserts = count_parameters(engine)
+    session = sessionmaker(bind=engine)()
+
+    # 4 bound columns per row (domain_name, tld, last_seen, created_at): 249 rows per chunk
+    rows = [{"domain_name": f"site{i}.ir", "tld": ".ir"} for i in range(600)]
+    result = bulk_upsert(session, models.Domain, rows, key="domain_name", seen_column="last_seen")
+    session.commit()
+
+    assert result == (600, 0)
+    assert inserts == [996, 996, 408]
+    assert max(inserts) <= SQLITE_MAX_VARIABLES
+    assert session.query(models.Domain).filter(models.Domain.created_at.is_(None)).count() == 0
+
+    result = bulk_upsert(session, models.Domain, rows[:10] + [{"domain_name": "new.ir", "tld": ".ir"}],
+                         key="domain_name", seen_column="last_seen")
+    assert result == (1, 10)
+
+
+def test_upsert_after_upgrading_baseline_schema(load_app, tmp_path):
+    # The domains table as the first release of the Flask app created it
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE domains (id INTEGER PRIMARY KEY, url VARCHAR(255) NOT NULL, "
+                          "tld VARCHAR(10) NOT NULL, timestamp DATETIME NOT NULL)"))
+        conn.execute(text("INSERT INTO domains (url, tld, timestamp) VALUES ('https://a.ir', '.ir', '2024-01-01')"))
+
+    models = load_app(FLASK_DIR, "app.models")
+    models.db.metadata.create_all(engine)
+    add_missing_columns(models.db.metadata, engine)
+    # Running it again finds nothing left to add
+    add_missing_columns(models.db.metadata, engine)
+
+    inspector = inspect(engine)
+    assert "last_seen" in {column["name"] for column in inspector.get_columns("domains")}
+    assert any(index["unique"] and index["column_names"] == ["url"] for index in inspector.get_indexes("domains"))
+
+    session = sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    rows = [{"url": url, "tld": ".ir", "timestamp": now} for url in ("https://a.ir", "https://b.ir")]
+    result = bulk_upsert(session, models.Domain.__table__, rows, "url", seen_column="last_seen")
+    session.commit()
+    assert result == (1, 1)
+    assert session.execute(text("SELECT COUNT(*) FROM domains")).scalar() == 2
@@ -0,0 +1,132 @@
+import asyncio
+import struct
+
+import pytest
+
+from conftest import StubNameserver
+from scraper_common.dns import (NOERROR, NXDOMAIN, SERVFAIL, TYPE_A, AsyncResolver, DnsError, build_query,
+                                parse_nameserver, parse_response)
+
+
+def response(query_id, flags, answers=b"", ancount=0, name="example.ir"):
+    question = build_query(query_id, name)[12:]
+    return struct.pack("!HHHHHH", query_id, flags, 1, ancount, 0, 0) + question + answers
+
+
+def a_record(address, ttl, owner=b"\xc0\x0c"):
+    return owner + struct.pack("!HHIH", TYPE_A, 1, ttl, 4) + bytes(address)
+
+
+def cname_record(target, ttl):
+    rdata = b"".join(bytes([len(label)]) + label.encode() for label in target.split(".")) + b"\0"
+    return b"\xc0\x0c" + struct.pack("!HHIH", 5, 1, ttl, len(rdata)) + rdata
+
+
+def test_parse_response_follows_cname_to_addresses():
+    answers = cname_record("cdn.example.ir", 30) + a_record((10, 0, 0, 1), 600) + a_record((10, 0, 0, 2), 300)
+    query_id, truncated, answer = parse_response(response(7, 0x8180, answers, 3))
+    assert (query_id, truncated) == (7, False)
+    assert answer.rcode == NOERROR
+    assert answer.addresses == ["10.0.0.1", "10.0.0.2"]
+    # The shortest TTL along the chain
+    assert answer.ttl == 30
+
+
+def test_parse_response_nxdomain_and_truncated():
+    _, truncated, answer = parse_response(response(1, 0x8183), negative_ttl=120)
+    assert not truncated
+    assert (answer.rcode, answer.addresses, answer.ttl) == (NXDOMAIN, [], 120)
+    _, truncated, answer = parse_response(response(2, 0x8380))
+    assert truncated
+    assert answer.addresses == []
+
+
+@pytest.mark.parametrize("data", [b"\x00\x01\x81", response(3, 0x8180, a_record((10, 0, 0, 1), 60), 2),
+                                  response(4, 0x8180, a_record((10, 0, 0, 1), 60)[:-2], 1)])
+def test_parse_response_rejects_malformed(data):
+    with pytest.raises(ValueError):
+        parse_response(data)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("1.1.1.1", ("1.1.1.1", 53)), ("127.0.0.1:5353", ("127.0.0.1", 5353)),
+    ("::1", ("::1", 53)), ("[::1]:5353", ("::1", 5353)), ("[::1]", ("::1", 53)),
+])
+def test_parse_nameserver(spec, expected):
+    assert parse_nameserver(spec) == expected
+
+
+def resolve(resolver, *names):
+    async def run():
+        try:
+            return await asyncio.gather(*(resolver.resolve(name) for name in names), return_exceptions=True)
+        finally:
+            resolver.close()
+    return asyncio.run(run())
+
+
+def test_resolve_answers_and_caches(nameserver):
+    nameserver.behaviour.update({"gone.ir": "nxdomain", "mail.ir": "noaddr"})
+    resolver = AsyncResolver([nameserver.spec])
+    alive, gone, mail = resolve(resolver, "Alive.IR.", "gone.ir", "mail.ir")
+    assert (alive.rcode, alive.addresses, alive.ttl) == (NOERROR, ["127.0.0.1"], 60)
+    assert (gone.rcode, gone.addresses) == (NXDOMAIN, [])
+    assert (mail.rcode, mail.addresses) == (NOERROR, [])
+
+    # Answered from the cache, without asking again
+    queries = len(nameserver.queries)
+    assert resolve(resolver, "alive.ir", "gone.ir")[0].addresses == ["127.0.0.1"]
+    assert len(nameserver.queries) == queries
+
+
+def test_truncated_answer_is_asked_again_over_tcp(nameserver):
+    nameserver.behaviour["big.ir"] = "truncated"
+    answer, = resolve(AsyncResolver([nameserver.spec]), "big.ir")
+    assert answer.addresses == ["127.0.0.1"]
+    assert nameserver.queries == [("big.ir", "udp"), ("big.ir", "tcp")]
+
+
+def test_timeout_and_bad_replies_fail_over_to_the_next_nameserver(nameserver):
+    for behaviour in ("silent", "garbage", "servfail"):
+        broken = StubNameserver(default=behaviour)
+        try:
+            resolver = AsyncResolver([broken.spec, nameserver.spec], timeout=0.2, retries=1)
+            answer, = resolve(resolver, f"{behaviour}.ir")
+        finally:
+            broken.close()
+        assert answer.addresses == ["127.0.0.1"], behaviour
+        assert broken.queries == [(f"{behaviour}.ir", "udp")]
+
+
+def test_no_answer_raises_dns_error():
+    silent = StubNameserver(default="silent")
+    servfail = StubNameserver(default="servfail")
+    try:
+        error, = resolve(AsyncResolver([silent.spec], timeout=0.1, retries=1), "slow.ir")
+        answer, = resolve(AsyncResolver([servfail.spec], retries=1), "broken.ir")
+    finally:
+        silent.close()
+        servfail.close()
+    assert isinstance(error, DnsError)
+    assert "timed out" in str(error)
+    assert len(silent.queries) == 2
+    # SERVFAIL is an answer; it is returned once every retry got it
+    assert answer.rcode == SERVFAIL
+    assert len(servfail.queries) == 2
+
+
+def test_invalid_names_raise_value_error(nameserver):
+    errors = resolve(AsyncResolver([nameserver.spec]), "a" * 64 + ".ir", "two..dots.ir")
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert nameserver.queries == []
+
+
+def test_queries_in_flight_are_capped_per_nameserver():
+    stub = StubNameserver(delay=0.05)
+    try:
+        answers = resolve(AsyncResolver([stub.spec], per_nameserver=4), *(f"site{i}.ir" for i in range(20)))
+    finally:
+        stub.close()
+    assert all(answer.addresses == ["127.0.0.1"] for answer in answers)
+    assert len(stub.queries) == 20
+    assert stub.max_in_flight == 4
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from conftest import REPO_ROOT
+from scraper_common.extraction import LinkFilter, unwrap_redirect
+from scraper_common.fetch import HttpFetchBackend, parse_serp
+
+SERP_DIR = os.path.join(REPO_ROOT, "benchmarks", "fixtures", "serp")
+GOOGLE = "https://www.google.com/search?q=site%3A.ir&start=10"
+
+
+def read_fixture(name):
+    with open(os.path.join(SERP_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("href, expected", [
+    ("https://www.google.com/url?q=https://www.varzesh3.ir/&sa=U&ved=x", "https://www.varzesh3.ir/"),
+    ("https://www.google.com/url?url=https://blog.ir/&rct=j", "https://blog.ir/"),
+    ("https://www.google.com/interstitial?url=https%3A%2F%2Fwww.ut.ac.ir%2Ffa", "https://www.ut.ac.ir/fa"),
+    # Not a redirect to a web page, or not on the results page's host
+    ("https://www.google.com/url?q=javascript:alert(1)", "https://www.google.com/url?q=javascript:alert(1)"),
+    ("https://www.isna.ir/url?q=https://other.ir/", "https://www.isna.ir/url?q=https://other.ir/"),
+    ("https://www.isna.ir/news", "https://www.isna.ir/news"),
+])
+def test_unwrap_redirect(href, expected):
+    assert unwrap_redirect(href, "www.google.com") == expected
+
+
+def test_parse_serp_unwraps_result_links():
+    page = parse_serp(read_fixture("page2.html"), GOOGLE, link_filter=LinkFilter(".ir"))
+    hrefs = [link.href for link in page.links]
+    assert hrefs[:3] == ["https://www.varzesh3.ir/", "https://www.aparat.ir/v/abc", "https://www.divar.ir/s/tehran"]
+    assert "https://www.ut.ac.ir/fa" in hrefs
+    assert not any("google.com" in href for href in hrefs)
+    assert len(hrefs) == 11
+    assert page.has_results and not page.needs_js and not page.captcha
+    assert page.next_url == "https://www.google.com/search?q=site%3A.ir+-site%3A.gov.ir&start=20"
+
+
+def test_http_backend_over_fixture_server(bench_import):
+    fixture_server = bench_import("fixture_server")
+    server, search_url = fixture_server.start_fixture_server()
+    backend = HttpFetchBackend()
+    try:
+        link_filter = LinkFilter(".ir")
+        pages = [backend.fetch(f"{search_url}?q=site%3A.ir&start={start}", link_filter) for start in (0, 10, 20)]
+    finally:
+        backend.close()
+        server.shutdown()
+    assert [len(page.links) for page in pages] == [11, 11, 11]
+    assert pages[1].links[0].href == "https://www.varzesh3.ir/"
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+
+class FakeResponse:
+    def __init__(self, url, status_code, headers, content=b""):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+
+class FakeClient:
+    """Answers every request with the next queued response and records the request headers"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def http_cache(processor_import):
+    return processor_import("http_cache")
+
+
+URL = "https://www.isna.ir/news/1"
+BODY = "<html><body>".encode() + "خبر ".encode() * 2000 + b"</body></html>"
+
+
+def test_refresh_keeps_body_and_takes_new_validators(http_cache, tmp_path, monkeypatch):
+    cache = http_cache.HttpCache(str(tmp_path))
+    cached = cache.store(URL, FakeResponse(URL, 200, {"ETag": '"v1"', "Content-Type": "text/html; charset=utf-8",
+                                                      "Content-Length": str(len(BODY))}, BODY))
+    with open(cache._path(URL), "rb") as f:
+        f.readline()
+        compressed = f.read()
+
+    # Refreshing must not compress the body again
+    monkeypatch.setattr(http_cache.zlib, "compress", lambda *args: pytest.fail("body was recompressed"))
+    stored_at = cached.stored_at
+    time.sleep(0.01)
+    cache.refresh(URL, cached, CaseInsensitiveDict({"etag": '"v2"', "Cache-Control": "max-age=60",
+                                                    "Content-Length": "0"}))
+
+    with open(cache._path(URL), "rb") as f:
+        f.readline()
+        assert f.read() == compressed
+    loaded = cache.load(URL)
+    assert loaded.content == BODY
+    assert loaded.stored_at > stored_at
+    assert loaded.headers["ETag"] == '"v2"'
+    assert loaded.headers["Cache-Control"] == "max-age=60"
+    assert loaded.headers["Content-Type"] == "text/html; charset=utf-8"
+    assert "Content-Length" not in loaded.headers
+    assert cache._size == sum(path.stat().st_size for path in tmp_path.rglob("*.entry"))
+
+
+def test_revalidation_sends_validators_from_last_304(http_cache, tmp_path):
+    cache = http_cache.HttpCache(str(tmp_path))
+    client = FakeClient(
+        FakeResponse(URL, 200, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, BODY),
+        FakeResponse(URL, 304, {"ETag": '"v2"', "Last-Modified": "Tue, 02 Jan 2024 00:00:00 GMT"}),
+        FakeResponse(URL, 304, {}),
+    )
+    caching = http_cache.CachingClient(client, cache, ttl=0)
+
+    assert caching.get(URL).content == BODY
+    assert caching.get(URL).content == BODY
+    assert caching.get(URL).content == BODY
+    assert client.requests[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert client.requests[2] == {"If-None-Match": '"v2"', "If-Modified-Since": "Tue, 02 Jan 2024 00:00:00 GMT"}
+    assert caching.stats == {"hits": 0, "revalidated": 2, "misses": 1}
+
+
+def test_refresh_of_evicted_entry_is_a_no_op(http_cache, tmp_path):
+    cache = http_cache.HttpCache(str(tmp_path))
+    cached = cache.store(URL, FakeResponse(URL, 200, {"ETag": '"v1"'}, BODY))
+    cache._remove(cache._path(URL))
+    cache.refresh(URL, cached, {"ETag": '"v2"'})
+    assert cache.load(URL) is None
+    assert cache._size == 0
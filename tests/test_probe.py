@@ -0,0 +1,143 @@
+import asyncio
+
+from conftest import StubNameserver
+from scraper_common.dns import NOERROR, AsyncResolver, DnsAnswer
+from scraper_common.probe import (ALIVE, DNS_ERROR, INVALID, NO_ADDRESS, NXDOMAIN_STATUS, UNREACHABLE,
+                                  Prober)
+
+
+class FakeSite:
+    """A local HTTP server that answers by the Host header of each request.
+
+    moved.* redirects to http://parking.ir/landing, nohead.* refuses HEAD,
+    slow.* never answers, garbage.* does not speak HTTP and parking.* holds
+    each request for `delay` seconds; max_parking counts parking.ir's
+    connections at the same time. Everything else gets a 200.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.parking = self.max_parking = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        method, path, _ = (await reader.readline()).decode().split(" ", 2)
+        host = ""
+        while True:
+            line = (await reader.readline()).decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.lower() == "host":
+                host = value.strip().split(":")[0]
+        self.requests.append((method, host, path))
+        if host.startswith("slow"):
+            await asyncio.sleep(10)
+        elif host.startswith("garbage"):
+            writer.write(b"SSH-2.0-OpenSSH\r\n")
+        elif host.startswith("moved"):
+            writer.write(b"HTTP/1.1 301 Moved Permanently\r\nLocation: http://parking.ir/landing\r\n\r\n")
+        elif host.startswith("nohead") and method == "HEAD":
+            writer.write(b"HTTP/1.1 405 Method Not Allowed\r\n\r\n")
+        else:
+            if host.startswith("parking"):
+                self.parking += 1
+                self.max_parking = max(self.max_parking, self.parking)
+                await asyncio.sleep(self.delay)
+                self.parking -= 1
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    def close(self):
+        self.server.close()
+
+
+def probe_all(domains, site=None, nameserver=None, resolver=None, **options):
+    async def run():
+        await site.start()
+        prober = Prober(resolver or AsyncResolver([nameserver.spec], timeout=0.2, retries=0),
+                        http_port=site.port, **options)
+        try:
+            return {result.domain: result async for result in prober.probe_many(domains)}
+        finally:
+            prober.close()
+            site.close()
+    return asyncio.run(run())
+
+
+def test_probe_statuses(nameserver):
+    nameserver.behaviour.update({"gone.ir": "nxdomain", "mail.ir": "noaddr", "broken.ir": "servfail"})
+    site = FakeSite()
+    results = probe_all(["alive.ir", "gone.ir", "mail.ir", "broken.ir", "moved.ir", "nohead.ir", "slow.ir",
+                         "garbage.ir", "bad..name.ir"], site, nameserver, timeout=0.3)
+
+    assert {domain: result.status for domain, result in results.items()} == {
+        "alive.ir": ALIVE, "gone.ir": NXDOMAIN_STATUS, "mail.ir": NO_ADDRESS, "broken.ir": DNS_ERROR,
+        "moved.ir": ALIVE, "nohead.ir": ALIVE, "slow.ir": UNREACHABLE, "garbage.ir": UNREACHABLE,
+        "bad..name.ir": INVALID}
+    alive = results["alive.ir"]
+    assert (alive.ip, alive.http_status, alive.final_url, alive.error) == ("127.0.0.1", 200, "http://alive.ir/", None)
+    assert alive.latency >= 0 and alive.checked_at
+    assert results["broken.ir"].error == "DNS rcode 2"
+    assert (results["moved.ir"].http_status, results["moved.ir"].final_url) == (200, "http://parking.ir/landing")
+    assert results["nohead.ir"].http_status == 200
+    assert ("GET", "nohead.ir", "/") in site.requests
+    assert results["slow.ir"].error == "TimeoutError"
+    assert "Not an HTTP response" in results["garbage.ir"].error
+
+
+def test_unanswered_dns_is_a_dns_error():
+    silent = StubNameserver(default="silent")
+    try:
+        results = probe_all(["quiet.ir"], FakeSite(), silent)
+    finally:
+        silent.close()
+    assert results["quiet.ir"].status == DNS_ERROR
+    assert "timed out" in results["quiet.ir"].error
+
+
+class CountingResolver:
+    """Resolves every name to 127.0.0.1 after a short wait, counting lookups in flight"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lookups = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def resolve(self, name):
+        self.lookups.append(name)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return DnsAnswer(NOERROR, ["127.0.0.1"], 60)
+
+    def close(self):
+        pass
+
+
+def test_domains_in_flight_are_capped():
+    resolver = CountingResolver()
+    domains = [f"site{i}.ir" for i in range(30)] + ["site0.ir", "SITE1.ir."]
+    results = probe_all(iter(domains), FakeSite(), resolver=resolver, concurrency=5)
+    assert len(results) == 30
+    assert all(result.status == ALIVE for result in results.values())
+    assert resolver.max_in_flight == 5
+    # Repeated domains come from the result cache
+    assert len(resolver.lookups) == 30
+
+
+def test_connections_per_host_are_capped():
+    site = FakeSite(delay=0.05)
+    results = probe_all([f"moved{i}.ir" for i in range(12)], site, resolver=CountingResolver(0),
+                        concurrency=12, per_host=3)
+    assert all(result.final_url == "http://parking.ir/landing" for result in results.values())
+    assert sum(1 for _, host, _ in site.requests if host == "parking.ir") == 12
+    assert site.max_parking == 3
@@ -0,0 +1,216 @@
+# article_store.py
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+Article = namedtuple('Article', ['url', 'domain', 'title', 'content', 'fetched_at', 'sha256'])
+
+# Segment files are rotated once they pass this size
+SEGMENT_BYTES = 64 * 1024 * 1024
+# Index rows are committed (and segment data flushed) every this many articles
+BATCH_SIZE = 200
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.jsonl\.gz$')
+
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    title TEXT,
+    fetched_at REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_articles_domain ON articles (domain);
+'''
+
+
+class ArticleStore:
+    """Append-only article store: records in size-rotated gzip segments plus a SQLite index.
+
+    Every article is one JSON record compressed as its own gzip member, so a
+    segment is still a valid .jsonl.gz for zcat while the index can point
+    at (segment, offset, length) of any single record. Saving a URL again
+    appends a new record and moves the index to it; unchanged content (same
+    hash) is not written twice.
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, batch_size=BATCH_SIZE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self.db.executescript(INDEX_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {'written': 0, 'unchanged': 0}
+        self._segment, self._file = None, None
+        self._open_segment(self._last_segment() or 1)
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"segment-{number:06d}.jsonl.gz")
+
+    def _last_segment(self):
+        numbers = [int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(self.directory)) if match]
+        return max(numbers, default=None)
+
+    def _open_segment(self, number):
+        path = self._segment_path(number)
+        if os.path.exists(path):
+            # Drop whatever an interrupted run wrote after the last indexed record
+            end = self.db.execute('SELECT MAX(offset + length) FROM articles WHERE segment = ?', (number,)).fetchone()[0]
+            if os.path.getsize(path) != (end or 0):
+                logging.warning(f"Truncating {path} to its last indexed record")
+                with open(path, 'r+b') as f:
+                    f.truncate(end or 0)
+        if self._file:
+            self._file.close()
+        self._segment = number
+        self._file = open(path, 'ab')
+
+    def add(self, url, domain, title, content, fetched_at=None):
+        """Append an article; returns False only if it could not be written"""
+        sha256 = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        with self._lock:
+            row = self.db.execute('SELECT sha256 FROM articles WHERE url = ?', (url,)).fetchone()
+            if row and row[0] == sha256:
+                self.stats['unchanged'] += 1
+                return True
+            record = {'url': url, 'domain': domain, 'title': title, 'content': content,
+                      'fetched_at': fetched_at or time.time(), 'sha256': sha256}
+            data = gzip.compress(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            if self._file.tell() and self._file.tell() + len(data) > self.segment_bytes:
+                self._commit()
+                self._open_segment(self._segment + 1)
+            offset = self._file.tell()
+            self._file.write(data)
+            self.db.execute('INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (url, domain, title, record['fetched_at'], sha256, self._segment, offset, len(data)))
+            self.stats['written'] += 1
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._commit()
+        return True
+
+    def _commit(self):
+        # Data first, so a committed index row never points past the end of a segment
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.db.commit()
+        self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._file.close()
+            self.db.close()
+
+    def _read(self, segment, offset, length):
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            record = json.loads(gzip.decompress(f.read(length)))
+        return Article(**record)
+
+    def get(self, url):
+        """The latest article stored for a URL, or None"""
+        with self._lock:
+            self._file.flush()
+            row = self.db.execute('SELECT segment, offset, length FROM articles WHERE url = ?', (url,)).fetchone()
+        return self._read(*row) if row else None
+
+    def by_domain(self, domain=None):
+        """Yield the latest article of every URL (of one domain), in segment order"""
+        with self._lock:
+            self._file.flush()
+            query = 'SELECT segment, offset, length FROM articles'
+            params = ()
+            if domain:
+                query += ' WHERE domain = ?'
+                params = (domain,)
+            rows = self.db.execute(query + ' ORDER BY segment, offset', params).fetchall()
+        for row in rows:
+            yield self._read(*row)
+
+    def domains(self):
+        """Article count per domain"""
+        with self._lock:
+            return dict(self.db.execute('SELECT domain, COUNT(*) FROM articles GROUP BY domain ORDER BY domain'))
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+
+def sanitize_filename(filename):
+    # Remove or replace characters that are invalid in file names
+    invalid_chars = ['/', '\\', ':', '*', '?', '"', '<', '>', '|']
+    for char in invalid_chars:
+        filename = filename.replace(char, '_')
+    return filename
+
+
+def export(store, out_dir, domain=None):
+    """Write articles as output/<domain>/<title>.txt files; returns the number written"""
+    written = 0
+    used = set()
+    for article in store.by_domain(domain):
+        directory = os.path.join(out_dir, sanitize_filename(article.domain))
+        os.makedirs(directory, exist_ok=True)
+        name = sanitize_filename(article.title[:50]) or 'untitled'
+        # Articles whose titles collide get the content hash in the name instead of overwriting each other
+        if (directory, name) in used:
+            name = f"{name}-{article.sha256[:8]}"
+        used.add((directory, name))
+        with open(os.path.join(directory, f"{name}.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"{article.title}\n\n{article.content}")
+        written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or export the article store")
+    parser.add_argument('--store', default=os.path.join('output', 'articles'), help='article store directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write one .txt file per article')
+    export_parser.add_argument('--out', default='output', help='directory for <domain>/<title>.txt files')
+    export_parser.add_argument('--domain', help='only this domain')
+    commands.add_parser('stats', help='articles per domain')
+    show_parser = commands.add_parser('show', help='print the stored article for a URL')
+    show_parser.add_argument('url')
+    args = parser.parse_args()
+
+    store = ArticleStore(args.store)
+    try:
+        if args.command == 'export':
+            print(f"Exported {export(store, args.out, args.domain)} articles to {args.out}")
+        elif args.command == 'stats':
+            counts = store.domains()
+            for domain, count in counts.items():
+                print(f"{domain}\t{count}")
+            print(f"{sum(counts.values())} articles from {len(counts)} domains")
+        else:
+            article = store.get(args.url)
+            if article is None:
+                raise SystemExit(f"{args.url} is not in the store")
+            print(f"{article.title}\n\n{article.content}")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+# http_cache.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class CacheMiss(requests.RequestException):
+    """Raised in offline mode for URLs that are not in the cache"""
+
+
+class CachedResponse:
+    """The parts of requests.Response the processors use, rebuilt from a cache entry"""
+
+    def __init__(self, url, status_code, headers, content, stored_at, from_cache=True):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.stored_at = stored_at
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self):
+        return get_encoding_from_headers(self.headers)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpCache:
+    """On-disk response cache keyed by the SHA-256 of the URL.
+
+    Each entry is one file: a JSON line with the final URL, status, headers
+    and storage time, followed by the zlib-compressed body. File mtimes
+    double as the LRU clock; once the cache grows past max_bytes the least
+    recently used entries are removed.
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.entry'):
+                    yield os.path.join(root, name)
+
+    def _path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.entry")
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            meta = json.loads(f.readline())
+            content = zlib.decompress(f.read())
+        return CachedResponse(meta['url'], meta['status'], meta['headers'], content, meta['stored_at'])
+
+    def load(self, url):
+        """Return the cached response for a URL, or None"""
+        path = self._path(url)
+        try:
+            cached = self._read(path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, zlib.error) as e:
+            logging.warning(f"Dropping unreadable cache entry for {url}: {e}")
+            self._remove(path)
+            return None
+        os.utime(path)  # Mark as recently used
+        return cached
+
+    def responses(self):
+        """Yield every readable cached response, e.g. to replay saved pages through the processors"""
+        for path in self._entries():
+            try:
+                yield self._read(path)
+            except (OSError, ValueError, zlib.error):
+                continue
+
+    @staticmethod
+    def _storable(headers):
+        """Headers worth keeping; the body is stored decoded, so its encoding and length no longer apply"""
+        return {name: value for name, value in headers.items()
+                if name.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')}
+
+    def store(self, url, response):
+        """Save a response; returns the cached copy"""
+        headers = self._storable(response.headers)
+        meta = {'url': response.url, 'status': response.status_code, 'headers': headers, 'stored_at': time.time()}
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n')
+            f.write(zlib.compress(response.content, 6))
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+        return CachedResponse(response.url, response.status_code, headers, response.content, meta['stored_at'])
+
+    def refresh(self, url, cached, headers=None):
+        """Restart the TTL of an entry the server confirmed is unchanged (304).
+
+        The headers of the 304 (e.g. a new ETag, Last-Modified or
+        Cache-Control) replace the stored ones. Only the metadata line is
+        rewritten; the compressed body is copied over as it is.
+        """
+        cached.headers.update(self._storable(headers or {}))
+        cached.stored_at = time.time()
+        meta = {'url': cached.url, 'status': cached.status_code, 'headers': dict(cached.headers),
+                'stored_at': cached.stored_at}
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(path, 'rb') as src:
+                src.readline()
+                with open(tmp_path, 'wb') as dst:
+                    dst.write(json.dumps(meta).encode('utf-8') + b'\n')
+                    shutil.copyfileobj(src, dst)
+        except FileNotFoundError:
+            # Evicted since it was loaded; the next request fetches it again
+            return
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path) - old_size
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is 10% under its limit; caller holds the lock"""
+        entries = sorted(((os.stat(path), path) for path in self._entries()), key=lambda item: item[0].st_mtime)
+        target = self.max_bytes * 0.9
+        for stat, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= stat.st_size
+
+
+class CachingClient:
+    """HttpClient front end that answers from the cache and revalidates stale entries.
+
+    Entries younger than ttl are served without a request. Older ones are
+    revalidated with If-None-Match / If-Modified-Since, and a 304 answer
+    reuses the cached body. In offline mode only the cache is used.
+    """
+
+    def __init__(self, client, cache, ttl=3600.0, offline=False):
+        self.client = client
+        self.cache = cache
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def get(self, url):
+        cached = self.cache.load(url)
+        if self.offline:
+            if cached is None:
+                raise CacheMiss(f"{url} is not cached (offline mode)")
+            self._count('hits')
+            return cached
+        if cached is not None and time.time() - cached.stored_at < self.ttl:
+            self._count('hits')
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if 'ETag' in cached.headers:
+                headers['If-None-Match'] = cached.headers['ETag']
+            if 'Last-Modified' in cached.headers:
+                headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        response = self.client.get(url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self._count('revalidated')
+            self.cache.refresh(url, cached, response.headers)
+            return cached
+
+        self._count('misses')
+        if 'no-store' in response.headers.get('Cache-Control', ''):
+            return response
+        return self.cache.store(url, response)
+
+    def close(self):
+        self.client.close()
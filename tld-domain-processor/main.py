@@ -1,8 +1,19 @@
 # main.py
+import argparse
 import os
 import logging
+import time
+from functools import partial
 from urllib.parse import urlparse
-from site_processors import get_processor
+
+import requests
+
+import parsing
+from article_store import SEGMENT_BYTES, ArticleStore
+from http_cache import CachingClient, HttpCache
+from pipeline import MAX_BODY, HttpClient, Pipeline
+from site_processors import get_processor, generic_processor
+from scraper_common.metrics import PROCESSOR_PAGES, PROCESSOR_STAGE, REGISTRY
 
 # Configure logging to output errors to a file
 logging.basicConfig(
@@ -12,54 +23,66 @@ logging.basicConfig(
 )
 
 def read_domains(file_path):
+    """Yield the URLs in the domains file one at a time, so huge lists are never held in memory"""
     try:
         with open(file_path, 'r') as f:
-            domains = [line.strip() for line in f if line.strip()]
-        return domains
+            for line in f:
+                line = line.strip()
+                if line:
+                    # Scraper output lists bare domains; let the site redirect to https itself
+                    yield line if '://' in line else f"http://{line}"
     except FileNotFoundError as e:
         logging.error(f"Domains file not found: {e}")
         print(f"Error: Domains file not found at '{file_path}'.")
-        return []
-
-def sanitize_filename(filename):
-    # Remove or replace characters that are invalid in file names
-    invalid_chars = ['/', '\\', ':', '*', '?', '"', '<', '>', '|']
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
-    return filename
 
-def save_article(domain, title, content):
+def save_article(store, url, domain, title, content):
     try:
-        directory = os.path.join('output', domain)
-        os.makedirs(directory, exist_ok=True)
-        sanitized_title = sanitize_filename(title[:50]) or 'untitled'
-        file_name = f"{sanitized_title}.txt"
-        file_path = os.path.join(directory, file_name)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(f"{title}\n\n{content}")
+        with PROCESSOR_STAGE.time(stage='save'):
+            saved = store.add(url, domain, title, content)
+        PROCESSOR_PAGES.inc(result='saved')
+        return saved
     except Exception as e:
+        PROCESSOR_PAGES.inc(result='save_failed')
         logging.error(f"Failed to save article for domain '{domain}': {e}")
         print(f"Failed to save article '{title}' for domain '{domain}': {e}")
+        return False
 
-def process_domain(url):
+def fetch_page(client, url):
+    with PROCESSOR_STAGE.time(stage='fetch'):
+        return client.get(url)
+
+def parse_page(url, response):
+    with PROCESSOR_STAGE.time(stage='parse'):
+        article = extract_article(url, response)
+    PROCESSOR_PAGES.inc(result='extracted' if article else 'empty')
+    return article
+
+def extract_article(url, response):
     parsed_url = urlparse(url)
     domain = parsed_url.netloc or parsed_url.path  # Handle URLs without scheme
     processor = get_processor(domain)
-    try:
-        if processor:
-            print(f"Processing {url} with {processor.__name__}")
-            title, content = processor(url)
-        else:
-            print(f"No processor found for {domain}, using generic processor.")
-            from site_processors.generic_processor import process
-            title, content = process(url)
+    if processor:
+        print(f"Processing {url} with {processor.__module__}")
+        title, content = processor(response.content, response.url)
+    else:
+        print(f"No processor found for {domain}, using generic processor.")
+        title, content = generic_processor.parse(response.content, response.url)
+
+    if title and content:
+        return url, domain, title, content
+    error_msg = f"No content extracted from {url}."
+    logging.error(error_msg)
+    print(error_msg)
+    return None
 
-        if title and content:
-            save_article(domain, title, content)
-        else:
-            error_msg = f"No content extracted from {url}."
-            logging.error(error_msg)
-            print(error_msg)
+def process_domain(url, store, client=None):
+    """Process a single URL without the pipeline"""
+    own_client = client is None
+    client = client or HttpClient()
+    try:
+        article = parse_page(url, fetch_page(client, url))
+        if article:
+            save_article(store, *article)
     except requests.exceptions.RequestException as e:
         error_msg = f"Network error when processing {url}: {e}"
         logging.error(error_msg)
@@ -68,11 +91,72 @@ def process_domain(url):
         error_msg = f"Failed to process {url}: {e}"
         logging.error(error_msg)
         print(error_msg)
+    finally:
+        if own_client:
+            client.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch and extract articles for the scraped domains")
+    parser.add_argument('--domains', default='domains.txt', help='file with one domain or URL per line')
+    parser.add_argument('--workers', type=int, default=16, help='concurrent downloads')
+    parser.add_argument('--parse-workers', type=int, default=4, help='threads running the site processors')
+    parser.add_argument('--per-host', type=int, default=2, help='concurrent requests to any one host')
+    parser.add_argument('--rate', type=float, default=10.0, help='requests per second across all workers (0 = no cap)')
+    parser.add_argument('--host-rate', type=float, default=2.0,
+                        help='requests per second to any one host to start with; lowered on 429/5xx and slow answers')
+    parser.add_argument('--timeout', type=float, default=15.0, help='seconds before a request times out')
+    parser.add_argument('--retries', type=int, default=3, help='retries for connection errors, 429 and 5xx')
+    parser.add_argument('--queue-size', type=int, default=100, help='items buffered between stages')
+    parser.add_argument('--max-body', type=float, default=MAX_BODY / (1024 * 1024),
+                        help='MB of each page to download (0 = no limit)')
+    parser.add_argument('--parser', choices=parsing.MODES, default=parsing.mode,
+                        help='full: html.parser tree, lxml: lxml tree, fast: lxml with only the needed elements')
+    parser.add_argument('--store', default=os.path.join('output', 'articles'),
+                        help='article store directory (see article_store.py export)')
+    parser.add_argument('--segment-size', type=int, default=SEGMENT_BYTES // (1024 * 1024),
+                        help='MB per compressed segment file')
+    parser.add_argument('--cache-dir', default='.http_cache', help='on-disk response cache')
+    parser.add_argument('--cache-ttl', type=float, default=3600.0,
+                        help='seconds a cached page is used without revalidating it')
+    parser.add_argument('--cache-size', type=int, default=1024, help='cache size limit in MB')
+    parser.add_argument('--no-cache', action='store_true', help='always download pages')
+    parser.add_argument('--offline', action='store_true', help='only replay pages from the cache')
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    domains = read_domains('domains.txt')
-    if not domains:
+    args = parse_args()
+    parsing.mode = args.parser
+    http_client = client = HttpClient(pool_size=args.workers, per_host=args.per_host, rate=args.rate,
+                                      host_rate=args.host_rate, timeout=args.timeout, retries=args.retries,
+                                      max_body=int(args.max_body * 1024 * 1024))
+    if not args.no_cache:
+        cache = HttpCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+        client = CachingClient(client, cache, ttl=args.cache_ttl, offline=args.offline)
+    elif args.offline:
+        raise SystemExit("--offline needs the cache")
+    store = ArticleStore(args.store, segment_bytes=args.segment_size * 1024 * 1024)
+    pipeline = Pipeline(client, fetch_page, parse_page, partial(save_article, store), fetch_workers=args.workers,
+                        parse_workers=args.parse_workers, queue_size=args.queue_size)
+    started = time.monotonic()
+    try:
+        stats = pipeline.run(read_domains(args.domains))
+    finally:
+        client.close()
+        store.close()
+    elapsed = time.monotonic() - started
+
+    if not stats['queued']:
         print("No domains to process.")
     else:
-        for url in domains:
-            process_domain(url)
+        print(f"Processed {stats['queued']} URLs in {elapsed:.1f}s: {stats['saved']} saved, "
+              f"{stats['failed']} failed ({stats['queued'] / elapsed:.1f} URLs/s)")
+        print(f"Store: {store.stats['written']} articles written, {store.stats['unchanged']} unchanged")
+        slowed = [host for host, rate in http_client.rate_limiter.snapshot().items() if rate['rate'] < args.host_rate]
+        if slowed:
+            print(f"Slowed down for {len(slowed)} hosts that throttled or answered slowly: {', '.join(slowed[:10])}")
+        if isinstance(client, CachingClient):
+            print(f"Cache: {client.stats['hits']} hits, {client.stats['revalidated']} revalidated, "
+                  f"{client.stats['misses']} downloaded")
+        print("Timings (seconds) and counts:")
+        for line in REGISTRY.summary('processor_'):
+            print(f"  {line}")
@@ -0,0 +1,26 @@
+# parsing.py
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    FAST_PARSER = 'lxml'
+except ImportError:
+    FAST_PARSER = 'html.parser'
+
+# full: html.parser builds the whole tree (the original behaviour)
+# lxml: lxml builds the whole tree
+# fast: lxml builds only the elements a processor asks for
+MODES = ('full', 'lxml', 'fast')
+mode = os.getenv('PROCESSOR_PARSE_MODE', 'fast')
+
+
+def make_soup(html, only=None):
+    """Parse a page; in fast mode only the tags matching `only` (tag names or a SoupStrainer) are kept"""
+    if mode == 'full':
+        return BeautifulSoup(html, 'html.parser')
+    if mode == 'lxml' or only is None:
+        return BeautifulSoup(html, FAST_PARSER)
+    strainer = only if isinstance(only, SoupStrainer) else SoupStrainer(only)
+    return BeautifulSoup(html, FAST_PARSER, parse_only=strainer)
@@ -0,0 +1,223 @@
+# pipeline.py
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Make the repository-level scraper_common package importable when run from this directory
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+from scraper_common.ratelimit import AdaptiveRateLimiter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+# Responses worth another attempt: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Largest page body kept in memory; anything beyond it is not downloaded
+MAX_BODY = 5 * 1024 * 1024
+
+_STOP = object()
+
+
+class HttpClient:
+    """One pooled requests.Session shared by all fetch threads.
+
+    Adds timeouts, retries with exponential backoff, a cap on concurrent
+    requests per host, a global request rate and a per-host rate that
+    backs off on 429/5xx answers and slow responses. Bodies are streamed
+    and cut off after max_body bytes, so one huge page can't exhaust memory.
+    """
+
+    def __init__(self, pool_size=32, per_host=2, rate=10.0, host_rate=2.0, timeout=15.0, retries=3, backoff=1.0,
+                 headers=None, max_body=MAX_BODY):
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.per_host = per_host
+        self.rate_limiter = AdaptiveRateLimiter(rate=host_rate, burst=per_host, min_rate=host_rate / 20,
+                                                max_rate=host_rate * 4, slow_latency=timeout / 2,
+                                                global_rate=rate or None)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_body = max_body
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlparse(url).hostname or ''
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _delay(self, attempt):
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    @staticmethod
+    def _retry_after(response):
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+        return None
+
+    def get(self, url, headers=None):
+        """GET with retries; raises requests.RequestException once the attempts are used up"""
+        slot = self._host_slot(url)
+        host = self.rate_limiter.key_for(url)
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire(host)
+            try:
+                with slot:
+                    started = time.monotonic()
+                    response = self.session.get(url, headers=headers, timeout=self.timeout,
+                                                stream=bool(self.max_body))
+                    if self.max_body and response.status_code not in RETRY_STATUSES:
+                        self._read_body(response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.rate_limiter.record(host, time.monotonic() - started, error=True)
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"Retrying {url} after error: {e}")
+                time.sleep(self._delay(attempt))
+                continue
+
+            latency = time.monotonic() - started
+            if response.status_code in RETRY_STATUSES:
+                response.close()
+                # The host's rate is cut and it is paused for Retry-After (or the backoff) before the next attempt
+                self.rate_limiter.record(host, latency, throttled=True,
+                                         retry_after=self._retry_after(response) or self._delay(attempt))
+                if attempt < self.retries:
+                    logging.warning(f"Retrying {url} after HTTP {response.status_code}")
+                    continue
+            else:
+                self.rate_limiter.record(host, latency)
+            response.raise_for_status()
+            return response
+
+    def _read_body(self, response):
+        """Load at most max_body bytes of the (decompressed) body into response.content"""
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > self.max_body:
+                logging.warning(f"Truncated {response.url} at {self.max_body} bytes")
+                break
+        response.close()
+        response._content = b''.join(chunks)[:self.max_body]
+
+    def close(self):
+        self.session.close()
+
+
+class Pipeline:
+    """Fetch, parse and save stages connected by bounded queues.
+
+    fetch_workers threads download pages (network bound), parse_workers
+    threads run the site processors (CPU bound) and one thread saves the
+    articles. The bounded queues make a fast stage wait for a slow one, so
+    memory stays flat however many URLs are fed in.
+    """
+
+    def __init__(self, client, fetch, parse, save, fetch_workers=16, parse_workers=4, queue_size=100):
+        self.client = client
+        self.fetch = fetch
+        self.parse = parse
+        self.save = save
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.urls = queue.Queue(maxsize=queue_size)
+        self.pages = queue.Queue(maxsize=queue_size)
+        self.articles = queue.Queue(maxsize=queue_size)
+        self.stats = {'queued': 0, 'fetched': 0, 'parsed': 0, 'saved': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _fetch_worker(self):
+        while True:
+            url = self.urls.get()
+            if url is _STOP:
+                return
+            try:
+                page = self.fetch(self.client, url)
+            except Exception as e:
+                self._count('failed')
+                logging.error(f"Network error when processing {url}: {e}")
+                print(f"Network error when processing {url}: {e}")
+                continue
+            self._count('fetched')
+            self.pages.put((url, page))
+
+    def _parse_worker(self):
+        while True:
+            item = self.pages.get()
+            if item is _STOP:
+                return
+            url, page = item
+            try:
+                article = self.parse(url, page)
+            except Exception as e:
+                self._count('failed')
+                logging.error(f"Failed to process {url}: {e}")
+                print(f"Failed to process {url}: {e}")
+                continue
+            if article is None:
+                self._count('failed')
+                continue
+            self._count('parsed')
+            self.articles.put(article)
+
+    def _save_worker(self):
+        while True:
+            article = self.articles.get()
+            if article is _STOP:
+                return
+            if self.save(*article):
+                self._count('saved')
+            else:
+                self._count('failed')
+
+    def run(self, urls):
+        """Process every URL from an iterable (read lazily) and return the stats"""
+        def start(target, count):
+            threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+            for thread in threads:
+                thread.start()
+            return threads
+
+        fetchers = start(self._fetch_worker, self.fetch_workers)
+        parsers = start(self._parse_worker, self.parse_workers)
+        savers = start(self._save_worker, 1)
+
+        for url in urls:
+            self.urls.put(url)
+            self._count('queued')
+
+        # Shut the stages down in order so nothing in flight is dropped
+        for stage_queue, threads in ((self.urls, fetchers), (self.pages, parsers), (self.articles, savers)):
+            for _ in threads:
+                stage_queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+        return self.stats
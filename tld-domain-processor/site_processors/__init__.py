@@ -1,11 +1,19 @@
 # site_processors/__init__.py
-from urllib.parse import urlparse
-from . import example_com_processor
+from .registry import ProcessorRegistry
 
+# Host patterns -> processor module (imported the first time a host matches).
+# Modules named <host>_processor, with the host's dots as underscores, are
+# registered for their host automatically; list anything else here:
+#   'example.com'  '*.example.com'  '.gov.ir'  're:^news\d+\.example\.ir$'
 SITE_PROCESSORS = {
-    'example.com': example_com_processor.process,
+    'example.com': 'example_com_processor',
     # Add more domain-specific processors here
 }
 
+registry = ProcessorRegistry(__name__)
+registry.discover()
+for pattern, module in SITE_PROCESSORS.items():
+    registry.register(pattern, module)
+
 def get_processor(domain):
-    return SITE_PROCESSORS.get(domain, None)
+    return registry.get(domain)
@@ -1,10 +1,14 @@
 # site_processors/example_com_processor.py
 import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 
-def process(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+from parsing import make_soup
+
+# The only elements this processor reads
+ARTICLE_PARTS = SoupStrainer(['h1', 'div'], class_=['article-title', 'article-content'])
+
+def parse(html, url):
+    soup = make_soup(html, ARTICLE_PARTS)
 
     # Custom extraction logic for example.com
     title = soup.find('h1', class_='article-title').get_text(strip=True)
@@ -12,3 +16,8 @@ def process(url):
     content = content_div.get_text(separator='\n').strip()
 
     return title, content
+
+def process(url, session=None, timeout=15):
+    response = (session or requests).get(url, timeout=timeout)
+    response.raise_for_status()
+    return parse(response.content, response.url)
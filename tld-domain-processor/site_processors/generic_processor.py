@@ -1,10 +1,11 @@
 # site_processors/generic_processor.py
 import requests
-from bs4 import BeautifulSoup
 
-def process(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+from parsing import make_soup
+
+def parse(html, url):
+    # Only the title and article are built; most pages need nothing else
+    soup = make_soup(html, ['title', 'article'])
 
     # Try to extract the title and content using common tags
     title = soup.title.string if soup.title else 'No Title'
@@ -15,6 +16,11 @@ def process(url):
         content = article.get_text(separator='\n').strip()
     else:
         # Fallback: Get all text
-        content = soup.get_text(separator='\n').strip()
+        content = make_soup(html).get_text(separator='\n').strip()
 
     return title, content
+
+def process(url, session=None, timeout=15):
+    response = (session or requests).get(url, timeout=timeout)
+    response.raise_for_status()
+    return parse(response.content, response.url)
@@ -0,0 +1,105 @@
+# site_processors/registry.py
+import importlib
+import logging
+import pkgutil
+import re
+import threading
+from functools import lru_cache
+
+MODULE_SUFFIX = '_processor'
+
+
+def normalize_host(host):
+    """Lower-case a host and drop the port, trailing dot and a leading 'www.'"""
+    host = host.lower().rsplit('@', 1)[-1]
+    if not host.startswith('['):
+        host = host.split(':', 1)[0]
+    host = host.rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+class ProcessorRegistry:
+    """Map hosts to site processors through host patterns.
+
+    Patterns:
+      'example.com'            the host itself (www. is ignored)
+      '*.example.com'          any subdomain, but not example.com itself
+      '.gov.ir'                the suffix: gov.ir and every host under it
+      're:^news\\d+\\.x\\.ir$'    a regular expression on the normalized host
+
+    Exact, wildcard and suffix rules live in dicts keyed by host suffix, so a
+    lookup is one dict probe per label of the host; the most specific rule
+    wins and regexes are only tried when none matches. Regexes are compiled
+    into one alternation. Processors are given as module names and imported
+    on first match.
+    """
+
+    def __init__(self, package):
+        self.package = package
+        self._exact = {}
+        self._wildcard = {}
+        self._suffix = {}
+        self._patterns = []
+        self._regex = None
+        self._modules = {}
+        self._lock = threading.Lock()
+        self._lookup = lru_cache(maxsize=4096)(self._find)
+
+    def register(self, pattern, processor):
+        """Route hosts matching a pattern to a processor (module name or parse function)"""
+        if pattern.startswith('re:'):
+            self._patterns.append((pattern[3:], processor))
+            self._regex = re.compile('|'.join(f"(?P<p{i}>{regex})" for i, (regex, _) in enumerate(self._patterns)))
+        elif pattern.startswith('*.'):
+            self._wildcard[pattern[2:].lower()] = processor
+        elif pattern.startswith('.'):
+            self._suffix[pattern[1:].lower()] = processor
+        else:
+            self._exact[normalize_host(pattern)] = processor
+        self._lookup.cache_clear()
+
+    def discover(self):
+        """Register <host with dots as underscores>_processor modules for their host, without importing them"""
+        package = importlib.import_module(self.package)
+        for module in pkgutil.iter_modules(package.__path__):
+            name = module.name
+            if name.endswith(MODULE_SUFFIX) and name != f"generic{MODULE_SUFFIX}":
+                host = name[:-len(MODULE_SUFFIX)].replace('_', '.')
+                self._exact.setdefault(host, name)
+        self._lookup.cache_clear()
+
+    def _find(self, host):
+        if host in self._exact:
+            return self._exact[host]
+        labels = host.split('.')
+        for i in range(len(labels)):
+            suffix = '.'.join(labels[i:])
+            if i and suffix in self._wildcard:
+                return self._wildcard[suffix]
+            if suffix in self._suffix:
+                return self._suffix[suffix]
+        if self._regex:
+            match = self._regex.match(host)
+            if match:
+                for i, (_, processor) in enumerate(self._patterns):
+                    if match.group(f"p{i}") is not None:
+                        return processor
+        return None
+
+    def _load(self, processor):
+        if callable(processor):
+            return processor
+        parse = self._modules.get(processor)
+        if parse is None:
+            with self._lock:
+                parse = self._modules.get(processor)
+                if parse is None:
+                    logging.info(f"Loading site processor {processor}")
+                    module = importlib.import_module(f"{self.package}.{processor}")
+                    parse = self._modules[processor] = module.parse
+        return parse
+
+    def get(self, host):
+        """The parse(html, url) function for a host, or None when only the generic processor applies"""
+        processor = self._lookup(normalize_host(host))
+        return self._load(processor) if processor is not None else None
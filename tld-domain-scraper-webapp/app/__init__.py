@@ -1,6 +1,14 @@
+import os
+import sys
 from flask import Flask
 from app.models import db
 
+# Make the repository-level scraper_common package importable when the app
+# is started from this directory (python run.py)
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
 def create_app():
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://user:password@db:5432/domains'
@@ -10,5 +18,8 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        # Bring tables created by older versions up to date (last_seen, unique url)
+        from scraper_common.schema import add_missing_columns
+        add_missing_columns(db.metadata, db.engine)
 
     return app
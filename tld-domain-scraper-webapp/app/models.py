@@ -5,6 +5,13 @@ db = SQLAlchemy()
 class Domain(db.Model):
     __tablename__ = 'domains'
     id = db.Column(db.Integer, primary_key=True)
-    url = db.Column(db.String(255), nullable=False)
+    url = db.Column(db.String(255), nullable=False, unique=True)
     tld = db.Column(db.String(10), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
+    last_seen = db.Column(db.DateTime, index=True)
+
+    # Keyset pagination on the results page walks (timestamp, id)
+    __table_args__ = (
+        db.Index('ix_domains_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_domains_tld_timestamp_id', 'tld', 'timestamp', 'id'),
+    )
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, send_file
-from app.models import Domain
+from datetime import datetime
+from flask import (Blueprint, Response, abort, render_template, request, redirect, url_for, jsonify,
+                   stream_with_context)
+from app.models import Domain, db
 from app.scraper import run_scraper
+from scraper_common.export import CONTENT_TYPES, export_filename, export_select, export_stream
+from scraper_common.pagination import DEFAULT_PAGE_SIZE, domain_filters, paginate
 
 bp = Blueprint('main', __name__)
 
@@ -18,10 +22,51 @@ def scrape():
 
 @bp.route('/results')
 def results():
-    domains = Domain.query.all()
-    return render_template('results.html', domains=domains)
+    # One keyset page at a time, filtered in the database instead of in the browser
+    filters = {
+        'tld': request.args.get('tld') or None,
+        'q': request.args.get('q') or None,
+        'start': request.args.get('start') or None,
+        'end': request.args.get('end') or None,
+    }
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    with_total = request.args.get('count', '1').lower() not in ('0', 'false', 'no')
+    clauses = domain_filters(Domain, tld=filters['tld'], search=filters['q'], start=_parse_datetime('start'),
+                             end=_parse_datetime('end'), domain_column='url', date_column='timestamp')
+    try:
+        page = paginate(db.session, Domain, clauses, limit=limit, cursor=request.args.get('cursor'),
+                        with_total=with_total, date_column='timestamp')
+    except ValueError as e:
+        abort(400, str(e))
+    return render_template('results.html', domains=page.items, next_cursor=page.next_cursor, total=page.total,
+                           filters=filters, limit=limit)
+
+EXPORT_FIELDS = ('url', 'tld', 'timestamp', 'last_seen')
+
+def _parse_datetime(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f"Invalid {name}, expected an ISO date such as 2024-01-31")
 
 @bp.route('/download')
 def download():
-    # Same logic for downloading CSV
-    pass
+    # Stream the domains straight from the database; defaults to CSV
+    fmt = request.args.get('format', 'csv')
+    if fmt not in CONTENT_TYPES:
+        abort(400, f"Unsupported format, use one of: {', '.join(CONTENT_TYPES)}")
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    tld = request.args.get('tld') or None
+    since_id = request.args.get('since_id', type=int)
+
+    stmt = export_select(Domain, EXPORT_FIELDS, tld=tld, start=_parse_datetime('start'),
+                         end=_parse_datetime('end'), since_id=since_id, date_column='timestamp')
+    prefix = f"domains_{tld.strip('.').replace('.', '_')}" if tld else 'domains'
+    return Response(
+        stream_with_context(export_stream(db.session, stmt, fmt, EXPORT_FIELDS, compress=compress)),
+        mimetype='application/gzip' if compress else CONTENT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(prefix, fmt, compress)}"'}
+    )
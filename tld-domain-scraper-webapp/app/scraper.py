@@ -1,36 +1,42 @@
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
+import time
 from datetime import datetime
 from app.models import Domain, db
+from scraper_common.browser import launch_chrome
+from scraper_common.bulk import bulk_upsert
+from scraper_common.extraction import LinkFilter, extract_links
+from scraper_common.metrics import STORE_WRITE
+from scraper_common.ratelimit import AdaptiveRateLimiter
+
+# Pacing of search requests, shared by every scrape run of this process
+SEARCH_RATE_LIMITER = AdaptiveRateLimiter(rate=1 / float(os.getenv("SCRAPER_SERP_INTERVAL", "4")), jitter=0.25)
 
 def run_scraper(tlds):
-    # Initialize WebDriver (ensure chromedriver is installed)
-    driver = webdriver.Chrome()
+    # Chrome as configured by the CHROME_* environment variables (headless mode, paths, blocked resources)
+    driver = launch_chrome()
 
     base_query = "-site:.gov"  # Exclude government sites
     scraped_domains = []
 
     for tld in tlds:
         query = f"site:{tld} {base_query}"
+        SEARCH_RATE_LIMITER.acquire("www.google.com")
+        started = time.monotonic()
         driver.get(f"https://www.google.com/search?q={query}")
-        links = driver.find_elements(By.CSS_SELECTOR, "a")
+        SEARCH_RATE_LIMITER.record("www.google.com", time.monotonic() - started,
+                                   captcha="/sorry/" in driver.current_url)
+        # One WebDriver call returns the matching links instead of one call per element
+        links = extract_links(driver, LinkFilter(tld, exclude=('.gov',)))
 
         for link in links:
-            href = link.get_attribute("href")
-            if href and tld.lower() in href.lower() and '.gov' not in href:
-                scraped_domains.append(href)
+            scraped_domains.append((link.href, tld))
 
     driver.quit()
 
-    # Store in PostgreSQL
-    for domain in scraped_domains:
-        new_domain = Domain(
-            url=domain,
-            tld=tld,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(new_domain)
-
-    db.session.commit()
-    return len(scraped_domains)  # Return count of scraped domains
+    # Store in PostgreSQL: new URLs are inserted, known ones get last_seen refreshed
+    now = datetime.utcnow()
+    rows = [{"url": url, "tld": tld, "timestamp": now} for url, tld in scraped_domains]
+    with STORE_WRITE.time(store="domains"):
+        result = bulk_upsert(db.session, Domain, rows, "url", seen_column="last_seen")
+        db.session.commit()
+    return result.inserted  # Return count of newly stored domains
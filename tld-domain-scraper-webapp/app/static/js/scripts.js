@@ -9,16 +9,15 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     }
 
-    // Results Page: Dynamic table search
-    const searchInput = document.getElementById("search");
-    const tableRows = document.querySelectorAll("table tbody tr");
-    if (searchInput && tableRows) {
-        searchInput.addEventListener("input", function () {
-            const query = searchInput.value.toLowerCase();
-            tableRows.forEach((row) => {
-                const cells = Array.from(row.cells);
-                const matches = cells.some((cell) => cell.textContent.toLowerCase().includes(query));
-                row.style.display = matches ? "" : "none";
+    // Results Page: filtering and paging happen on the server; drop empty
+    // filter fields so they do not end up in the URL
+    const filterForm = document.getElementById("results-filter");
+    if (filterForm) {
+        filterForm.addEventListener("submit", function () {
+            filterForm.querySelectorAll("input").forEach((input) => {
+                if (!input.value) {
+                    input.disabled = true;
+                }
             });
         });
     }
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import csv
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from scraper_common.dns import AsyncResolver, system_nameservers
+from scraper_common.metrics import REGISTRY
+from scraper_common.probe import RESULT_FIELDS, Prober
+
+# Function to read the domains of the scraper's output files (one domain or URL per line), without duplicates
+def read_domains(paths):
+    domains = set()
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                host = urlsplit(line).hostname if "://" in line else line
+                if host:
+                    domains.add(host.lower().rstrip("."))
+    return domains
+
+# Function to load the results of an earlier run, keyed by domain
+def load_results(path):
+    results = {}
+    if os.path.exists(path):
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                results[row["domain"]] = row
+    return results
+
+# Function to tell whether an earlier result is younger than the TTL and can be kept
+def is_fresh(row, ttl):
+    try:
+        return datetime.utcnow() - datetime.fromisoformat(row["checked_at"]) < timedelta(seconds=ttl)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+# Function to probe the domains and write the results in batches, keeping earlier results for everything else
+async def probe_domains(prober, domains, previous, output, batch_size):
+    counts = Counter()
+    tmp_path = output + ".tmp"
+    with open(tmp_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(RESULT_FIELDS)
+        writer.writerows([row.get(field, "") for field in RESULT_FIELDS]
+                         for domain, row in sorted(previous.items()) if domain not in domains)
+        batch = []
+        async for result in prober.probe_many(sorted(domains)):
+            counts[result.status] += 1
+            batch.append(result)
+            if len(batch) >= batch_size:
+                writer.writerows(batch)
+                batch = []
+                print(f"Probed {sum(counts.values())}/{len(domains)} domains: {dict(counts)}")
+        writer.writerows(batch)
+    os.replace(tmp_path, output)
+    return counts
+
+# Function to print per-stage timings (DNS, HTTP) and the outcome counts
+def print_metrics():
+    lines = REGISTRY.summary("probe_")
+    if lines:
+        print("Timings (seconds) and counts:")
+        for line in lines:
+            print(f"  {line}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check which scraped domains still resolve and answer over HTTP")
+    parser.add_argument("--domains", nargs="+", required=True, help="domain files written by tld-domains-scraper.py")
+    parser.add_argument("--output", default="probe.csv",
+                        help="CSV with status, IP, HTTP status, final URL and latency per domain")
+    parser.add_argument("--ttl", type=float, default=86400,
+                        help="seconds a result in --output stays valid; younger ones are not probed again")
+    parser.add_argument("--resolver", action="append",
+                        help=f"nameserver as host or host:port, repeatable (default: {', '.join(system_nameservers())})")
+    parser.add_argument("--concurrency", type=int, default=1000, help="domains in flight at once")
+    parser.add_argument("--per-resolver", type=int, default=256, help="DNS queries in flight per nameserver")
+    parser.add_argument("--per-host", type=int, default=4, help="HTTP connections at once per host")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds for each HTTP request")
+    parser.add_argument("--dns-timeout", type=float, default=2.0, help="seconds before a DNS query is retried")
+    parser.add_argument("--method", choices=["HEAD", "GET"], default="HEAD",
+                        help="HTTP method; HEAD falls back to GET where it is refused")
+    parser.add_argument("--batch", type=int, default=1000, help="results written to --output at a time")
+    parser.add_argument("--http-port", type=int, default=80, help="port for http:// URLs (e.g. of a local test server)")
+    parser.add_argument("--https-port", type=int, default=443, help="port for https:// URLs")
+    return parser.parse_args()
+
+async def main(args):
+    previous = load_results(args.output)
+    domains = read_domains(args.domains)
+    fresh = {domain for domain in domains if domain in previous and is_fresh(previous[domain], args.ttl)}
+    domains -= fresh
+    print(f"Probing {len(domains)} domains ({len(fresh)} checked within the last {args.ttl:.0f}s are kept)")
+
+    resolver = AsyncResolver(args.resolver, per_nameserver=args.per_resolver, timeout=args.dns_timeout)
+    prober = Prober(resolver, concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout,
+                    method=args.method, ttl=args.ttl, http_port=args.http_port, https_port=args.https_port)
+    started = time.monotonic()
+    try:
+        counts = await probe_domains(prober, domains, previous, args.output, args.batch)
+    finally:
+        prober.close()
+    elapsed = time.monotonic() - started
+    print(f"Probed {len(domains)} domains in {elapsed:.1f}s ({len(domains) / max(elapsed, 1e-9):.0f}/s): {dict(counts)}")
+    print(f"Results saved to {args.output}")
+    print_metrics()
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,38 +1,30 @@
 #!/usr/bin/env python3
 
-import platform
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from urllib.parse import urlparse
+import argparse
+import csv
+import queue
+import threading
+import functools
 import time
-import random
-import os 
-
-# Detect the operating system
-current_os = platform.system()
-
-# Set paths based on the operating system
-if current_os == "Darwin":  # macOS
-    chrome_driver_path = "/opt/homebrew/bin/chromedriver"  # Typical path for chromedriver on macOS
-    chrome_binary_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"  # Default path for Chrome on macOS
-elif current_os == "Linux":  # Linux
-    chrome_driver_path = "/usr/bin/chromedriver"
-    chrome_binary_path = "/usr/bin/google-chrome"
-elif current_os == "Windows":  # Windows
-    chrome_driver_path = "C:\\path\\to\\chromedriver.exe"
-    chrome_binary_path = "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe"
-else:
-    raise Exception(f"Unsupported OS: {current_os}")
-
-# Chrome Driver options
-chrome_options = Options()
-chrome_options.binary_location = chrome_binary_path
-service = Service(executable_path=chrome_driver_path)
-
-# Initialize the WebDriver with the service and options
-driver = webdriver.Chrome(service=service, options=chrome_options)
+import os
+from datetime import datetime
+
+from scraper_common.browser import DEFAULT_BLOCKED_TYPES, DriverConfig, launch_chrome, pause_blocking, resume_blocking
+from scraper_common.catalog import country_code, load_tld_catalog
+from scraper_common.checkpoint import COMPLETED, FAILED, RUNNING, CrawlState, JsonCheckpointStore, StopRule
+from scraper_common.domains import registrable_domain
+from scraper_common.extraction import LinkFilter
+from scraper_common.fetch import (
+    GOOGLE_SEARCH_URL,
+    FallbackFetchBackend,
+    HttpFetchBackend,
+    PacedFetchBackend,
+    SeleniumFetchBackend,
+    build_search_url,
+)
+from scraper_common.metrics import REGISTRY
+from scraper_common.planner import DEFAULT_KEYWORDS, QueryPlanner
+from scraper_common.ratelimit import AdaptiveRateLimiter
 
 # List of TLDs to search
 tlds = [
@@ -51,84 +43,431 @@ tlds = [
 # Base query excluding .gov.ir domains
 base_query = "-site:.gov.ir"
 
-# Function to extract base domain from URL
-def get_base_domain(url):
-    parsed_url = urlparse(url)
-    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+# Serializes manual CAPTCHA prompts when several workers share the terminal
+captcha_lock = threading.Lock()
 
-# Function to detect CAPTCHA (multiple strategies)
-def is_captcha_present():
-    try:
-        captcha_element = driver.find_element(By.XPATH, "//div[@id='captcha'] | //iframe[contains(@src, 'recaptcha')]")
-        return True if captcha_element else False
-    except:
-        return False
+# Function to start Chrome; only called once a page actually needs a browser
+def create_driver(driver_config):
+    return launch_chrome(driver_config)
 
-# Function to check for "Next" button
-def is_next_button_present():
-    try:
-        next_button = driver.find_element(By.XPATH, "//a[@id='pnnext' or contains(text(), 'Next')]")
-        return next_button
-    except:
-        return None
-
-# Loop through the list of TLDs
-for tld in tlds:
-    print(f"Scraping domains for TLD: {tld}")
-    
-    domain_list = set()  # Use a set to store unique domains for each TLD
-    
-    # Google search query for the current TLD
-    query = f"site:{tld} {base_query}"
-    url = f"https://www.google.com/search?q={query}"
-
-    # Open the Google search URL
-    driver.get(url)
-    time.sleep(2)  # Allow the page to load
-    
-
-    for page in range(30):  # Adjust this number to match the total number of pages
-        # Detect CAPTCHA and pause for manual solving
-        if is_captcha_present():
-            print("CAPTCHA detected! Please solve it manually in the browser.")
+# Function to build the Chrome settings from the command line, falling back to the CHROME_* environment variables
+def create_driver_config(args):
+    blocked_types = None
+    if args.block_resources is not None:
+        blocked_types = [kind.strip() for kind in args.block_resources.split(",") if kind.strip()]
+    return DriverConfig.from_env(driver_path=args.chrome_driver, binary_path=args.chrome_binary,
+                                 headless=args.headless or None, debug_port=args.debug_port,
+                                 blocked_types=blocked_types)
+
+# Function to create the pacing shared by every worker: --min-delay..--max-delay per worker to start with,
+# then faster while the engine answers normally and slower after CAPTCHAs, 429s or slow pages
+def create_rate_limiter(args):
+    mean_delay = (args.min_delay + args.max_delay) / 2
+    if mean_delay <= 0:
+        return AdaptiveRateLimiter(rate=1000.0, min_rate=1000.0, captcha_cooldown=0.0)
+    rate = args.workers / mean_delay
+    return AdaptiveRateLimiter(rate=rate, min_rate=rate / 20, max_rate=rate * 4,
+                               jitter=(args.max_delay - args.min_delay) / (2 * mean_delay))
+
+# Function to create one fetch session (HTTP client with Chrome fallback)
+def create_backend(backend_name, rate_limiter, driver_config):
+    driver_factory = functools.partial(create_driver, driver_config)
+    if backend_name == "http":
+        backend = HttpFetchBackend()
+    elif backend_name == "selenium":
+        backend = SeleniumFetchBackend(driver_factory)
+    else:
+        backend = FallbackFetchBackend(HttpFetchBackend(), SeleniumFetchBackend(driver_factory))
+    return PacedFetchBackend(backend, rate_limiter)
+
+# Function to extract the registrable domain from a URL (www.x.co.ir -> x.co.ir)
+def get_base_domain(url, tld=None):
+    return registrable_domain(url, tld)
+
+# Function to fetch one results page and pause for manual CAPTCHA solving; returns (None, set()) if it can't be solved
+def fetch_results_page(backend, url, link_filter, tld, prefix, label):
+    result = backend.fetch(url, link_filter)
+
+    # Detect CAPTCHA and pause for manual solving
+    if result.captcha:
+        if backend.driver is None:
+            print(f"{prefix}CAPTCHA detected and no browser fallback is configured. Stopping {tld}.")
+            return None, set()
+        with captcha_lock:
+            # Images and styles are blocked for scraping, but the CAPTCHA needs them
+            pause_blocking(backend.driver)
+            print(f"{prefix}CAPTCHA detected! Please solve it manually in the browser.")
             input("Press Enter after solving the CAPTCHA...")  # Pauses indefinitely until user presses Enter
-            print("CAPTCHA solved. Resuming script.")
-        
-        # Scrape current page's results
-        results = driver.find_elements(By.CSS_SELECTOR, 'a')  # Find all links on the page
-        print(f"Extracting links from page {page + 1}...")
-        
-        for link in results:
-            href = link.get_attribute('href')
-            print(f"Found link: {href}")  # Log the found links for debugging
-            if href and tld.lower() in href.lower() and '.gov.ir' not in href and 'translate.google.com' not in href:
-                base_domain = get_base_domain(href)
-                print(f"Adding domain: {base_domain}")  # Log the added domain
-                domain_list.add(base_domain)
-        
-        next_button = is_next_button_present()
-        
-        if next_button:
-            next_button.click()
-            print(f"Moving to page {page + 1}")
-            time.sleep(random.uniform(3, 5))  # Random delay between 3 and 5 seconds
+            print(f"{prefix}CAPTCHA solved. Resuming script.")
+            resume_blocking(backend.driver)
+        result = backend.reload(link_filter)
+
+    # Scrape current page's results
+    print(f"{prefix}Extracting links from {label}...")
+
+    page_domains = set()
+    for link in result.links:
+        print(f"{prefix}Found link: {link.href}")  # Log the found links for debugging
+        base_domain = get_base_domain(link.href, tld)
+        if base_domain:
+            print(f"{prefix}Adding domain: {base_domain}")  # Log the added domain
+            page_domains.add(base_domain)
+    return result, page_domains
+
+# Function to scrape every results page for one TLD, checkpointing after each page
+def scrape_tld(backend, tld, exclude_query=base_query, exclude_zone=".gov.ir",
+               search_url=GOOGLE_SEARCH_URL, max_pages=30, worker="", store=None, resume=False,
+               stop_rule=None, known=()):
+    prefix = f"[{worker}] " if worker else ""
+
+    # Google search query for the current TLD
+    query = f"site:{tld} {exclude_query}".strip()
+    url = build_search_url(query, search_url)
+
+    state = store.load(tld) if store and resume else None
+    if state and state.query == query:
+        if not state.resumable:
+            print(f"{prefix}{tld} was already completed, skipping")
+            return state, 0
+        print(f"{prefix}Resuming {tld} at page {state.page + 1} with {len(state.domains)} domains")
+        url = state.next_url or url
+        state.status, state.error = RUNNING, None
+    else:
+        print(f"{prefix}Scraping domains for TLD: {tld}")
+        state = CrawlState(tld, query)
+    state.known = set(known)
+
+    pages = 0
+
+    # Links are filtered while the page is parsed (in the browser when Chrome is used)
+    link_filter = LinkFilter(tld, exclude=(exclude_zone, 'translate.google.com'))
+
+    try:
+        for page in range(state.page, max_pages):  # Adjust this number to match the total number of pages
+            result, page_domains = fetch_results_page(backend, url, link_filter, tld, prefix, f"page {page + 1}")
+            pages += 1
+            if result is None:
+                state.status, state.error = FAILED, "CAPTCHA"
+                break
+
+            new = state.advance(result.next_url, page_domains, stop_rule)
+            print(f"{prefix}{new} new domains on page {page + 1}")
+            exhausted = stop_rule is not None and stop_rule.exhausted(state.dry_pages)
+            if not result.next_url or exhausted:
+                state.status = COMPLETED
+            if store:
+                store.save(tld, state)
+
+            if exhausted:
+                print(f"{prefix}Stopping {tld} after {stop_rule.describe()}")
+                break
+            if result.next_url:
+                url = result.next_url
+                print(f"{prefix}Moving to page {page + 1}")
+            else:
+                print(f"{prefix}No more pages or the 'Next' button is missing.")
+                break
         else:
-            print("No more pages or the 'Next' button is missing.")
-            break
+            state.status = COMPLETED
+    except Exception as e:
+        state.status, state.error = FAILED, str(e)
+        raise
+    finally:
+        if store:
+            store.save(tld, state)
 
-    # Print all unique collected domain names for the current TLD
-    print(f"\nUnique Domain List for {tld}:")
-    for domain in domain_list:
-        print(domain)
+    return state, pages
+
+# Function to scrape one TLD through many narrower queries, always paging the one finding the most new domains
+def scrape_tld_sharded(backend, tld, planner, exclude_zone=".gov.ir", search_url=GOOGLE_SEARCH_URL,
+                       worker="", store=None, resume=False, known=()):
+    prefix = f"[{worker}] " if worker else ""
+
+    state = store.load(tld) if store and resume else None
+    if state and state.query == planner.key and state.plan:
+        if not state.resumable:
+            print(f"{prefix}{tld} was already completed, skipping")
+            return state, 0
+        planner.restore(state.plan)
+        planner.seen.update(state.domains)
+        print(f"{prefix}Resuming {tld} after {planner.requests} requests with {len(state.domains)} domains")
+        state.status, state.error = RUNNING, None
+    else:
+        print(f"{prefix}Scraping domains for TLD: {tld} with {len(planner.shards)} queries")
+        state = CrawlState(tld, planner.key)
+    state.known = set(known)
+
+    pages = 0
+    link_filter = LinkFilter(tld, exclude=(exclude_zone, 'translate.google.com'))
 
-    # Save the unique domain names to a text file named based on the TLD
+    try:
+        while True:
+            shard = planner.next_shard()
+            if shard is None:
+                break
+            url = shard.next_url or build_search_url(shard.query, search_url, shard.params)
+            label = f"page {shard.pages + 1} of {shard.kind} query '{shard.query}'"
+            result, page_domains = fetch_results_page(backend, url, link_filter, tld, prefix, label)
+            pages += 1
+            if result is None:
+                state.status, state.error = FAILED, "CAPTCHA"
+                break
+
+            new_domains = planner.record(shard, page_domains, result.next_url)
+            print(f"{prefix}{len(new_domains)} new domains, {len(planner.seen)} in total after {planner.requests} requests")
+            state.advance(None, page_domains)
+            state.plan = planner.to_dict()
+            if store:
+                store.save(tld, state)
+        if state.status == RUNNING:
+            state.status = COMPLETED
+    except Exception as e:
+        state.status, state.error = FAILED, str(e)
+        raise
+    finally:
+        if store:
+            store.save(tld, state)
+
+    for shard in planner.summary():
+        print(f"{prefix}{shard['new_domains']:>6} new in {shard['pages']:>3} pages  {shard['kind']:<8} {shard['query']}")
+    return state, pages
+
+# Function to crawl one TLD with a single query, or sharded over many when --shard is given
+# Domains in known (found by earlier runs) don't count as new for the stop rule
+def crawl_tld(args, backend, tld, exclude_query, exclude_zone, worker="", store=None, skip_zones=(), known=()):
+    stop_rule = StopRule(args.stop_min_new, args.stop_patience)
+    if not args.shard:
+        return scrape_tld(backend, tld, exclude_query, exclude_zone, args.search_url, args.max_pages,
+                          worker, store, args.resume, stop_rule, known)
+    planner = QueryPlanner(tld, exclude_query, exclude_zones=(exclude_zone,), skip_zones=skip_zones,
+                           keywords=args.keywords.split(",") if args.keywords else (),
+                           languages=args.languages.split(",") if args.languages else (),
+                           max_pages=args.max_pages, budget=args.budget, known=known, stop_rule=stop_rule)
+    return scrape_tld_sharded(backend, tld, planner, exclude_zone, args.search_url, worker, store, args.resume,
+                              known)
+
+# Function to name the domain file of a TLD
+def domains_filename(tld, prefix="iran", output_dir="."):
     tld_clean = tld.replace('.', '').lower()  # Remove dots and lowercase for the filename
-    filename = f"iran_{tld_clean}.txt"
-    
+    return os.path.join(output_dir, f"{prefix}_{tld_clean}.txt")
+
+# Function to name the file with the first and last seen dates of a TLD's domains
+def seen_filename(tld, prefix="iran", output_dir="."):
+    return domains_filename(tld, prefix, output_dir)[:-len(".txt")] + ".seen.csv"
+
+# Function to save the unique domain names to a text file named based on the TLD
+def save_domains(domain_list, tld, prefix="iran", output_dir="."):
+    filename = domains_filename(tld, prefix, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
     with open(filename, "w") as file:
         for domain in sorted(domain_list):  # Sort to keep order
             file.write(domain + "\n")
 
-    print(f"\nDomains for {tld} have been saved to {filename}")
+    return filename
+
+# Function to load when earlier runs first and last saw each domain of a TLD (--incremental). Domain files
+# written without --incremental only give the domains, without dates.
+def load_seen(tld, prefix="iran", output_dir="."):
+    filename = domains_filename(tld, prefix, output_dir)
+    seen = {}
+    if os.path.exists(filename):
+        with open(filename) as file:
+            for line in file:
+                if line.strip():
+                    seen[line.strip()] = ("", "")
+    if os.path.exists(seen_filename(tld, prefix, output_dir)):
+        with open(seen_filename(tld, prefix, output_dir), newline="") as file:
+            for row in csv.DictReader(file):
+                seen[row["domain"]] = (row["first_seen"], row["last_seen"])
+    return seen
+
+# Function to add a run's domains to the seen dates and save them next to the domain file; returns every domain
+def save_seen(seen, domain_list, tld, prefix="iran", output_dir="."):
+    now = datetime.utcnow().isoformat(timespec="seconds")
+    for domain in domain_list:
+        first_seen, _ = seen.get(domain, ("", ""))
+        seen[domain] = (first_seen or now, now)
+    filename = seen_filename(tld, prefix, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(filename + ".tmp", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["domain", "first_seen", "last_seen"])
+        for domain in sorted(seen):
+            writer.writerow([domain, *seen[domain]])
+    os.replace(filename + ".tmp", filename)
+    return set(seen)
+
+# Function to run the hardcoded TLD list one TLD at a time
+def run_single(args):
+    rate_limiter = create_rate_limiter(args)
+    backend = create_backend(args.backend, rate_limiter, create_driver_config(args))
+    store = JsonCheckpointStore(args.checkpoint_dir)
+    try:
+        for tld in tlds:
+            seen = load_seen(tld, output_dir=args.output_dir) if args.incremental else {}
+            state, _ = crawl_tld(args, backend, tld, base_query, ".gov.ir", store=store,
+                                 skip_zones=[other for other in tlds if other != tld], known=seen)
+            domain_list = state.domains  # Unique domains for this TLD
+            if args.incremental:
+                domain_list = save_seen(seen, domain_list, tld, output_dir=args.output_dir)
+
+            # Print all unique collected domain names for the current TLD
+            print(f"\nUnique Domain List for {tld}:")
+            for domain in domain_list:
+                print(domain)
+
+            filename = save_domains(domain_list, tld, output_dir=args.output_dir)
+            print(f"\nDomains for {tld} have been saved to {filename}")
+    finally:
+        backend.close()
+    print_rates(rate_limiter)
+    print_metrics()
+
+# Function to spread a whole TLD catalog over a pool of workers
+def run_batch(args):
+    catalog = load_tld_catalog(args.catalog)
+    store = JsonCheckpointStore(args.checkpoint_dir)
+    rate_limiter = create_rate_limiter(args)
+    driver_config = create_driver_config(args)
+    jobs = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+
+    # Zones that are crawled as TLDs of their own are left out of sharded queries for their parent zone
+    catalog_tlds = [tld for group_tlds in catalog.values() for tld in group_tlds]
+
+    for group, group_tlds in catalog.items():
+        for tld in group_tlds:
+            cc = country_code(tld)
+            gov_zone = f".gov.{cc}"
+            # Government zones are excluded from every query, so there is nothing to scrape in them
+            if tld.lower() == gov_zone:
+                print(f"Skipping government zone {tld}")
+                continue
+            jobs.put((group, tld, f"-site:{gov_zone}", gov_zone))
+
+    def worker(worker_id):
+        # Every worker owns its own session; the pacing is shared, so a CAPTCHA for one slows all of them
+        backend = create_backend(args.backend, rate_limiter, driver_config)
+        try:
+            while True:
+                try:
+                    group, tld, exclude_query, exclude_zone = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.monotonic()
+                error = None
+                domain_list, pages = set(), 0
+                try:
+                    prefix = group.lower().replace(" ", "_")
+                    seen = load_seen(tld, prefix, args.output_dir) if args.incremental else {}
+                    state, pages = crawl_tld(args, backend, tld, exclude_query, exclude_zone, worker_id, store,
+                                             [other for other in catalog_tlds if other != tld], seen)
+                    domain_list, error = state.domains, state.error
+                    if args.incremental:
+                        domain_list = save_seen(seen, domain_list, tld, prefix, args.output_dir)
+                    filename = save_domains(domain_list, tld, prefix, args.output_dir)
+                    print(f"[{worker_id}] Domains for {tld} have been saved to {filename}")
+                except Exception as e:
+                    error = str(e)
+                    print(f"[{worker_id}] Failed to scrape {tld}: {e}")
+                with results_lock:
+                    results.append({
+                        "group": group,
+                        "tld": tld,
+                        "domains": len(domain_list),
+                        "pages": pages,
+                        "seconds": time.monotonic() - started,
+                        "error": error,
+                    })
+        finally:
+            backend.close()
+
+    print(f"Scraping {jobs.qsize()} TLDs from {args.catalog} with {args.workers} workers")
+    os.makedirs(args.output_dir, exist_ok=True)
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(f"worker-{i + 1}",)) for i in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print_summary(catalog, results, time.monotonic() - started)
+    print_rates(rate_limiter)
+    print_metrics()
+
+# Function to print timing and counts for each country group
+def print_summary(catalog, results, elapsed):
+    print("\nSummary")
+    print(f"{'Group':<20} {'TLDs':>5} {'Failed':>6} {'Pages':>6} {'Domains':>8} {'Seconds':>9}")
+    for group in catalog:
+        rows = [r for r in results if r["group"] == group]
+        if not rows:
+            continue
+        print(f"{group:<20} {len(rows):>5} {sum(1 for r in rows if r['error']):>6} "
+              f"{sum(r['pages'] for r in rows):>6} {sum(r['domains'] for r in rows):>8} "
+              f"{sum(r['seconds'] for r in rows):>9.1f}")
+    print(f"{'Total':<20} {len(results):>5} {sum(1 for r in results if r['error']):>6} "
+          f"{sum(r['pages'] for r in results):>6} {sum(r['domains'] for r in results):>8} "
+          f"{elapsed:>9.1f} (wall clock)")
+
+# Function to print per-stage timings and counts (browser start, page load, extraction, CAPTCHAs, new domains, writes)
+def print_metrics():
+    lines = REGISTRY.summary("scraper_")
+    if lines:
+        print("Timings (seconds) and counts:")
+        for line in lines:
+            print(f"  {line}")
+
+# Function to print where the adaptive pacing ended up for each search engine
+def print_rates(rate_limiter):
+    for engine, rate in rate_limiter.snapshot().items():
+        print(f"Pacing for {engine}: {rate['interval']:.1f}s between requests after {rate['requests']} requests "
+              f"({rate['captchas']} CAPTCHAs, {rate['throttled']} throttled, {rate['slow']} slow)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape domain names for TLDs from search results")
+    parser.add_argument("--catalog", help="TLD catalog grouped by country (e.g. tlds.txt); enables batch mode")
+    parser.add_argument("--workers", type=int, default=1, help="number of parallel workers in batch mode")
+    parser.add_argument("--backend", choices=["auto", "http", "selenium"], default="auto",
+                        help="fetch result pages over HTTP, in Chrome, or over HTTP with Chrome as fallback")
+    parser.add_argument("--headless", action="store_true",
+                        help="run Chrome without a window (CAPTCHAs can then only be waited out)")
+    parser.add_argument("--chrome-driver", help="path to chromedriver (default: CHROMEDRIVER_PATH or the usual install paths)")
+    parser.add_argument("--chrome-binary", help="path to Chrome (default: CHROME_BINARY or the usual install paths)")
+    parser.add_argument("--block-resources",
+                        help=f"comma-separated resource types Chrome does not load (default: {','.join(DEFAULT_BLOCKED_TYPES)}; empty for none)")
+    parser.add_argument("--debug-port", help="Chrome remote debugging port: 'auto' or the first port to try, one per browser")
+    parser.add_argument("--min-delay", type=float, default=3.0,
+                        help="minimum seconds between requests of one worker to start with (adapted while running)")
+    parser.add_argument("--max-delay", type=float, default=5.0,
+                        help="maximum seconds between requests of one worker to start with (adapted while running)")
+    parser.add_argument("--max-pages", type=int, default=30, help="maximum result pages per TLD")
+    parser.add_argument("--stop-patience", type=int, default=2,
+                        help="stop a query after this many pages in a row with too few new domains (0: never)")
+    parser.add_argument("--stop-min-new", type=int, default=1,
+                        help="new domains a page needs to find to not count towards --stop-patience")
+    parser.add_argument("--incremental", action="store_true",
+                        help="start from the domains in --output-dir, count only others as new, keep all of them "
+                             "and record first/last seen dates in <file>.seen.csv")
+    parser.add_argument("--output-dir", default=".", help="directory for the per-TLD domain files")
+    parser.add_argument("--search-url", default=os.getenv("SCRAPER_SEARCH_URL", GOOGLE_SEARCH_URL))
+    parser.add_argument("--checkpoint-dir", default="checkpoints", help="where crawl progress is saved after every page")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue unfinished TLDs from their last checkpoint and skip completed ones")
+    parser.add_argument("--shard", action="store_true",
+                        help="split each TLD into sub-zone, keyword and language queries scheduled by their yield")
+    parser.add_argument("--budget", type=int, default=100, help="result pages per TLD over all of its sharded queries")
+    parser.add_argument("--keywords", default=",".join(DEFAULT_KEYWORDS),
+                        help="comma-separated keywords, each one a query shard (empty for none)")
+    parser.add_argument("--languages", default="",
+                        help="comma-separated language codes (e.g. fa,en), each one a query shard")
+    return parser.parse_args()
 
-driver.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    args = parse_args()
+    if args.catalog:
+        run_batch(args)
+    else:
+        run_single(args)